@@ -29,7 +29,15 @@ class AppSettings:
         "ftp_port":21,
         "ftp_username":"TD",
         "ftp_password":"Plymouth_C0",
-        "ftp_use_tls":False
+        "ftp_use_tls":False,
+        "cpa_workers": 1,
+        "cpa_cache_max_entries": 50000,
+        "spacing_tolerances": {"default": {"chainage": 5.0, "planar": 2.5}},
+        "profile_prefetch_depth": 1,
+        "historical_cache_max_units": 4,
+        "staging_write_behind": False,
+        "qc_workers": 1,
+        "geoprocessing_backend": "arcpy"
 
 
 
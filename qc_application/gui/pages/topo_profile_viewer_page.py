@@ -4,12 +4,11 @@
    exports saves fixed and flagged data for review."""
 import sys
 import os
-import time
 import re
-import tempfile
 import logging
+import threading
 from datetime import datetime
-import shutil
+import numpy as np
 import pandas as pd
 from sqlalchemy import create_engine
 from sqlalchemy.exc import OperationalError, SQLAlchemyError
@@ -30,17 +29,31 @@ from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as Navigatio
 
 
 from qc_application.config.app_settings import AppSettings
+from qc_application.services.bulk_write_service import (
+    MP_COLUMNS, copy_rows, prepare_mp_rows, write_cpa_rows, write_topo_rows
+)
 
 
+from qc_application.services.historical_profile_cache import get_historical_profile_cache, profile_envelope
+from qc_application.services.profile_session_store import ProfileSessionStore, SURVEY, MASTER, CPA
+from qc_application.services.staging_sync_service import backup_cpa_history, backup_topo_history
 from qc_application.services.topo_calculate_cpa_service import CalculateCPATool
 from qc_application.utils.calculate_easting_northings import calculate_missing_northing_easting
 from qc_application.utils.name_check_helper_functions import survey_naming_check_results
-from qc_application.utils.profile_viewer_pure_functions import qc_profile, find_over_spacing
+from qc_application.utils.profile_viewer_pure_functions import (
+    CRITICAL_QC_FLAGS, flagged_profile_ids, qc_profile, qc_profile_frames
+)
+from qc_application.utils.point_spacing import over_spacing_mask, spacing_tolerance
+from qc_application.utils.incremental_profile_qc import IncrementalProfileQC
+from qc_application.utils.profile_plot_renderer import ProfilePlotRenderer
 from qc_application.utils.database_connection import establish_connection
+from qc_application.workers.profile_prefetch import ProfilePrefetcher
+from qc_application.workers.staging_sync import StagingSyncWorker
 # --- Global Configuration and Stub Functions ---
 
 settings = AppSettings()
 USER = settings.get("user")
+CHAINAGE_SPACING_TOLERANCE = spacing_tolerance('chainage', settings=settings)
 #-Todo- if mp has changed then need to recalculate all cpa values for that profile for all existing data in the database
 #-Todo- Fixes that can be done in the profile viewer need to update the database qc tables
 #-Todo - Hook into existing GUI so the tool is called from the main topo qc tool
@@ -156,16 +169,24 @@ class DataHandler:
 
         self.new_survey_topo_data.columns = self.new_survey_topo_data.columns.str.lower()
         self.new_survey_topo_data['reg_id'] = self.new_survey_topo_data['reg_id'].astype(str).str.strip()
+        self.index_survey_data()
 
         # State Variables
         self.unique_profiles = extract_profiles(self.new_survey_topo_data)
         self.survey_unit = survey_unit
 
         self.date = extract_date(new_survey_topo_data, mode = self.mode)
+        self.session_store = ProfileSessionStore(self.survey_unit, self.date)  # Edited profiles, MPs and CPA
+        # Optional write-behind: stream each stored profile to the database while the operator works
+        self.staging_sync = StagingSyncWorker(self.session_store, self.survey_unit, self.date) \
+            if settings.get("staging_write_behind", False) else None
         self.current_index = 0
         self.profile = None
         self.profile_data = None
         self.current_master_profiles = None
+        self.master_profiles_by_id = None  # {profile_id: master profile DataFrame}, filled by prefetch_master_profiles
+        self._master_profiles_lock = threading.Lock()  # prepare_profile also reads them on the prefetch pool
+        self.data_generation = 0  # Bumped whenever saved/temp data changes, so prefetched profiles are discarded
 
         self.edits_made = False  # Track if edits have been made
 
@@ -190,154 +211,276 @@ class DataHandler:
             os.makedirs(path, exist_ok=True)
             logging.debug(f"Ensured directory exists: {path}")
 
-    def load_current_profile(self, force_db_load=False):
-        """Loads and prepares data for the current profile index."""
+        self.prefetch_master_profiles()
+
+        # Past surveys of every profile in the unit, loaded in the background for the overlays
+        self.historical_cache = get_historical_profile_cache()
+        self.historical_cache.prefetch(self.survey_unit, self.unique_profiles['reg_id'])
+        self.historical_envelopes = {}  # {profile: envelope of its past surveys}, see historical_envelope
+
+    def historical_envelope(self):
+        """Envelope of the current profile's historical surveys (excluding this survey's date), computed once."""
+        if self.profile not in self.historical_envelopes:
+            self.historical_envelopes[self.profile] = profile_envelope(self.historical_profiles,
+                                                                       exclude_dates=[self.date])
+        return self.historical_envelopes[self.profile]
+
+    def index_survey_data(self):
+        """
+        Parses chainage/elevation to numbers once and groups the survey so each profile's rows are contiguous
+        (profiles in first-seen order, points in file order). survey_rows then returns a profile by slicing.
+        """
+        survey = self.new_survey_topo_data
+        if 'chainage' in survey.columns:
+            survey['chainage'] = pd.to_numeric(survey['chainage'], errors='coerce')
+        if 'elevation' not in survey.columns and 'elevation_od' in survey.columns:
+            survey['elevation'] = survey['elevation_od']
+        if 'elevation' in survey.columns:
+            survey['elevation'] = pd.to_numeric(survey['elevation'], errors='coerce')
+
+        codes, profiles = pd.factorize(survey['reg_id'])
+        order = np.argsort(codes, kind='stable')
+        self.new_survey_topo_data = survey.iloc[order]
+
+        sorted_codes = codes[order]
+        starts = np.searchsorted(sorted_codes, np.arange(len(profiles)), side='left')
+        stops = np.searchsorted(sorted_codes, np.arange(len(profiles)), side='right')
+        self.profile_slices = dict(zip(profiles, zip(starts, stops)))
+
+    def survey_rows(self, profile):
+        """Returns a copy of the original survey rows for a profile."""
+        start, stop = self.profile_slices.get(profile, (0, 0))
+        return self.new_survey_topo_data.iloc[start:stop].copy()
+
+    def prefetch_master_profiles(self):
+        """
+        Loads the master profiles for every profile in the survey with a single query. Called on the GUI thread
+        only; prefetch workers just read the result. If it fails, profiles are loaded one by one on demand.
+        """
+        profile_ids = self.unique_profiles['reg_id'].tolist()
+        master_profiles_by_id = None
+        conn = establish_connection()
+        if not conn:
+            logging.warning("Skipping master profile prefetch due to DB connection failure.")
+        else:
+            try:
+                master_profiles = pd.read_sql_query(
+                    text("""
+                        SELECT * FROM topo_qc.master_profiles
+                        WHERE profile_id = ANY(:profile_ids)
+                        ORDER BY profile_id, sequence ASC
+                    """),
+                    conn,
+                    params={"profile_ids": profile_ids},
+                )
+                master_profiles_by_id = {
+                    profile_id: group.reset_index(drop=True)
+                    for profile_id, group in master_profiles.groupby('profile_id', sort=False)
+                }
+                logging.info(f"Prefetched master profiles for {len(master_profiles_by_id)} of "
+                             f"{len(profile_ids)} profiles. Rows: {len(master_profiles)}")
+            except Exception as e:
+                logging.error(f"Failed to prefetch master profiles: {e}", exc_info=True)
+            finally:
+                conn.close()
+
+        with self._master_profiles_lock:
+            if master_profiles_by_id is not None:
+                self._master_profile_columns = master_profiles.columns
+            self.master_profiles_by_id = master_profiles_by_id
+
+    def get_master_profile(self, profile, force_db_load=False):
+        """
+        Returns a copy of the master profile for a profile, ordered by sequence.
+        Served from the prefetched profiles; the DB is only queried for this profile when force_db_load is set
+        or the prefetch did not succeed. Safe to call from the prefetch pool.
+        """
+        if not force_db_load:
+            with self._master_profiles_lock:
+                if self.master_profiles_by_id is not None:
+                    if profile in self.master_profiles_by_id:
+                        return self.master_profiles_by_id[profile].copy()
+                    return pd.DataFrame(columns=self._master_profile_columns)
+
+        conn = establish_connection()
+        if not conn:
+            logging.warning("Skipping master profile load due to DB connection failure.")
+            return pd.DataFrame()
+
+        try:
+            master_profile = pd.read_sql_query(
+                text("""
+                    SELECT * FROM topo_qc.master_profiles
+                    WHERE profile_id = :profile_id
+                    ORDER BY sequence ASC
+                """),
+                conn,
+                params={"profile_id": profile},
+            )
+        finally:
+            conn.close()
+        logging.info(f"Master profile for {profile} reloaded from the database. Rows: {len(master_profile)}")
+
+        with self._master_profiles_lock:
+            if self.master_profiles_by_id is not None:
+                self.master_profiles_by_id[profile] = master_profile
+        return master_profile.copy()
+
+    def load_current_profile(self, force_db_load=False, prepared=None):
+        """
+        Loads and prepares data for the current profile index.
+        `prepared` is an optional result of prepare_profile (e.g. from the background prefetcher); it is used
+        when it belongs to the current index and no data has changed since it was prepared.
+        """
         if not (0 <= self.current_index < len(self.unique_profiles)):
             logging.error(f"Index out of bounds: {self.current_index}")
             return
 
-        current_profile_value = str(self.unique_profiles.iloc[self.current_index]['reg_id']).strip()
-        self.profile = current_profile_value
-        logging.info(f"Loading data for Profile: {self.profile} (Index: {self.current_index})")
+        if (force_db_load or prepared is None or prepared['index'] != self.current_index
+                or prepared['generation'] != self.data_generation):
+            prepared = self.prepare_profile(self.current_index, force_db_load=force_db_load)
+        else:
+            logging.info(f"Using prefetched data for Profile: {prepared['profile']} (Index: {self.current_index})")
+
+        self.profile = prepared['profile']
+        self.profile_data = prepared['profile_data']
+        self.current_master_profiles = prepared['master_profiles']
+        if prepared['from_temp']:
+            self.added_points_x.clear()
+            self.added_points_y.clear()
+        if prepared['profile_issues'] is not None:
+            self.profile_issues = prepared['profile_issues']
+
+        logging.info(self.profile_issues)
+
+        # Store the CPA, and the survey/MP data ONLY if not already present. We don't want to overwrite user edits.
+        self.session_store.write(
+            self.profile,
+            replace={CPA: prepared['cpa']},
+            if_missing={SURVEY: self.profile_data, MASTER: self.current_master_profiles},
+        )
+        self.queue_staging_sync()
+        logging.info(f"CPA calculated and saved to the session store for {self.profile}")
+
+    def queue_staging_sync(self):
+        """Queue the current profile for write-behind, when enabled."""
+        if self.staging_sync is not None:
+            self.staging_sync.enqueue(self.profile)
+
+    def stop_staging_sync(self, discard=False):
+        """Stop write-behind for the rest of the session, removing what it wrote if discard is set."""
+        if self.staging_sync is None:
+            return
+        if discard:
+            self.staging_sync.discard()
+        else:
+            self.staging_sync.stop()
+        self.staging_sync = None
+
+    def prepare_profile(self, index, force_db_load=False):
+        """
+        Reads and computes everything needed to show the profile at `index`: survey data (or the edits saved in
+        the session store), master profile, QC issues and CPA. Does not change the handler state or write
+        anything, so it can run on a background thread.
+        """
+        generation = self.data_generation
+        profile = str(self.unique_profiles.iloc[index]['reg_id']).strip()
+        logging.info(f"Loading data for Profile: {profile} (Index: {index})")
 
         # 1. Load Initial Profile Data
-        self.profile_data = self.new_survey_topo_data[
-            self.new_survey_topo_data['reg_id'] == current_profile_value
-            ].copy()
-        logging.debug(f"Initial profile data loaded. Rows: {len(self.profile_data)}")
+        profile_data = self.survey_rows(profile)
+        logging.debug(f"Initial profile data loaded. Rows: {len(profile_data)}")
 
         # 2. Check for Modified Data and OVERWRITE if present
-        temp_dir = tempfile.gettempdir()
-        date_string = self.date.strftime("%Y%m%d")
 
         # Format the profile data before saving
-        if 'survey_unit' not in self.profile_data.columns:
-            self.profile_data['survey_unit'] = self.survey_unit
+        if 'survey_unit' not in profile_data.columns:
+            profile_data['survey_unit'] = self.survey_unit
 
-        self.profile_data['profile'] = self.profile_data['reg_id']
+        profile_data['profile'] = profile_data['reg_id']
 
-        self.profile_data['date'] = self.date.strftime("%Y-%m-%d")
-        self.profile_data['year'] = self.date.year
-        self.profile_data['month'] = self.date.month
+        profile_data['date'] = self.date.strftime("%Y-%m-%d")
+        profile_data['year'] = self.date.year
+        profile_data['month'] = self.date.month
 
-        profile_output_path = os.path.join(temp_dir, 'New_Profile_Data',
-                                           f"{self.survey_unit}_{self.profile}{date_string}.pkl")
-        if os.path.exists(profile_output_path):
-            try:
-                self.profile_data = pd.read_pickle(profile_output_path)
-                logging.warning(f"Overwriting with modified data from {profile_output_path}")
-                self.added_points_x.clear()
-                self.added_points_y.clear()
-            except Exception as e:
-                logging.error(f"Failed to load pickled data from temp file: {e}")
+        from_temp = False
+        try:
+            stored_profile_data = self.session_store.get(SURVEY, profile)
+        except Exception as e:
+            logging.error(f"Failed to load stored profile data from the session store: {e}")
+            stored_profile_data = None
+        if stored_profile_data is not None:
+            profile_data = stored_profile_data
+            from_temp = True
+            logging.warning(f"Overwriting with modified data from the session store for {profile}")
 
-        # 3. CRITICAL: ENSURE NUMERIC COERCION (Applied to whatever self.profile_data is currently holding)
-        self.profile_data['chainage'] = pd.to_numeric(self.profile_data['chainage'], errors='coerce')
+        # 3. CRITICAL: ENSURE NUMERIC COERCION (Applied to whatever profile_data is currently holding)
+        profile_data['chainage'] = pd.to_numeric(profile_data['chainage'], errors='coerce')
 
         # Consistent check for elevation
         elevation_col = None
-        if 'elevation' in self.profile_data.columns:
+        if 'elevation' in profile_data.columns:
             elevation_col = 'elevation'
-        elif 'elevation_od' in self.profile_data.columns:
+        elif 'elevation_od' in profile_data.columns:
             # Create 'elevation' from 'elevation_od' for plotting consistency
-            self.profile_data['elevation'] = self.profile_data['elevation_od']
+            profile_data['elevation'] = profile_data['elevation_od']
             elevation_col = 'elevation'
 
         if elevation_col:
             # --- THIS LINE MUST EXECUTE ON THE FINAL DATA ---
-            self.profile_data['elevation'] = pd.to_numeric(self.profile_data['elevation'], errors='coerce')
+            profile_data['elevation'] = pd.to_numeric(profile_data['elevation'], errors='coerce')
             logging.debug(f"Coerced 'chainage' and '{elevation_col}' to numeric. Data ready for plot.")
         else:
             logging.error("Profile data is missing required 'elevation' or 'elevation_od' column.")
-            self.profile_data = pd.DataFrame()
+            profile_data = pd.DataFrame()
 
 
         # 4. Load Master Profile Data
-        profile_output_path = os.path.join(temp_dir, 'New_MP_Data',
-                                           f"MASTER_{self.survey_unit}_{self.profile}_{date_string}.pkl")
-        if not force_db_load and os.path.exists(profile_output_path):
+        master_profiles = None
+        if not force_db_load:
             try:
-                self.current_master_profiles = pd.read_pickle(profile_output_path)
-                logging.warning(f"Overwriting with modified master profile data from {profile_output_path}")
+                master_profiles = self.session_store.get(MASTER, profile)
+                if master_profiles is not None:
+                    logging.warning(f"Overwriting with modified master profile data from the session store for {profile}")
             except Exception as e:
-                logging.error(f"Failed to load pickled master profile data from temp file: {e}")
-                self.current_master_profiles = pd.DataFrame()
-        else:
-
-            conn = establish_connection()
-            if conn:
-                # **FIX: Add ORDER BY sequence to preserve original order**
-                master_profile_query = f"""
-                    SELECT * FROM topo_qc.master_profiles 
-                    WHERE profile_id = '{self.profile}'
-                    ORDER BY sequence ASC
-                """
-                self.current_master_profiles = get_data(query=master_profile_query, conn=conn)
-                conn.close()
-                logging.info(
-                    f"Master profile data loaded with order preserved. Rows: {len(self.current_master_profiles)}")
-            else:
-                self.current_master_profiles = pd.DataFrame()
-                logging.warning("Skipping master profile load due to DB connection failure.")
+                logging.error(f"Failed to load stored master profile data from the session store: {e}")
+                master_profiles = pd.DataFrame()
+        if master_profiles is None:
+            master_profiles = self.get_master_profile(profile, force_db_load=force_db_load)
+            logging.info(f"Master profile data loaded with order preserved. Rows: {len(master_profiles)}")
 
 
         # 5. Run QA/QC on loaded profile
+        profile_issues = None
         try:
-            self.profile_issues = qc_profile(self.current_master_profiles, self.profile_data)
+            profile_issues = qc_profile(master_profiles, profile_data)
         except:
             logging.error("Error occurred during profile QC.", exc_info=True)
 
-        logging.info(self.profile_issues)
-
-        # Intial CPA after deletion
-        cpa_output_path = os.path.join(temp_dir, 'Calculated_CPA_Values',
-                                       f"{self.survey_unit}_{self.profile}{self.date.strftime('%Y%m%d')}.pkl")
-
-        os.makedirs(os.path.dirname(cpa_output_path), exist_ok=True)
-
-        new_cpa_df = CalculateCPA(survey_unit=self.survey_unit, profile=self.profile,
-                                  master_profile_data=self.current_master_profiles,
-                                  new_profile_data=self.profile_data,
-                                  survey_date=self.date)
-        new_cpa_df.to_pickle(cpa_output_path)
-        logging.info(f"CPA calculated and saved to {cpa_output_path}")
-
-
-        # IMPORTANT push on loading a new profile to temp ONLY if not already present. We don't want to overwrite
-        # user edits.
-        temp_dir = tempfile.gettempdir()
-        date_string = self.date.strftime("%Y%m%d")
-        profile_output_path = os.path.join(temp_dir, 'New_Profile_Data',
-                                           f"{self.survey_unit}_{self.profile}{date_string}.pkl")
-        os.makedirs(os.path.dirname(profile_output_path), exist_ok=True)
-
-        if not os.path.exists(profile_output_path):
-            self.profile_data.to_pickle(profile_output_path)
-
-
-        # Important - re-save the original MP data to temp if not already present
-        temp_dir = tempfile.gettempdir()
-        date_string = self.date.strftime("%Y%m%d")
-        mp_profile_output_path = os.path.join(temp_dir, 'New_MP_Data',
-                                              f"MASTER_{self.survey_unit}_{self.profile}_{date_string}.pkl")
-
-        os.makedirs(os.path.dirname(mp_profile_output_path), exist_ok=True)
-
-        if not os.path.exists(mp_profile_output_path):
-            self.current_master_profiles.to_pickle(mp_profile_output_path)
+        # 6. CPA
+        cpa = CalculateCPA(survey_unit=self.survey_unit, profile=profile,
+                           master_profile_data=master_profiles,
+                           new_profile_data=profile_data,
+                           survey_date=self.date)
+
+        return {
+            'index': index,
+            'generation': generation,
+            'profile': profile,
+            'profile_data': profile_data,
+            'from_temp': from_temp,
+            'master_profiles': master_profiles,
+            'profile_issues': profile_issues,
+            'cpa': cpa,
+        }
 
     def check_temp_files_exist(self):
-        """Check if temp files exist on users machine, we should clear them each time."""
-        temp_dir = tempfile.gettempdir()
-        temp_profile_output_dir = os.path.join(temp_dir, 'New_Profile_Data')
-        temp_mp_output_dir = os.path.join(temp_dir, 'New_MP_Data')
-        temp_cpa_output_dir = os.path.join(temp_dir, 'Calculated_CPA_Values')
-
-        files_exist = all(os.path.exists(path) for path in [temp_profile_output_dir,temp_mp_output_dir,temp_cpa_output_dir])
+        """Check if the session store holds data from a previous session of this survey, we should clear it each time."""
+        files_exist = self.session_store.has_data()
         if files_exist:
-            logging.info(f"Existing temporary files found!.")
+            logging.info(f"Existing session data found in {self.session_store.path}.")
         else:
-            logging.info(f"No existing temporary files found")
+            logging.info(f"No existing session data found")
         return files_exist
 
     def has_survey_been_marked_as_failed(self) -> bool:
@@ -465,30 +608,9 @@ class DataHandler:
             conn.close()
 
     def clean_up_temp_files(self):
-        """Safely remove all temporary output directories created during processing."""
-        temp_dir = tempfile.gettempdir()
-        temp_profile_output_dir = os.path.join(temp_dir, 'New_Profile_Data')
-        temp_mp_output_dir = os.path.join(temp_dir, 'New_MP_Data')
-        temp_cpa_output_dir = os.path.join(temp_dir, 'Calculated_CPA_Values')
-
-        dirs_to_clean = [temp_profile_output_dir, temp_mp_output_dir, temp_cpa_output_dir]
-
-        for directory in dirs_to_clean:
-            if os.path.exists(directory):
-                try:
-                    shutil.rmtree(directory, ignore_errors=False)
-                    print(f"✅ Removed {directory}")
-                except PermissionError:
-                    time.sleep(0.5)
-                    try:
-                        shutil.rmtree(directory, ignore_errors=False)
-                        print(f"✅ Removed {directory} after retry")
-                    except Exception as e:
-                        print(f"⚠️ Failed to remove {directory}: {e}")
-                        raise e
-                except Exception as e:
-                    print(f"⚠️ Unexpected cleanup error: {e}")
-                    raise e
+        """Remove all edited profiles, master profiles and CPA values stored for this session."""
+        self.data_generation += 1
+        self.session_store.clear()
 
     def save_changes(self):
         """Saves changes to profile data and recalculates CPA."""
@@ -509,6 +631,7 @@ class DataHandler:
 
         logging.info(f"Saving changes for Profile: {self.profile}")
         self.edits_made = True
+        self.data_generation += 1
 
         # 1. Merge points into profile data (only if new points were added)
         if self.added_points_x:
@@ -548,17 +671,8 @@ class DataHandler:
 
 
 
-        # 3. Save modified profile data to temp directory
-        temp_dir = tempfile.gettempdir()
-        date_string = self.date.strftime("%Y%m%d")
-        profile_output_path = os.path.join(temp_dir, 'New_Profile_Data',
-                                           f"{self.survey_unit}_{self.profile}{date_string}.pkl")
-
-        os.makedirs(os.path.dirname(profile_output_path), exist_ok=True)
-
-        self.profile_data.to_pickle(profile_output_path)
-        self.modified_profiles[self.profile] = profile_output_path
-        logging.info(f"Modified profile data saved to temporary location: {profile_output_path}")
+        # 3. Prepare modified master profile data
+        modified = {SURVEY: self.profile_data}
 
         if self.current_master_profiles is not None and not self.current_master_profiles.empty:
 
@@ -578,26 +692,20 @@ class DataHandler:
                 # Reset sequence to reflect current order
                 self.current_master_profiles['sequence'] = range(len(self.current_master_profiles))
 
-            master_output_path = os.path.join(temp_dir, 'New_MP_Data',
-                                              f"MASTER_{self.survey_unit}_{self.profile}_{self.date.strftime('%Y%m%d')}.pkl")
-            os.makedirs(os.path.dirname(master_output_path), exist_ok=True)
-            self.current_master_profiles.to_pickle(master_output_path)
-            logging.info(f"Modified master profile data saved to temporary location: {master_output_path}")
+            modified[MASTER] = self.current_master_profiles
 
         # 4. Recalculate CPA
-
-        cpa_output_path = os.path.join(temp_dir, 'Calculated_CPA_Values',
-                                       f"{self.survey_unit}_{self.profile}{self.date.strftime('%Y%m%d')}.pkl")
-
-        os.makedirs(os.path.dirname(cpa_output_path ), exist_ok=True)
-
-        new_cpa_df = CalculateCPA(survey_unit=self.survey_unit, profile=self.profile,
-                                  master_profile_data=self.current_master_profiles,
-                                  new_profile_data=self.profile_data,
-                                  survey_date=self.date
-                                  )
-        new_cpa_df.to_pickle(cpa_output_path)
-        logging.info(f"CPA calculated and saved to {cpa_output_path}")
+        modified[CPA] = CalculateCPA(survey_unit=self.survey_unit, profile=self.profile,
+                                     master_profile_data=self.current_master_profiles,
+                                     new_profile_data=self.profile_data,
+                                     survey_date=self.date
+                                     )
+
+        # Profile, master profile and CPA are saved together in one transaction
+        self.session_store.write(self.profile, replace=modified)
+        self.queue_staging_sync()
+        self.modified_profiles[self.profile] = str(self.session_store.path)
+        logging.info(f"Modified profile data, master profile and CPA saved to the session store for {self.profile}")
         # 5. Run QA/QC on loaded profile
         try:
             self.profile_issues = qc_profile(self.current_master_profiles, self.profile_data)
@@ -607,6 +715,7 @@ class DataHandler:
     def delete_changes(self):
         """Removes modified profile data from temp storage and resets current data."""
         logging.info(f"Deleting changes for Profile: {self.profile}")
+        self.data_generation += 1
 
         if self.flagged_profiles and self.profile in self.flagged_reasons.keys():
 
@@ -616,95 +725,41 @@ class DataHandler:
 
 
 
-        # 1. Remove temp Profile file
-        temp_dir = tempfile.gettempdir()
-        date_string = self.date.strftime("%Y%m%d")
-        profile_output_path = os.path.join(temp_dir, 'New_Profile_Data',
-                                           f"{self.survey_unit}_{self.profile}{date_string}.pkl")
-
-        if os.path.exists(profile_output_path):
-            os.remove(profile_output_path)
-            logging.warning(f"Deleted modified profile data file at {profile_output_path}")
-        else:
-            logging.debug("No temporary modified file found to delete.")
-
-        # 2. Remove temp MP Profile file
-        mp_output_path = os.path.join(temp_dir, 'New_MP_Data',
-                                      f"MASTER_{self.survey_unit}_{self.profile}_{date_string}.pkl")
-
-        if os.path.exists(mp_output_path):
-            os.remove(mp_output_path)
-            logging.warning(f"Deleted master profile data file at {mp_output_path}")
-        else:
-            logging.debug(f"No temporary modified file found to delete: {mp_output_path}")
-
-        # 3. Reset profile data to original
+        # 1. Reset profile data to original
         current_profile_value = str(self.unique_profiles.iloc[self.current_index]['reg_id']).strip()
-        self.profile_data = self.new_survey_topo_data[
-            self.new_survey_topo_data['reg_id'] == current_profile_value
-            ].copy()
+        self.profile_data = self.survey_rows(current_profile_value)
 
 
 
-        # 4. Reset master profile data
-        conn = establish_connection()
-        if conn:
-            master_profile_query = f"SELECT * FROM topo_qc.master_profiles WHERE profile_id = '{self.profile}'"
-            self.current_master_profiles = get_data(query=master_profile_query, conn=conn)
-            conn.close()
-            logging.info(f"Master profile data loaded. Rows: {len(self.current_master_profiles)}")
-        else:
-            self.current_master_profiles = pd.DataFrame()
-            logging.warning("Skipping master profile load due to DB connection failure.")
+        # 2. Reset master profile data (original DB version, from the prefetched profiles)
+        self.current_master_profiles = self.get_master_profile(self.profile)
+        logging.info(f"Master profile data loaded. Rows: {len(self.current_master_profiles)}")
 
-        # 5. Reset temporary added points
+        # 3. Reset temporary added points
         self.added_points_x.clear()
         self.added_points_y.clear()
 
-        # 6.. Re-apply numeric conversions
+        # 4. Re-apply numeric conversions (already numeric, the survey is parsed once in index_survey_data)
         self.profile_data['chainage'] = pd.to_numeric(self.profile_data['chainage'], errors='coerce')
 
-        # 7. Ensure 'elevation' column exists before trying to coerce it
+        # 5. Ensure 'elevation' column exists before trying to coerce it
         if 'elevation' in self.profile_data.columns:
             self.profile_data['elevation'] = pd.to_numeric(self.profile_data['elevation'], errors='coerce')
         elif 'elevation_od' in self.profile_data.columns:
             self.profile_data['elevation'] = pd.to_numeric(self.profile_data['elevation_od'], errors='coerce')
 
-        # 8. Important - re-save the original data to temp if not already present
-        temp_dir = tempfile.gettempdir()
-        date_string = self.date.strftime("%Y%m%d")
-        profile_output_path = os.path.join(temp_dir, 'New_Profile_Data',
-                                           f"{self.survey_unit}_{self.profile}{date_string}.pkl")
-        os.makedirs(os.path.dirname(profile_output_path), exist_ok=True)
-
-        if not os.path.exists(profile_output_path):
-            self.profile_data.to_pickle(profile_output_path)
-
-
-        # 9. Important - re-save the original MP data to temp if not already present
-        temp_dir = tempfile.gettempdir()
-        date_string = self.date.strftime("%Y%m%d")
-        mp_profile_output_path = os.path.join(temp_dir, 'New_MP_Data',
-                                           f"MASTER_{self.survey_unit}_{self.profile}_{date_string}.pkl")
-        os.makedirs(os.path.dirname(mp_profile_output_path), exist_ok=True)
-
-        if not os.path.exists(mp_profile_output_path) :
-            self.current_master_profiles.to_pickle(mp_profile_output_path )
-
-
-        # 10. Recalculate CPA after deletion
-        cpa_output_path = os.path.join(temp_dir, 'Calculated_CPA_Values',
-                                       f"{self.survey_unit}_{self.profile}{self.date.strftime('%Y%m%d')}.pkl")
-
-        os.makedirs(os.path.dirname(cpa_output_path), exist_ok=True)
-
+        # 6. Recalculate CPA and overwrite the edited profile in the session store with the originals
         new_cpa_df = CalculateCPA(survey_unit=self.survey_unit, profile=self.profile,
                                   master_profile_data=self.current_master_profiles,
                                   new_profile_data=self.profile_data,
                                   survey_date=self.date
                                   )
-        new_cpa_df.to_pickle(cpa_output_path)
-        logging.info(f"CPA calculated and saved to {cpa_output_path}")
+        self.session_store.write(self.profile, replace={SURVEY: self.profile_data,
+                                                        MASTER: self.current_master_profiles,
+                                                        CPA: new_cpa_df})
+        self.queue_staging_sync()
+        self.modified_profiles.pop(self.profile, None)
+        logging.info(f"Original profile data, master profile and CPA restored in the session store for {self.profile}")
 
         self.edits_made = False
 
@@ -742,17 +797,14 @@ class DataHandler:
                 return  # Abort the quit process
 
         logging.critical("End Session requested. Logging final state and exiting.")
+        self.stop_staging_sync(discard=True)
         self.clean_up_temp_files()
         self.log_index()
 
     def end_session_and_push(self):
         """Logs the final state, pushes changes to DB, and quits."""
-        temp_dir = tempfile.gettempdir()
-        temp_profile_output_dir = os.path.join(temp_dir, 'New_Profile_Data')
-        temp_mp_output_dir = os.path.join(temp_dir, 'New_MP_Data')
-        temp_cpa_output_dir = os.path.join(temp_dir, 'Calculated_CPA_Values')
 
-        # 1) Check if temp files exist
+        # 1) Check if session data exists
         if not self.check_temp_files_exist():
             QMessageBox.information(
                 None,
@@ -763,25 +815,24 @@ class DataHandler:
             logging.info("Push requested but no temporary files found. Aborting push.")
             return
 
-        # 2) Push data from directories
-        dirs_to_push = [temp_profile_output_dir, temp_mp_output_dir, temp_cpa_output_dir]
-
-        for directory in dirs_to_push:
-            if not os.path.exists(directory):
-                logging.info(f"Directory not found: {directory}")
+        # 2) Push the session data, read from the session store in one pass
+        session_frames = self.session_store.load_combined()
+        updates = [(SURVEY, self.updateTopoDatabase), (MASTER, self.updateMpDatabase), (CPA, self.updateCpaDatabase)]
+
+        # With write-behind, topo and CPA are already in the database and only need moving into staging
+        if self.staging_sync is not None:
+            published = self.staging_sync.publish(settings.get("user"), timeout=120)
+            self.stop_staging_sync(discard=not published)
+            if published:
+                updates = [(MASTER, self.updateMpDatabase)]
+
+        for kind, update in updates:
+            new_data = session_frames[kind]
+            if new_data.empty:
+                logging.info(f"No {kind} data found in the session store")
                 continue
 
-            file_paths = [
-                os.path.join(directory, f)
-                for f in os.listdir(directory)
-                if os.path.isfile(os.path.join(directory, f))
-            ]
-
-            if not file_paths:
-                logging.info(f"No files found in {directory}")
-                continue
-
-            logging.info(f"Files to push from {directory}: {file_paths}")
+            logging.info(f"Pushing {len(new_data)} {kind} rows from the session store")
 
             conn = establish_connection()
             if conn is None:
@@ -795,15 +846,7 @@ class DataHandler:
                 return
 
             try:
-                if 'New_MP_Data' in directory:
-                    self.updateMpDatabase(conn, file_paths)
-
-                elif 'Calculated_CPA_Values' in directory:
-                    self.updateCpaDatabase(conn, file_paths)
-
-                elif 'New_Profile_Data' in directory:
-                   self.updateTopoDatabase(conn, file_paths)
-
+                update(conn, new_data)
             finally:
                 conn.close()
 
@@ -962,6 +1005,7 @@ class DataHandler:
             self.undoMpDatabase(conn)
             self.undoCpaDatabase(conn)
             self.undoTopoDatabase(conn)
+            self.stop_staging_sync()
 
             if self.mode != 'edit':
                 self.undoQcLogFlags(conn)
@@ -979,24 +1023,16 @@ class DataHandler:
 
     #TODO - Add method that undoes the last QC log changes
 
-    def updateMpDatabase(self, conn, file_paths):
-        """Updates the master profiles in the database with new data from temp files."""
+    def updateMpDatabase(self, conn, new_data):
+        """Updates the master profiles in the database with the session's master profile data."""
         try:
-            new_master_profile_dfs = [pd.read_pickle(fp) for fp in file_paths]
-            all_new_mp_data = pd.concat(new_master_profile_dfs, ignore_index=True)
-            all_new_mp_data.columns = all_new_mp_data.columns.str.lower()
+            all_new_mp_data = prepare_mp_rows(new_data)
 
             profile_ids = all_new_mp_data['profile_id'].unique().tolist()
             if not profile_ids:
                 logging.info("No profiles to update.")
                 return
 
-            # **FIX: Ensure sequence column exists and is properly set**
-            if 'sequence' not in all_new_mp_data.columns:
-                logging.warning("Sequence column missing! Adding default sequence per profile.")
-                # Group by profile_id and add sequence within each group
-                all_new_mp_data['sequence'] = all_new_mp_data.groupby('profile_id').cumcount()
-
             user_name = settings.get("user")
 
             with conn.begin():
@@ -1018,14 +1054,7 @@ class DataHandler:
                 conn.execute(text("DELETE FROM staging_data.master_profiles WHERE profile_id = ANY(:ids)"),
                              {"ids": profile_ids})
 
-                # **FIX: Include sequence in the insert**
-                insert_data = all_new_mp_data[['profile_id', 'date', 'chainage', 'elevation', 'sequence']].to_dict(
-                    orient='records')
-                insert_query = text("""
-                    INSERT INTO staging_data.master_profiles (profile_id, date, chainage, elevation, sequence)
-                    VALUES (:profile_id, :date, :chainage, :elevation, :sequence)
-                """)
-                conn.execute(insert_query, insert_data)
+                copy_rows(conn, "staging_data.master_profiles", all_new_mp_data, MP_COLUMNS)
 
             logging.info("Master profiles updated successfully with preserved order.")
 
@@ -1034,18 +1063,12 @@ class DataHandler:
             QMessageBox.critical(None, "Database Error",
                                  f"Could not update master profiles.\nError: {e}", QMessageBox.Ok)
 
-    def updateCpaDatabase(self, conn, file_paths):
-        """Updates the CPA values in the database with new data from temp files."""
+    def updateCpaDatabase(self, conn, new_data):
+        """Updates the CPA values in the database with the session's CPA values."""
         user_name = settings.get("user")
 
         try:
-            new_cpa_dfs = [pd.read_pickle(fp) for fp in file_paths]
-            all_new_cpa_data = pd.concat(new_cpa_dfs, ignore_index=True)
-            all_new_cpa_data.columns = all_new_cpa_data.columns.str.lower()
-
-
-
-            if len(all_new_cpa_data.columns) <= 0:
+            if len(new_data.columns) <= 0:
                 logging.error("CPA Error: No data to push.")
                 QMessageBox.critical(None, "CPA Error:",
                                      "No Data to push was found.", QMessageBox.Ok)
@@ -1059,26 +1082,13 @@ class DataHandler:
                 conn.execute(text("LOCK TABLE staging_data.cpa_table_history IN EXCLUSIVE MODE"))
 
                 # Backup existing records
-                backup_query = text("""
-                    INSERT INTO staging_data.cpa_table_history (
-                        survey_unit, date, profile, area, changed_at, user_name
-                    )
-                    SELECT survey_unit, date, profile, area, now(), :user_name
-                    FROM topo_qc.cpa_table
-                    WHERE survey_unit = :survey_unit AND date = :date
-                """)
-                conn.execute(backup_query, {"survey_unit": survey_unit, "date": date, "user_name": user_name})
+                backup_cpa_history(conn, survey_unit, date, user_name)
 
                 # Delete old and insert new
                 conn.execute(text("DELETE FROM staging_data.cpa_table WHERE survey_unit = :survey_unit AND date = :date"),
                              {"survey_unit": survey_unit, "date": date})
 
-                insert_data = all_new_cpa_data.to_dict(orient='records')
-                insert_query = text("""
-                    INSERT INTO staging_data.cpa_table (survey_unit, date, profile, area)
-                    VALUES (:survey_unit, :date, :profile, :area)
-                """)
-                conn.execute(insert_query, insert_data)
+                write_cpa_rows(conn, "staging_data.cpa_table", new_data)
 
             logging.info("CPA values updated successfully.")
 
@@ -1087,17 +1097,12 @@ class DataHandler:
             QMessageBox.critical(None, "Database Error",
                                  f"Could not update CPA values.\nError: {e}", QMessageBox.Ok)
 
-    def updateTopoDatabase(self, conn, file_paths):
-        """Updates the topo_data table with new data from temp files and stores a history backup."""
+    def updateTopoDatabase(self, conn, new_data):
+        """Updates the topo_data table with the session's profile data and stores a history backup."""
         user_name = settings.get("user")
 
         try:
-            # Load new topo data
-            new_topo_dfs = [pd.read_pickle(fp) for fp in file_paths]
-            all_new_topo_data = pd.concat(new_topo_dfs, ignore_index=True)
-            all_new_topo_data.columns = all_new_topo_data.columns.str.lower()
-
-            if all_new_topo_data.empty:
+            if new_data.empty:
                 logging.info("No Topo data to update.")
                 return
 
@@ -1106,17 +1111,7 @@ class DataHandler:
 
             with conn.begin():  # Transactional block
                 # Backup current rows to history
-                backup_query = text("""
-                    INSERT INTO staging_data.topo_data_history (
-                        easting, northing, elevation_od, chainage, fc,
-                        profile, reg_id, survey_unit, date, year, month, changed_at, user_name
-                    )
-                    SELECT easting, northing, elevation_od, chainage, fc,
-                           profile, reg_id, survey_unit, date, year, month, now(), :user_name
-                    FROM topo_qc.topo_data
-                    WHERE survey_unit = :survey_unit AND date = :date
-                """)
-                conn.execute(backup_query, {"survey_unit": survey_unit, "date": date, "user_name": user_name})
+                backup_topo_history(conn, survey_unit, date, user_name)
 
                 # Delete old rows
                 delete_query = text("""
@@ -1125,40 +1120,8 @@ class DataHandler:
                 """)
                 conn.execute(delete_query, {"survey_unit": survey_unit, "date": date})
 
-                # Prepare new data for insertion
-                # Prepare new data for insertion
-                insert_data = all_new_topo_data.to_dict(orient='records')
-
-                for record in insert_data:
-                    # Rename 'elevation' -> 'elevation_od' if needed
-                    if "elevation" in record:
-                        record["elevation_od"] = record.pop("elevation")
-
-                    # Fix missing or NaN survey_unit/date/year/month
-                    # survey_unit is usually a string
-                    if pd.isna(record.get("survey_unit")):
-                        record["survey_unit"] = self.survey_unit  # fallback
-
-                    # date must be a proper date object
-                    if pd.isna(record.get("date")):
-                        record["date"] = self.date  # fallback
-
-                    # year and month must be integers
-                    if pd.isna(record.get("year")):
-                        record["year"] = int(pd.to_datetime(record["date"]).year)
-                    if pd.isna(record.get("month")):
-                        record["month"] = int(pd.to_datetime(record["date"]).month)
-
-                # Bulk insert new rows
-                insert_query = text("""
-                    INSERT INTO staging_data.topo_data (
-                        easting, northing, elevation_od, chainage, fc,
-                        profile, reg_id, survey_unit, date, year, month
-                    )
-                    VALUES (:easting, :northing, :elevation_od, :chainage, :fc,
-                            :profile, :reg_id, :survey_unit, :date, :year, :month)
-                """)
-                conn.execute(insert_query, insert_data)
+                # Stream the new rows in with COPY
+                write_topo_rows(conn, "staging_data.topo_data", new_data, survey_unit, date)
 
             logging.info("Topo data updated successfully.")
 
@@ -1526,24 +1489,43 @@ class DataHandler:
 
     def _reload_after_cleanup(self):
         """Continuation after cleanup delay."""
+        # Master profiles may have changed in the DB, refetch them all before navigating on
+        self.data_generation += 1
+        self.prefetch_master_profiles()
         self.load_current_profile(force_db_load=True)
 
 # --- NEW DRAGGING LOGIC CLASS ---
 class DraggablePoints:
-    """A helper class to manage Matplotlib events for dragging scatter points."""
+    """
+    A helper class to manage Matplotlib events for dragging scatter points.
+
+    While dragging, the points live in a NumPy buffer and motion events are coalesced: only the latest mouse
+    position is applied, once per display frame. The DataFrame (or added point lists) is written on release.
+    """
 
     lock = None  # Class-wide lock to prevent multiple points being dragged at once
+    DEFAULT_REFRESH_RATE = 60  # Hz, used when the screen's refresh rate is not available
 
     def __init__(self, app_window, target_artist, drag_target='survey'):
         self.app = app_window
         self.data_h = app_window.data_handler
         self.canvas = app_window.canvas_widget
         self.ax = app_window.ax
+        self.renderer = app_window.renderer
         self.scatter_artist = target_artist
+        self.is_main_profile_data = drag_target
+        self.line = self.line_artist()
 
         self.selected_index = None
         self.offset = (0, 0)
-        self.is_main_profile_data = drag_target
+        self.points = None  # (n, 2) chainage/elevation buffer of the dragged artist
+        self.pending_position = None  # Latest mouse position not yet drawn
+        self.frame_timer_active = False
+        self.live_qc = None  # Incremental CPA/crossing state, built when a drag starts
+
+        self.frame_timer = self.canvas.new_timer(interval=self.frame_interval_ms())
+        self.frame_timer.single_shot = True
+        self.frame_timer.add_callback(self.apply_pending_move)
 
         # Connect Matplotlib events
         self.cid_press = self.canvas.mpl_connect('button_press_event', self.on_press)
@@ -1552,8 +1534,34 @@ class DraggablePoints:
 
         logging.info(f"Drag Mode enabled. Target: {'Main Profile' if self.is_main_profile_data else 'Added Points'}")
 
+    def frame_interval_ms(self):
+        """One display frame, from the refresh rate of the screen showing the canvas."""
+        try:
+            refresh_rate = self.canvas.screen().refreshRate() or self.DEFAULT_REFRESH_RATE
+        except Exception:
+            refresh_rate = self.DEFAULT_REFRESH_RATE
+        return max(int(1000 / refresh_rate), 1)
+
+    def line_artist(self):
+        """The line drawn through the points being dragged (added points have none)."""
+        if self.is_main_profile_data == 'survey':
+            return self.renderer.survey_line
+        if self.is_main_profile_data == 'master':
+            return self.renderer.master_line
+        return None
+
+    def target_frame(self):
+        """DataFrame behind the dragged points, None for added points."""
+        if self.is_main_profile_data == 'survey':  # For Survey Data (Old Logic)
+            return self.data_h.profile_data
+        if self.is_main_profile_data == 'master':  # <--- NEW: For Master Data
+            return self.data_h.current_master_profiles
+        return None
+
     def disconnect(self):
-        """Disconnects all event handlers."""
+        """Disconnects all event handlers, keeping any drag in progress."""
+        if DraggablePoints.lock is self:
+            self.finish_drag()
         try:
             self.canvas.mpl_disconnect(self.cid_press)
             self.canvas.mpl_disconnect(self.cid_move)
@@ -1575,43 +1583,70 @@ class DraggablePoints:
         contains, info = self.scatter_artist.contains(event)
 
         if contains and DraggablePoints.lock is None:
-            index_in_scatter_data = info['ind'][0]
-
-            self.selected_index = index_in_scatter_data
-
-            x_data = self.scatter_artist.get_offsets()[self.selected_index, 0]
-            y_data = self.scatter_artist.get_offsets()[self.selected_index, 1]
+            self.selected_index = info['ind'][0]
+            self.points = np.array(self.scatter_artist.get_offsets(), dtype=float)
 
+            x_data, y_data = self.points[self.selected_index]
             self.offset = (x_data - event.xdata, y_data - event.ydata)
 
             DraggablePoints.lock = self
+            self.start_live_qc()
 
-            # Change point color to yellow to show it's selected
-            colors = self.scatter_artist.get_facecolors()
-            # colors[self.selected_index] = (1, 1, 0, 1)  # Yellow
-            self.scatter_artist.set_facecolors(colors)
-            self.canvas.draw_idle()
+            # Only the dragged points and their line are redrawn while moving, over a cached background
+            self.renderer.begin_drag([self.line, self.scatter_artist])
             logging.debug(f"Drag started on point index: {self.selected_index}")
 
+    def start_live_qc(self):
+        """Build the incremental QC state for the profile being dragged so moves can update it cheaply."""
+        self.live_qc = None
+        master = self.data_h.current_master_profiles
+        survey = self.data_h.profile_data
+        if self.is_main_profile_data not in ('survey', 'master') or master is None or master.empty \
+                or survey is None or survey.empty:
+            return
+        try:
+            self.live_qc = IncrementalProfileQC.from_frames(master, survey)
+            self.app.status_label.setText(f"Profile: {self.data_h.profile}. {self.live_qc.status_text()}")
+        except Exception as e:
+            logging.warning(f"Live QC readout unavailable for this drag: {e}")
+
     def on_move(self, event):
-        """Update the position of the selected point while dragging."""
+        """Record the latest position, it is drawn on the next display frame."""
         if DraggablePoints.lock is not self or event.inaxes != self.ax or self.selected_index is None:
             return
 
-        # Calculate new point position
-        new_x = event.xdata + self.offset[0]
-        new_y = event.ydata + self.offset[1]
+        self.pending_position = (event.xdata + self.offset[0], event.ydata + self.offset[1])
+        if not self.frame_timer_active:
+            self.frame_timer_active = True
+            self.frame_timer.start()
 
-        # --- CRITICAL LOGIC: Update underlying data ---
-        # Determine which DataFrame and Line to update
-        if self.is_main_profile_data == 'survey':  # For Survey Data (Old Logic)
-            df = self.data_h.profile_data
-            line_label = 'Profile Data Line'
-        elif self.is_main_profile_data == 'master':  # <--- NEW: For Master Data
-            df = self.data_h.current_master_profiles
-            line_label = 'Master Profile'
-        else:  # For Added Points (Red Points)
-            df = None  # Handle added points separately below
+    def apply_pending_move(self):
+        """Move the selected point to the latest mouse position and blit the moving artists."""
+        self.frame_timer_active = False
+        if self.pending_position is None or self.selected_index is None:
+            return
+        new_x, new_y = self.pending_position
+        self.pending_position = None
+
+        self.points[self.selected_index] = (new_x, new_y)
+        self.scatter_artist.set_offsets(self.points)
+        if self.line is not None:
+            self.line.set_data(self.points[:, 0], self.points[:, 1])
+
+        # Live CPA / crossing readout, only the segments either side of the point are recalculated
+        if self.live_qc is not None:
+            if self.is_main_profile_data == 'survey':
+                self.live_qc.move_survey_point(self.selected_index, new_x, new_y)
+            else:
+                self.live_qc.move_master_point(self.selected_index, new_x, new_y)
+            self.app.status_label.setText(f"Profile: {self.data_h.profile}. {self.live_qc.status_text()}")
+
+        self.renderer.blit()
+
+    def write_back(self):
+        """Copy the dragged point from the buffer into the underlying data."""
+        new_x, new_y = self.points[self.selected_index]
+        df = self.target_frame()
 
         if df is not None:
             # Update the DataFrame by index location (iloc)
@@ -1623,42 +1658,32 @@ class DraggablePoints:
             if self.is_main_profile_data == 'master' and 'elevation_od' in df.columns:
                 df.iloc[self.selected_index, df.columns.get_loc('elevation_od')] = new_y
 
-            # Update the Line2D object
-            for line in self.ax.lines:
-                if line.get_label() == line_label:
-                    line.set_xdata(df['chainage'])
-                    line.set_ydata(df['elevation'])
-                    break
-
         elif not self.is_main_profile_data:  # Handle Added Points (Red Points)
             # Update the temporary added points lists (Red Points)
             self.data_h.added_points_x[self.selected_index] = new_x
             self.data_h.added_points_y[self.selected_index] = new_y
 
-        # Update the scatter artist's position
-        offsets = self.scatter_artist.get_offsets()
-        offsets[self.selected_index] = [new_x, new_y]
-        self.scatter_artist.set_offsets(offsets)
+    def finish_drag(self):
+        """Apply the last move, write it to the data and release the lock."""
+        self.frame_timer.stop()
+        self.apply_pending_move()
+        self.write_back()
 
-        self.canvas.draw_idle()
+        DraggablePoints.lock = None
+        self.selected_index = None
+        self.offset = (0, 0)
+        self.points = None
+        if self.live_qc is not None:
+            logging.debug(f"Drag ended. {self.live_qc.status_text()} (apply changes to run the full QC)")
+            self.live_qc = None
+        self.renderer.end_drag()
+        logging.debug("Drag ended. Data updated.")
 
     def on_release(self, event):
         """Finalize the drag operation."""
         if DraggablePoints.lock is not self:
             return
-
-        # Reset point color
-        colors = self.scatter_artist.get_facecolors()
-        # Use the appropriate color depending on the target
-        original_color = (0.678, 0.847, 0.902, 1) if self.is_main_profile_data else (1, 0, 0, 1)  # lightblue/red
-        # colors[self.selected_index] = original_color
-        self.scatter_artist.set_facecolors(colors)
-
-        DraggablePoints.lock = None
-        self.selected_index = None
-        self.offset = (0, 0)
-        self.canvas.draw_idle()
-        logging.debug("Drag ended. Data updated.")
+        self.finish_drag()
 
 
 # --- PyQt GUI Application ---
@@ -1676,6 +1701,9 @@ class ProfileQCApp(QWidget):
         self.data_handler = DataHandler(new_survey_topo_data, survey_unit, mode = self.mode)
         self.survey_type = survey_type
 
+        # Prepares the neighbouring profiles in the background while the current one is reviewed
+        self.prefetcher = ProfilePrefetcher(self.data_handler, depth=settings.get("profile_prefetch_depth", 1))
+
         if self.data_handler.has_survey_been_marked_as_failed():
             # Show warning
             QMessageBox.critical(
@@ -1785,6 +1813,7 @@ class ProfileQCApp(QWidget):
         # === 3. Matplotlib Canvas & Toolbar ===
         self.canvas_widget = MplCanvas(self)
         self.ax = self.canvas_widget.axes
+        self.renderer = ProfilePlotRenderer(self.canvas_widget, self.ax)  # Artists are created once and reused
         self.toolbar = NavigationToolbar(self.canvas_widget, self)
 
         main_layout.addWidget(self.toolbar)
@@ -1981,88 +2010,41 @@ class ProfileQCApp(QWidget):
             return
 
 
-        check_all_cpa_created = False
-        check_all_profiles_created = False
-        check_all_mp_created = False
-
-        temp_dir = tempfile.gettempdir()
-        date_string = self.data_handler.date.strftime("%Y%m%d")
-        for profile in self.data_handler.unique_profiles['reg_id']:
-
-            #1) Check all CPA files created for all profiles
-            cpa_output_path = os.path.join(temp_dir, 'Calculated_CPA_Values',
-                                           f"{self.data_handler.survey_unit}_{profile}{date_string}.pkl")
-            if not os.path.exists(cpa_output_path):
-                check_all_cpa_created = False
-                break
-            check_all_cpa_created = True
-
-            # 2) Check all Profile files created for all profiles
-            profile_output_path = os.path.join(temp_dir, 'New_Profile_Data',
-                                           f"{self.data_handler.survey_unit}_{profile}{date_string}.pkl")
-            if not os.path.exists(profile_output_path):
-                check_all_profiles_created = False
-                break
-            check_all_profiles_created = True
-
-            # 3) Check all MP files created for all profiles
-            mp_output_path = os.path.join(temp_dir, 'New_MP_Data',
-                                               f"MASTER_{self.data_handler.survey_unit}_{profile}_{date_string}.pkl")
-            if not os.path.exists(mp_output_path):
-                check_all_mp_created = False
-                break
-            check_all_mp_created = True
-
-        condition_met = (
-            check_all_cpa_created and check_all_profiles_created and check_all_mp_created )
-
-        # check for any cirtical issues for all profiles
-        if condition_met:
+        store = self.data_handler.session_store
+        profiles = {str(profile) for profile in self.data_handler.unique_profiles['reg_id']}
 
-            # list all files in the New_Profile_Data folder
-            profile_files = os.listdir(os.path.join(temp_dir, 'New_Profile_Data'))
-            mp_files = os.listdir(os.path.join(temp_dir, 'New_MP_Data'))
+        # All profiles need a CPA value, profile data and MP data in the session store
+        condition_met = all(profiles <= store.profiles(kind) for kind in (CPA, SURVEY, MASTER))
 
-            profile_paths = []
-            mp_paths = []
-
-            for pf in profile_files:
-                profile_path = os.path.join(temp_dir, 'New_Profile_Data', pf)
-                profile_paths.append(profile_path)
-            for mf in mp_files:
-                mp_path = os.path.join(temp_dir, 'New_MP_Data', mf)
-                mp_paths.append(mp_path)
-
-            mp_profile_paths = list(zip(profile_paths, mp_paths))
+        # check for any cirtical issues for all profiles, in one pass over the whole survey
+        if condition_met:
             try:
-
-                for profile_path, mp_path in mp_profile_paths:
-                    profile_df = pd.read_pickle(profile_path)
-                    mp_df = pd.read_pickle(mp_path)
-                    issue_dict = qc_profile(mp_df, profile_df)
-                    critical_issues = {
-                        "Survey chainage values are not strictly increasing",
-                        "Survey does not cross master profile anywhere!",
-                        "Survey does not reach master profile landward limit",
-                        "Profile does not reach MLW elevation"
-                    }
-
-                    if any(flag in critical_issues for flag in issue_dict.get("flags", [])):
-                        condition_met = False
-                        break
+                session_frames = store.load_all()
+                qc_results = qc_profile_frames(
+                    [(profile, df) for profile, df in session_frames[MASTER] if profile in profiles],
+                    [(profile, df) for profile, df in session_frames[SURVEY] if profile in profiles],
+                )
+                critical_profiles = flagged_profile_ids(qc_results, CRITICAL_QC_FLAGS)
+                if critical_profiles:
+                    logging.info(f"Finish and Push hidden, profiles with critical QC issues: {critical_profiles}")
+                    condition_met = False
 
             except Exception as e:
                 logging.error(f"Error during final QC check: {e}")
                 condition_met = False
 
-
         self.btn_finish_push.setVisible(condition_met)
 
     def end_session(self):
+        self.prefetcher.cancel_all()
         self.data_handler.end_session()
         if self.dialog:
             self.dialog.accept()
 
+    def closeEvent(self, event):
+        self.prefetcher.cancel_all()
+        super().closeEvent(event)
+
     def finish_and_push(self):
         """Finalize and push all profiles to the database. Create Sands Ready Files etc."""
 
@@ -2185,161 +2167,94 @@ class ProfileQCApp(QWidget):
             # Ensure the lock is globally cleared if it wasn't on the release event
             DraggablePoints.lock = None
 
-        self.ax.clear()
         logging.debug(f"Plotting Profile: {data_h.profile} (Index: {data_h.current_index})")
+        renderer = self.renderer
 
-        # Reset artists before plotting
+        # Reset artists before plotting, the renderer's artists are only exposed while they hold data
         self.scatter_artist = None
         self.survey_points_artist = None
         self.master_points_artist = None
         self.added_profile_line_artist = None
 
-        if data_h.profile_data is not None and not data_h.profile_data.empty:
+        survey_data = data_h.profile_data
+        master_data = data_h.current_master_profiles
+        historical_lines = []
+        envelope = None
+
+        if survey_data is not None and not survey_data.empty:
 
             try:
-                over_spacing_index = find_over_spacing(data_h.profile_data)
+                over_spaced = over_spacing_mask(survey_data, CHAINAGE_SPACING_TOLERANCE,
+                                                mode='chainage').to_numpy()
             except Exception as e:
                 logging.error(f"Error finding over spacing: {e}")
-                over_spacing_index = []
-
-
-
-            # 1a. Plot the main profile LINE
-            self.ax.plot(
-                data_h.profile_data['chainage'],
-                data_h.profile_data['elevation'],
-                label='Profile Data Line',
-                color='blue',
-                zorder=2
-            )
-
-            if over_spacing_index:
-
-                # Build a color list for each point based on index
-                colors = [
-                    '#e312c7' if idx in over_spacing_index else 'lightblue'
-                    for idx in data_h.profile_data.index
-                ]
-
-                # 1b. Plot the main profile POINTS (Used for dragging)
-                self.survey_points_artist = self.ax.scatter(
-                    data_h.profile_data['chainage'],
-                    data_h.profile_data['elevation'],
-                    label='Profile Data Points',
-                    color=colors,
-                    picker=5,
-                    zorder=3
-                )
-            else:
-                # 1b. Plot the main profile POINTS (Used for dragging)
-                self.survey_points_artist = self.ax.scatter(
-                    data_h.profile_data['chainage'],
-                    data_h.profile_data['elevation'],
-                    label='Profile Data Points',
-                    color='lightblue',
-                    picker=5,
-                    zorder=3
-                )
-
-            if 'fc' in data_h.profile_data.columns:
-                for x, y, fc_val in zip(data_h.profile_data['chainage'],
-                                        data_h.profile_data['elevation'],
-                                        data_h.profile_data['fc']):
-                    # Offset slightly in y so labels don’t overlap the points
-                    self.ax.text(x, y + 0.05, str(fc_val), fontsize=8, ha='center', va='bottom', color='darkblue',
-                                 zorder=4)
+                over_spaced = np.zeros(len(survey_data), dtype=bool)
 
+            # 1. Main profile line and points (points are used for dragging), over-spaced points highlighted
+            colors = np.where(over_spaced, '#e312c7', 'lightblue') if over_spaced.any() else 'lightblue'
+            renderer.set_survey(survey_data['chainage'], survey_data['elevation'], colors=colors,
+                                labels=survey_data['fc'] if 'fc' in survey_data.columns else None)
+            self.survey_points_artist = renderer.survey_points
             logging.debug("Plotted survey profile line and draggable points.")
 
-            # 2. Plot the master profile
-            if data_h.current_master_profiles is not None and not data_h.current_master_profiles.empty:
-                master_data = data_h.current_master_profiles.copy()
-                #master_data = master_data.sort_values(by=['chainage']).sort_index()
-                print(master_data)
-
-                if 'elevation_od' in master_data.columns and 'elevation' not in master_data.columns:
-                    master_data['elevation'] = pd.to_numeric(master_data['elevation_od'], errors='coerce')
-
-                # 2a. Plot the Master Profile line (unchanged)
-                self.ax.plot(
-                    master_data['chainage'],
-                    master_data['elevation'],
-                    label='Master Profile',
-                    color='red',
-                )
-
-                # 2b. Plot Master Profile POINTS (New draggable artist)
-                self.master_points_artist = self.ax.scatter(
-                    master_data['chainage'],
-                    master_data['elevation'],
-                    label='Master Profile Points',
-                    color='gray',  # Use a distinct color for MP points
-                    picker=5,
-                    zorder=3
-                )
+            # 2. Master profile line and draggable points
+            if master_data is not None and not master_data.empty:
+                master_elevation = master_data['elevation'] if 'elevation' in master_data.columns else \
+                    pd.to_numeric(master_data['elevation_od'], errors='coerce')
+                renderer.set_master(master_data['chainage'], master_elevation)
+                self.master_points_artist = renderer.master_points
                 logging.debug("Plotted master profile line and draggable points.")
             else:
+                renderer.set_master([], [])
                 logging.debug("Master profile data is empty or connection failed, skipping plot.")
 
-            # 3. Plot ADDED HISTORICAL PROFILES (New Section)
+            # 3. Plot ADDED HISTORICAL PROFILES, as one envelope band plus the two closest survey dates
             if data_h.show_historical_profiles and data_h.historical_profiles:
 
                 # Re-determine closest dates to apply colors/labels correctly
                 all_dates = list(data_h.historical_profiles.keys())
                 date_obj = pd.to_datetime(data_h.date)
                 sorted_by_distance = sorted(all_dates, key=lambda x: abs(x - date_obj))
-                closest_date = sorted_by_distance[0]
-                second_closest_date = sorted_by_distance[1] if len(sorted_by_distance) > 1 else None
-
-                # Iterate and plot all historical data stored in the DataHandler
-                for date, filter_data in data_h.historical_profiles.items():
-
-                    # Determine color and label based on date (same logic as before)
-                    color, alpha, label = ('gray', 0.4, None)
-                    if date == closest_date:
-                        color, label = ('red', f"Closest Date: {date.date()}")
-                        alpha = 0.6
-                    elif date == second_closest_date:
-                        color, label = ('pink', f"Second Closest: {date.date()}")
-                        alpha = 0.6
-
-                    # Plot the line (Assigning to a variable is optional here as we don't need the artist later)
-                    self.ax.plot(
-                        filter_data['chainage'],
-                        filter_data['elevation'],
-                        color=color,
-                        alpha=alpha,
-                        label=label,
-                        zorder=1  # Ensure these historical lines are drawn behind the main line (zorder=2)
-                    )
-
-                logging.debug("Historical profiles re-plotted.")
-
-            # 3. Plot temporary added points
+                closest_dates = [('red', f"Closest Date: {sorted_by_distance[0].date()}", sorted_by_distance[0])]
+                if len(sorted_by_distance) > 1:
+                    closest_dates.append(('pink', f"Second Closest: {sorted_by_distance[1].date()}",
+                                          sorted_by_distance[1]))
+
+                for color, label, date in closest_dates:
+                    filter_data = data_h.historical_profiles[date]
+                    # Drawn behind the main line (zorder=2)
+                    historical_lines.append({'x': filter_data['chainage'], 'y': filter_data['elevation'],
+                                             'color': color, 'alpha': 0.6, 'label': label})
+
+                envelope = data_h.historical_envelope()
+                logging.debug("Historical envelope and closest profiles re-plotted.")
+
+            # 4. Plot temporary added points
+            renderer.set_added_points(data_h.added_points_x, data_h.added_points_y)
             if data_h.added_points_x:
-                self.scatter_artist = self.ax.scatter(
-                    data_h.added_points_x, data_h.added_points_y, color='red', label='Added Points', zorder=5
-                )
+                self.scatter_artist = renderer.added_points
                 logging.debug(f"Plotted {len(data_h.added_points_x)} added points.")
-            else:
-                self.scatter_artist = None  # CRITICAL: MUST be set to None if no points
 
-            # 4. Check for 'M' profiles and redraw them if they were active
+            # 5. Check for 'M' profiles and redraw them if they were active
             if self.added_profile_lines:
                 self.add_more_profiles(was_active=True)
+        else:
+            renderer.set_survey([], [])
+            renderer.set_master([], [])
+            renderer.set_added_points([], [])
 
-        # 5. Labels and legend
-        self.ax.set_xlabel('Chainage')
-        self.ax.set_ylabel('Elevation')
-        self.ax.set_title(
-            f"Profile: {data_h.profile} - Index: {data_h.current_index}/{len(data_h.unique_profiles) - 1}")
-        self.ax.legend()
-        self.canvas_widget.draw()
+        renderer.set_historical(historical_lines)
+        renderer.set_envelope(envelope)
+
+        # 6. Title, legend and one full redraw
+        renderer.draw(f"Profile: {data_h.profile} - Index: {data_h.current_index}/{len(data_h.unique_profiles) - 1}")
         self.status_label.setText(f"Loaded Profile: {data_h.profile}. Added Points: {len(data_h.added_points_x)}")
         logging.debug("Plotting complete and canvas drawn.")
         self.update_warning_bar()
         # Check if 'Finish and Push' button should be visible
         self.update_finish_button_visibility()
+        # Keep the neighbours of this profile prepared (drops prefetches made stale by edits)
+        self.prefetcher.schedule(data_h.current_index)
 
     # --- Navigation and Action Handlers (Unchanged) ---
     def next_profile(self):
@@ -2359,7 +2274,8 @@ class ProfileQCApp(QWidget):
 
             self.data_handler.log_index()
             self.data_handler.current_index += 1
-            self.data_handler.load_current_profile()
+            self.data_handler.load_current_profile(
+                prepared=self.prefetcher.take(self.data_handler.current_index))
             self.added_profile_lines.clear()
             self.update_plot()
         else:
@@ -2386,7 +2302,8 @@ class ProfileQCApp(QWidget):
 
             self.data_handler.log_index()
             self.data_handler.current_index -= 1
-            self.data_handler.load_current_profile()
+            self.data_handler.load_current_profile(
+                prepared=self.prefetcher.take(self.data_handler.current_index))
             self.added_profile_lines.clear()
             self.update_plot()
         else:
@@ -2645,66 +2562,39 @@ class ProfileQCApp(QWidget):
     # --- Auxiliary Plotting Methods (Unchanged) ---
 
     def add_more_profiles(self, was_active=False):
-        """Fetches historical profile data from DB and sets the display state."""
+        """Loads the current profile's historical surveys from the survey unit cache and sets the display state."""
 
         if not was_active:
             logging.info("User action: Add DB Profiles (M).")
             # Toggle state flag ON
             self.data_handler.show_historical_profiles = True
 
-        # If already active, we assume the data is present and skip the DB call
+        # If already active, we assume the data is present and skip the lookup
         if self.data_handler.historical_profiles and was_active:
             logging.debug("Historical data already loaded. Forcing plot update.")
             # Trigger the plot to redraw the existing data
             self.update_plot()
             return
 
-        # --- Database Connection and Query (UNCHANGED) ---
-        conn = establish_connection()
-        if not conn:
-            # ... (error handling and return) ...
+        # --- Served from the survey unit's historical cache, loaded when the session opened ---
+        data_h = self.data_handler
+        current_profile = data_h.profile
+        unit_history = data_h.historical_cache.get(data_h.survey_unit, data_h.unique_profiles['reg_id'])
+        if unit_history is None:
+            data_h.show_historical_profiles = False
+            self.status_label.setText("Historical profiles could not be loaded.")
             return
 
-        current_profile = self.data_handler.profile
-        db_topo_query = (
-            f"SELECT * FROM topo_qc.topo_data WHERE profile = '{current_profile}'"
-        )
-        db_topo_data = get_data(db_topo_query, conn)
-        conn.close()
-
-        if db_topo_data.empty:
+        profile_history = unit_history.get(str(current_profile))
+        if not profile_history:
             # Toggle state flag OFF if no data found
-            self.data_handler.show_historical_profiles = False
+            data_h.show_historical_profiles = False
             self.status_label.setText("No historical profile data available.")
             logging.warning(f"No historical data found for profile {current_profile}")
             return
 
-        # --- Data Processing and Storage ---
-        self.data_handler.historical_profiles.clear()  # Clear existing data
-        db_topo_data['date'] = pd.to_datetime(db_topo_data['date'])
-
-        # Determine closest dates (UNCHANGED)
-        unique_dates = sorted(db_topo_data['date'].unique(), reverse=True)
-        date_obj = pd.to_datetime(self.data_handler.date)
-        sorted_by_distance = sorted(unique_dates, key=lambda x: abs(x - date_obj))
-        closest_date = sorted_by_distance[0]
-        second_closest_date = sorted_by_distance[1] if len(sorted_by_distance) > 1 else None
-
-        # Store filtered and processed data frames in the data handler
-        for date in unique_dates:
-            filter_data = db_topo_data.loc[db_topo_data['date'] == date].copy()
-
-            # --- CRITICAL: Ensure Data is Numeric and Cleaned ---
-            filter_data['chainage'] = pd.to_numeric(filter_data['chainage'], errors='coerce')
-            if 'elevation_od' in filter_data.columns and 'elevation' not in filter_data.columns:
-                filter_data['elevation'] = pd.to_numeric(filter_data['elevation_od'], errors='coerce')
-            elif 'elevation' in filter_data.columns:
-                filter_data['elevation'] = pd.to_numeric(filter_data['elevation'], errors='coerce')
-
-            filter_data = filter_data.drop_duplicates(subset=['chainage', 'elevation']).sort_values(by='chainage')
-
-            # Store the processed DataFrame
-            self.data_handler.historical_profiles[date] = filter_data
+        # {date: {'chainage': array, 'elevation': array}}, newest first
+        data_h.historical_profiles = dict(profile_history)
 
         # --- Redraw the plot to show the new lines ---
         self.update_plot()
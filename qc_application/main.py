@@ -1,5 +1,6 @@
 import sys
 import logging
+import multiprocessing
 from PyQt5.QtWidgets import QApplication
 from qc_application.gui.main_window import MainWindow
 from qc_application.gui.styles import get_app_stylesheet
@@ -40,4 +41,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # Required for process pools (batch CPA) in the PyInstaller build
+    multiprocessing.freeze_support()
     main()
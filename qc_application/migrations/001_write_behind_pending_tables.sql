@@ -0,0 +1,37 @@
+-- Pending tables for the optional profile viewer write-behind ('staging_write_behind' setting, see
+-- qc_application/services/staging_sync_service.py). Apply once per database as a role with CREATE on
+-- staging_data, e.g.  psql -d <database> -f 001_write_behind_pending_tables.sql
+-- The app only checks that these tables exist; its users need SELECT, INSERT and DELETE on them.
+
+BEGIN;
+
+-- Columns as staging_data.topo_data (bulk_write_service.TOPO_COLUMNS). A profile can hold repeated chainages,
+-- so rows get a surrogate key; write-behind replaces a profile by (survey_unit, date, reg_id).
+CREATE TABLE IF NOT EXISTS staging_data.write_behind_topo_data (
+    pending_id   bigserial PRIMARY KEY,
+    easting      double precision,
+    northing     double precision,
+    elevation_od double precision,
+    chainage     double precision,
+    fc           text,
+    profile      text,
+    reg_id       text NOT NULL,
+    survey_unit  text NOT NULL,
+    date         date NOT NULL,
+    year         integer,
+    month        integer
+);
+
+CREATE INDEX IF NOT EXISTS write_behind_topo_data_profile_idx
+    ON staging_data.write_behind_topo_data (survey_unit, date, reg_id);
+
+-- Columns as staging_data.cpa_table (bulk_write_service.CPA_COLUMNS), one value per profile of a survey.
+CREATE TABLE IF NOT EXISTS staging_data.write_behind_cpa_table (
+    survey_unit text NOT NULL,
+    date        date NOT NULL,
+    profile     text NOT NULL,
+    area        double precision,
+    PRIMARY KEY (survey_unit, date, profile)
+);
+
+COMMIT;
@@ -0,0 +1,15 @@
+-- Insertion order for the staging tables. MigrateStagingToLive keeps the last staged row of a duplicated key
+-- ("last write wins", see LAST_STAGED_ROW_FIRST in qc_application/services/topo_qc_migrate_staging_data.py)
+-- and needs a column that records it: ctid is a physical location, not insertion order, and changes after
+-- UPDATE or VACUUM FULL. Apply once per database as the owner of staging_data, before running this version.
+--
+-- Every writer names its columns (bulk_write_service.TOPO_COLUMNS / CPA_COLUMNS), so the default fills it,
+-- and rows of one COPY are numbered in file order. Rows already staged are numbered in no particular order;
+-- push or reject pending surveys before applying if any of them contain duplicated keys.
+
+BEGIN;
+
+ALTER TABLE staging_data.topo_data ADD COLUMN IF NOT EXISTS staged_seq bigserial;
+ALTER TABLE staging_data.cpa_table ADD COLUMN IF NOT EXISTS staged_seq bigserial;
+
+COMMIT;
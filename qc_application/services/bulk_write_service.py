@@ -0,0 +1,190 @@
+import csv
+import io
+import logging
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+"""Bulk writes of topo, master profile and CPA rows. Frames are normalised to the table layouts with vectorised
+   pandas operations and streamed to PostgreSQL with COPY FROM STDIN, one statement per table, instead of
+   being converted to a list of dicts and sent with executemany. Used by the profile viewer's push and by
+   MigrateStagingToLive. Connections whose driver has no COPY support fall back to executemany.
+   For upserts, frames are copied into a temporary table and merged with one INSERT ... SELECT ... ON CONFLICT
+   statement per target table (copy_to_temp, merge_rows). fingerprint_sql hashes groups of rows in SQL so
+   unchanged groups can be found without fetching them."""
+
+TOPO_COLUMNS = ['easting', 'northing', 'elevation_od', 'chainage', 'fc',
+                'profile', 'reg_id', 'survey_unit', 'date', 'year', 'month']
+MP_COLUMNS = ['profile_id', 'date', 'chainage', 'elevation', 'sequence']
+CPA_COLUMNS = ['survey_unit', 'date', 'profile', 'area']
+
+COPY_NULL = r'\N'
+
+
+def prepare_topo_rows(topo_data, survey_unit=None, date=None):
+    """
+    Topo rows in the topo_data layout. 'elevation' (the viewer's edited column) replaces 'elevation_od';
+    missing survey_unit/date are filled from the survey when given, and missing year/month from the date.
+    """
+    rows = topo_data.copy()
+    rows.columns = rows.columns.str.lower()
+    if 'elevation' in rows.columns:
+        rows['elevation_od'] = rows.pop('elevation')
+
+    rows = rows.reindex(columns=TOPO_COLUMNS)
+    if survey_unit is not None:
+        rows['survey_unit'] = rows['survey_unit'].fillna(survey_unit)
+    if date is not None:
+        rows['date'] = rows['date'].fillna(date)
+    dates = pd.to_datetime(rows['date'])
+    rows['date'] = dates.dt.date
+    rows['year'] = rows['year'].fillna(dates.dt.year).astype('Int64')
+    rows['month'] = rows['month'].fillna(dates.dt.month).astype('Int64')
+    return rows
+
+
+def prepare_mp_rows(mp_data):
+    """Master profile rows in the master_profiles layout, numbering 'sequence' per profile if it is missing."""
+    rows = mp_data.copy()
+    rows.columns = rows.columns.str.lower()
+    if 'sequence' not in rows.columns:
+        logging.warning("Sequence column missing! Adding default sequence per profile.")
+        rows['sequence'] = rows.groupby('profile_id').cumcount()
+
+    rows = rows.reindex(columns=MP_COLUMNS)
+    rows['date'] = pd.to_datetime(rows['date']).dt.date
+    rows['sequence'] = pd.to_numeric(rows['sequence'], errors='coerce').round().astype('Int64')
+    return rows
+
+
+def prepare_cpa_rows(cpa_data):
+    """CPA rows in the cpa_table layout."""
+    rows = cpa_data.copy()
+    rows.columns = rows.columns.str.lower()
+    rows = rows.reindex(columns=CPA_COLUMNS)
+    rows['date'] = pd.to_datetime(rows['date']).dt.date
+    return rows
+
+
+def to_records(rows):
+    """Rows as a list of dicts with None for missing values, for executemany."""
+    return rows.astype(object).where(rows.notna(), None).to_dict(orient='records')
+
+
+def to_copy_buffer(rows, columns):
+    """Rows as CSV text for COPY ... (FORMAT csv, NULL '\\N'), so empty strings and NULLs stay distinct."""
+    buffer = io.StringIO()
+    rows.to_csv(buffer, columns=columns, header=False, index=False, na_rep=COPY_NULL,
+                quoting=csv.QUOTE_MINIMAL, date_format='%Y-%m-%d %H:%M:%S')
+    buffer.seek(0)
+    return buffer
+
+
+def copy_rows(conn, table, rows, columns):
+    """
+    Append rows to table with COPY FROM STDIN through the connection's current transaction. Returns the
+    number of rows written.
+    """
+    if rows.empty:
+        return 0
+
+    cursor = _copy_cursor(conn)
+    if cursor is None:
+        conn.execute(text(f"""
+            INSERT INTO {table} ({', '.join(columns)})
+            VALUES ({', '.join(':' + column for column in columns)})
+        """), to_records(rows[columns]))
+        return len(rows)
+
+    statement = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')"
+    buffer = to_copy_buffer(rows, columns)
+    try:
+        if hasattr(cursor, 'copy_expert'):  # psycopg2
+            cursor.copy_expert(statement, buffer)
+        else:  # psycopg 3
+            with cursor.copy(statement) as copy:
+                copy.write(buffer.getvalue())
+    except Exception as e:
+        # Raw cursor errors bypass SQLAlchemy, wrap them so callers handle them like execute() errors
+        raise DBAPIError(statement, None, e) from e
+    finally:
+        cursor.close()
+
+    logging.debug(f"Copied {len(rows)} rows into {table}")
+    return len(rows)
+
+
+def _copy_cursor(conn):
+    """A DB-API cursor of the connection if its driver supports COPY, else None."""
+    dbapi_connection = getattr(conn, 'connection', None)
+    dbapi_connection = getattr(dbapi_connection, 'dbapi_connection', dbapi_connection)
+    if dbapi_connection is None or not hasattr(dbapi_connection, 'cursor'):
+        return None
+    cursor = dbapi_connection.cursor()
+    if hasattr(cursor, 'copy_expert') or hasattr(cursor, 'copy'):
+        return cursor
+    cursor.close()
+    return None
+
+
+def write_topo_rows(conn, table, topo_data, survey_unit, date):
+    return copy_rows(conn, table, prepare_topo_rows(topo_data, survey_unit, date), TOPO_COLUMNS)
+
+
+def write_mp_rows(conn, table, mp_data):
+    return copy_rows(conn, table, prepare_mp_rows(mp_data), MP_COLUMNS)
+
+
+def write_cpa_rows(conn, table, cpa_data):
+    return copy_rows(conn, table, prepare_cpa_rows(cpa_data), CPA_COLUMNS)
+
+
+def copy_to_temp(conn, temp_table, like_table, rows, columns):
+    """
+    COPY rows into a new temporary table with the column types of like_table, dropped when the transaction
+    commits. Returns the number of rows written.
+    """
+    conn.execute(text(f"""
+        CREATE TEMP TABLE {temp_table} ON COMMIT DROP AS
+        SELECT {', '.join(columns)} FROM {like_table} WITH NO DATA
+    """))
+    return copy_rows(conn, temp_table, rows, columns)
+
+
+def merge_rows(conn, target, source, columns, key, only_changed=True):
+    """
+    Upsert every row of source into target with one INSERT ... SELECT ... ON CONFLICT (key) statement.
+    With only_changed, existing rows are updated only if a non-key column differs. Source must not hold
+    two rows with the same key. Returns the number of rows inserted or updated.
+    """
+    update_columns = [column for column in columns if column not in key]
+    statement = f"""
+        INSERT INTO {target} AS target ({', '.join(columns)})
+        SELECT {', '.join(columns)} FROM {source} WHERE true
+        ON CONFLICT ({', '.join(key)})
+    """
+    if not update_columns:
+        statement += " DO NOTHING"
+    else:
+        statement += " DO UPDATE SET " + ", ".join(f"{column} = EXCLUDED.{column}" for column in update_columns)
+        if only_changed:
+            statement += " WHERE " + " OR ".join(f"target.{column} IS DISTINCT FROM EXCLUDED.{column}"
+                                                  for column in update_columns)
+    return conn.execute(text(statement)).rowcount
+
+
+def fingerprint_sql(source, key, columns, where="TRUE"):
+    """
+    SELECT returning key columns and an md5 'fingerprint' of each group's rows of source. Rows are rendered as
+    row values (so NULL and '' differ) and ordered by every column, so equal groups hash equally in any table
+    with the same column types.
+    """
+    ordered = ', '.join(columns)
+    return f"""
+        SELECT {', '.join(key)},
+               md5(string_agg(ROW({ordered})::text, ',' ORDER BY {ordered})) AS fingerprint
+        FROM {source}
+        WHERE {where}
+        GROUP BY {', '.join(key)}
+    """
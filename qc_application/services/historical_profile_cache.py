@@ -0,0 +1,198 @@
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+"""Cache of historical topo surveys for the profile viewer's overlays. All past surveys of every profile in a
+   survey unit are fetched in one query (only date, profile, chainage and elevation) when a viewer session
+   opens, and split into chainage/elevation arrays per profile and date. Units are kept in an LRU across viewer
+   sessions, so turning overlays on needs no database access; migrating staged data to the live tables evicts
+   the units it touched. profile_envelope summarises a profile's past
+   surveys on a common chainage grid so the viewer can draw them as one band."""
+
+ENVELOPE_STEP = 1.0  # Chainage grid spacing (m)
+ENVELOPE_PERCENTILES = (10, 90)
+
+
+def split_history(topo_data):
+    """
+    Split historical topo rows into {profile: {date: {'chainage': ndarray, 'elevation': ndarray}}}.
+
+    Each date's points are de-duplicated on (chainage, elevation) and sorted by chainage, dates are newest
+    first. 'elevation_od' is used when there is no 'elevation' column.
+    """
+    if topo_data.empty:
+        return {}
+
+    elevation = topo_data['elevation'] if 'elevation' in topo_data.columns else topo_data['elevation_od']
+    data = pd.DataFrame({
+        'profile': topo_data['profile'].astype(str).to_numpy(),
+        'date': pd.to_datetime(topo_data['date']).to_numpy(),
+        'chainage': pd.to_numeric(topo_data['chainage'], errors='coerce').to_numpy(dtype=float),
+        'elevation': pd.to_numeric(elevation, errors='coerce').to_numpy(dtype=float),
+    })
+    data = data.drop_duplicates().sort_values(['profile', 'date', 'chainage'], ascending=[True, False, True],
+                                              kind='stable')
+
+    profiles = data['profile'].to_numpy()
+    dates = data['date'].to_numpy()
+    chainage = data['chainage'].to_numpy()
+    elevation = data['elevation'].to_numpy()
+
+    # One slice per (profile, date) run of the sorted rows
+    starts = np.flatnonzero(np.r_[True, (profiles[1:] != profiles[:-1]) | (dates[1:] != dates[:-1])])
+    ends = np.r_[starts[1:], len(data)]
+
+    history = {}
+    for start, end in zip(starts, ends):
+        history.setdefault(profiles[start], {})[pd.Timestamp(dates[start])] = {
+            'chainage': chainage[start:end],
+            'elevation': elevation[start:end],
+        }
+    return history
+
+
+def profile_envelope(profile_history, exclude_dates=(), step=ENVELOPE_STEP, percentiles=ENVELOPE_PERCENTILES):
+    """
+    Elevation envelope of a profile's past surveys ({date: arrays} from split_history) on a common chainage grid.
+
+    Each survey is interpolated onto the grid within its own chainage range only. Returns a dict with
+    'chainage', 'min', 'max', 'mean', 'percentiles' ({p: array}) and 'surveys' (count), where grid points no
+    survey covers are NaN, or None if no survey has two valid points.
+    """
+    exclude_dates = {pd.Timestamp(date) for date in exclude_dates}
+    surveys = []
+    for date, arrays in profile_history.items():
+        finite = np.isfinite(arrays['chainage']) & np.isfinite(arrays['elevation'])
+        if pd.Timestamp(date) not in exclude_dates and finite.sum() >= 2:
+            surveys.append((arrays['chainage'][finite], arrays['elevation'][finite]))
+    if not surveys:
+        return None
+
+    start = np.floor(min(x[0] for x, _ in surveys) / step) * step
+    grid = np.arange(start, max(x[-1] for x, _ in surveys) + step, step)
+    elevations = np.vstack([np.interp(grid, x, y, left=np.nan, right=np.nan) for x, y in surveys])
+
+    covered = np.isfinite(elevations).any(axis=0)
+    summary = {'min': np.nanmin, 'max': np.nanmax, 'mean': np.nanmean}
+    envelope = {'chainage': grid, 'surveys': len(surveys)}
+    for name, reduce in summary.items():
+        envelope[name] = np.full(len(grid), np.nan)
+        envelope[name][covered] = reduce(elevations[:, covered], axis=0)
+    envelope['percentiles'] = {}
+    for p in percentiles:
+        envelope['percentiles'][p] = np.full(len(grid), np.nan)
+        envelope['percentiles'][p][covered] = np.nanpercentile(elevations[:, covered], p, axis=0)
+    return envelope
+
+
+def fetch_history(profiles):
+    """Fetch and split the historical surveys of profiles in one query, None if the DB is unavailable."""
+    from qc_application.utils.database_connection import establish_connection
+
+    conn = establish_connection()
+    if not conn:
+        logging.warning("Historical profiles not loaded due to DB connection failure.")
+        return None
+
+    try:
+        topo_data = pd.read_sql_query(
+            text("""
+                SELECT date, profile, chainage, elevation_od
+                FROM topo_qc.topo_data
+                WHERE profile = ANY(:profiles)
+            """),
+            conn,
+            params={"profiles": list(profiles)},
+        )
+    finally:
+        conn.close()
+
+    history = split_history(topo_data)
+    logging.info(f"Loaded {len(topo_data)} historical topo rows for {len(history)} of {len(profiles)} profiles.")
+    return history
+
+
+class HistoricalProfileCache:
+    """LRU of split historical surveys per survey unit. Loads run on a background thread."""
+
+    def __init__(self, max_units=4, loader=fetch_history):
+        self.max_units = max_units
+        self.loader = loader
+
+        self._units = OrderedDict()  # {survey_unit: (frozenset of profiles, Future)}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="historical-profiles")
+
+    def _future(self, survey_unit, profiles):
+        profiles = frozenset(str(profile) for profile in profiles)
+        with self._lock:
+            entry = self._units.get(survey_unit)
+            if entry is not None and profiles <= entry[0] and not self._failed(entry[1]):
+                self._units.move_to_end(survey_unit)
+                return entry[1]
+
+            future = self._executor.submit(self.loader, sorted(profiles))
+            self._units[survey_unit] = (profiles, future)
+            self._units.move_to_end(survey_unit)
+            while len(self._units) > self.max_units:
+                self._units.popitem(last=False)
+            return future
+
+    @staticmethod
+    def _failed(future):
+        """Finished without history (DB unavailable or query error), so it should be fetched again."""
+        return future.done() and (future.exception() is not None or future.result() is None)
+
+    def prefetch(self, survey_unit, profiles):
+        """Start loading a unit in the background if it is not cached."""
+        self._future(survey_unit, profiles)
+
+    def get(self, survey_unit, profiles):
+        """
+        {profile: {date: arrays}} for the unit (see split_history), waiting for a load in progress.
+        Returns None if the history could not be loaded.
+        """
+        try:
+            return self._future(survey_unit, profiles).result()
+        except Exception as e:
+            logging.error(f"Failed to load historical profiles for {survey_unit}: {e}", exc_info=True)
+            return None
+
+    def evict_profiles(self, profiles):
+        """
+        Drop every cached unit holding any of profiles, e.g. after their live topo data changed, so the next
+        viewer session of the unit fetches it again. Returns the evicted survey units.
+        """
+        profiles = {str(profile) for profile in profiles}
+        with self._lock:
+            stale = [unit for unit, (unit_profiles, _) in self._units.items() if unit_profiles & profiles]
+            for unit in stale:
+                del self._units[unit]
+        if stale:
+            logging.info(f"Historical profiles of {stale} evicted, their live topo data changed.")
+        return stale
+
+    def clear(self):
+        with self._lock:
+            self._units.clear()
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_historical_profile_cache():
+    """Return the process-wide historical profile cache, sized by the 'historical_cache_max_units' setting."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            from qc_application.config.app_settings import AppSettings
+
+            settings = AppSettings()
+            _shared_cache = HistoricalProfileCache(max_units=int(settings.get("historical_cache_max_units", 4)))
+        return _shared_cache
@@ -0,0 +1,117 @@
+import logging
+import pickle
+import sqlite3
+import tempfile
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+"""Single-file store for a profile viewer session. Holds the edited survey profile, master profile and CPA row of
+   every profile touched in the session, replacing the per-profile pickles that used to be written to
+   %TEMP%/New_Profile_Data, New_MP_Data and Calculated_CPA_Values. One SQLite file per survey unit and date,
+   each write is a single transaction."""
+
+SURVEY = "survey"
+MASTER = "master"
+CPA = "cpa"
+KINDS = (SURVEY, MASTER, CPA)
+
+
+def default_session_folder():
+    return Path(tempfile.gettempdir()) / "QC_Tool_Sessions"
+
+
+class ProfileSessionStore:
+    """DataFrames for one survey session keyed by (kind, profile), where kind is 'survey', 'master' or 'cpa'."""
+
+    def __init__(self, survey_unit, date, folder=None):
+        folder = Path(folder) if folder else default_session_folder()
+        folder.mkdir(parents=True, exist_ok=True)
+        self.path = folder / f"{survey_unit}_{pd.Timestamp(date).strftime('%Y%m%d')}.sqlite"
+
+        self._lock = threading.Lock()  # The viewer prefetches profiles on background threads
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._db:
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS session_frames (
+                    kind TEXT NOT NULL,
+                    profile TEXT NOT NULL,
+                    data BLOB NOT NULL,
+                    updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (kind, profile)
+                )
+            """)
+        logging.info(f"Profile session store: {self.path}")
+
+    @staticmethod
+    def _check_kind(kind):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown session data kind '{kind}', expected one of {KINDS}")
+
+    def write(self, profile, replace=None, if_missing=None):
+        """
+        Store frames for a profile in one transaction.
+        replace: {kind: DataFrame} written over any existing frame.
+        if_missing: {kind: DataFrame} only written when the profile has no frame of that kind yet (keeps edits).
+        """
+        rows = []
+        for frames, verb in ((replace or {}, "INSERT OR REPLACE"), (if_missing or {}, "INSERT OR IGNORE")):
+            for kind, df in frames.items():
+                self._check_kind(kind)
+                rows.append((verb, kind, pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)))
+
+        with self._lock, self._db:
+            for verb, kind, blob in rows:
+                self._db.execute(f"{verb} INTO session_frames (kind, profile, data) VALUES (?, ?, ?)",
+                                 (kind, str(profile), blob))
+
+    def get(self, kind, profile):
+        """The stored frame, or None if there is none."""
+        self._check_kind(kind)
+        with self._lock:
+            row = self._db.execute("SELECT data FROM session_frames WHERE kind = ? AND profile = ?",
+                                   (kind, str(profile))).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def delete(self, profile, kinds=KINDS):
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM session_frames WHERE kind = ? AND profile = ?",
+                                 [(kind, str(profile)) for kind in kinds])
+
+    def profiles(self, kind):
+        """Set of profiles that have a frame of this kind."""
+        self._check_kind(kind)
+        with self._lock:
+            rows = self._db.execute("SELECT profile FROM session_frames WHERE kind = ?", (kind,)).fetchall()
+        return {row[0] for row in rows}
+
+    def load_all(self):
+        """{kind: list of (profile, DataFrame)} for the whole session, read in one query."""
+        with self._lock:
+            rows = self._db.execute("SELECT kind, profile, data FROM session_frames ORDER BY kind, profile").fetchall()
+        frames = {kind: [] for kind in KINDS}
+        for kind, profile, blob in rows:
+            frames[kind].append((profile, pickle.loads(blob)))
+        return frames
+
+    def load_combined(self):
+        """{kind: DataFrame} with every profile's frames of each kind concatenated (empty frames if none)."""
+        combined = {}
+        for kind, frames in self.load_all().items():
+            combined[kind] = pd.concat([df for _, df in frames], ignore_index=True) if frames else pd.DataFrame()
+        return combined
+
+    def has_data(self):
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM session_frames LIMIT 1").fetchone() is not None
+
+    def clear(self):
+        """Remove everything stored for the session."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM session_frames")
+        logging.info(f"Cleared profile session store {self.path}")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,114 @@
+import logging
+
+from sqlalchemy import text
+
+from qc_application.services.bulk_write_service import (
+    CPA_COLUMNS, TOPO_COLUMNS, write_cpa_rows, write_topo_rows
+)
+
+"""Per-profile writes of profile viewer edits to the database, used by the optional write-behind mode (see
+   workers/staging_sync.py). While the operator works, each saved profile's topo rows and CPA value are upserted
+   into pending tables next to the staging tables (created by the migration in qc_application/migrations), one
+   profile per transaction, so syncing a profile again is harmless. The final push then moves the survey from the pending tables into staging_data server-side.
+   Pending rows are never read by MigrateStagingToLive, so an unfinished or discarded session cannot reach the
+   live tables."""
+
+PENDING_TABLES = {
+    "staging_data.topo_data": "staging_data.write_behind_topo_data",
+    "staging_data.cpa_table": "staging_data.write_behind_cpa_table",
+}
+
+
+PENDING_TABLES_MIGRATION = "qc_application/migrations/001_write_behind_pending_tables.sql"
+
+
+def check_pending_tables(conn):
+    """
+    Raise RuntimeError if a pending table is missing. They are created by PENDING_TABLES_MIGRATION, not at
+    runtime, as operators need no CREATE rights on staging_data.
+    """
+    missing = [pending_table for pending_table in PENDING_TABLES.values()
+               if conn.execute(text("SELECT to_regclass(:name)"), {"name": pending_table}).scalar() is None]
+    if missing:
+        raise RuntimeError(f"Write-behind tables {', '.join(missing)} do not exist, "
+                           f"apply {PENDING_TABLES_MIGRATION} to the database.")
+
+
+def sync_profile(conn, survey_unit, date, profile, topo_data, cpa_data):
+    """Replace one profile's pending topo rows and CPA value for the survey, in one transaction."""
+    key = {"survey_unit": survey_unit, "date": date, "profile": str(profile)}
+
+    with conn.begin():
+        conn.execute(text("""
+            DELETE FROM staging_data.write_behind_topo_data
+            WHERE survey_unit = :survey_unit AND date = :date AND reg_id = :profile
+        """), key)
+        if topo_data is not None:
+            write_topo_rows(conn, "staging_data.write_behind_topo_data", topo_data, survey_unit, date)
+
+        conn.execute(text("""
+            DELETE FROM staging_data.write_behind_cpa_table
+            WHERE survey_unit = :survey_unit AND date = :date AND profile = :profile
+        """), key)
+        if cpa_data is not None:
+            write_cpa_rows(conn, "staging_data.write_behind_cpa_table", cpa_data)
+
+
+def discard_pending(conn, survey_unit, date):
+    """Remove the survey's pending rows (a discarded session, or leftovers from one that crashed)."""
+    params = {"survey_unit": survey_unit, "date": date}
+    with conn.begin():
+        for pending_table in PENDING_TABLES.values():
+            conn.execute(text(f"DELETE FROM {pending_table} WHERE survey_unit = :survey_unit AND date = :date"),
+                         params)
+
+
+def publish_pending(conn, survey_unit, date, user_name):
+    """
+    Final push of a write-behind session: back up the live rows to history, then replace the survey's staged
+    topo and CPA rows with its pending rows, and clear them, in one transaction.
+    """
+    params = {"survey_unit": survey_unit, "date": date}
+    with conn.begin():
+        conn.execute(text("LOCK TABLE staging_data.topo_data IN EXCLUSIVE MODE"))
+        conn.execute(text("LOCK TABLE staging_data.cpa_table IN EXCLUSIVE MODE"))
+        backup_topo_history(conn, survey_unit, date, user_name)
+        backup_cpa_history(conn, survey_unit, date, user_name)
+
+        for (staging_table, pending_table), columns in zip(PENDING_TABLES.items(), (TOPO_COLUMNS, CPA_COLUMNS)):
+            conn.execute(text(f"DELETE FROM {staging_table} WHERE survey_unit = :survey_unit AND date = :date"),
+                         params)
+            moved = conn.execute(text(f"""
+                INSERT INTO {staging_table} ({', '.join(columns)})
+                SELECT {', '.join(columns)} FROM {pending_table}
+                WHERE survey_unit = :survey_unit AND date = :date
+            """), params).rowcount
+            conn.execute(text(f"DELETE FROM {pending_table} WHERE survey_unit = :survey_unit AND date = :date"),
+                         params)
+            logging.info(f"Moved {moved} write-behind rows into {staging_table}")
+
+
+def backup_topo_history(conn, survey_unit, date, user_name):
+    """Copy the live topo rows of the survey into staging_data.topo_data_history (run inside a transaction)."""
+    conn.execute(text("""
+        INSERT INTO staging_data.topo_data_history (
+            easting, northing, elevation_od, chainage, fc,
+            profile, reg_id, survey_unit, date, year, month, changed_at, user_name
+        )
+        SELECT easting, northing, elevation_od, chainage, fc,
+               profile, reg_id, survey_unit, date, year, month, now(), :user_name
+        FROM topo_qc.topo_data
+        WHERE survey_unit = :survey_unit AND date = :date
+    """), {"survey_unit": survey_unit, "date": date, "user_name": user_name})
+
+
+def backup_cpa_history(conn, survey_unit, date, user_name):
+    """Copy the live CPA rows of the survey into staging_data.cpa_table_history (run inside a transaction)."""
+    conn.execute(text("""
+        INSERT INTO staging_data.cpa_table_history (
+            survey_unit, date, profile, area, changed_at, user_name
+        )
+        SELECT survey_unit, date, profile, area, now(), :user_name
+        FROM topo_qc.cpa_table
+        WHERE survey_unit = :survey_unit AND date = :date
+    """), {"survey_unit": survey_unit, "date": date, "user_name": user_name})
@@ -0,0 +1,204 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+"""Content-addressed cache for CPA results. The key is a fingerprint of the exact geometry the area engine sees
+   (survey and master profile vertices), so the same profile is never recalculated on load, save, delete or
+   migration. Entries are held in an in-memory LRU and optionally persisted to a local SQLite file, which is
+   bounded to the same number of entries by dropping the least recently used rows."""
+
+# Bump when the area engine changes so persisted results from an older engine are not reused
+CPA_ENGINE_VERSION = "piecewise-linear-1"
+
+# Rows past the newest max_entries by last use
+PRUNE_SQL = """
+    DELETE FROM cpa_cache WHERE key IN (
+        SELECT key FROM cpa_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+    )
+"""
+
+
+def cpa_fingerprint(master_chainage, master_elevation, chainage, elevation):
+    """
+    Hash the inputs of a CPA calculation.
+
+    The master profile is hashed in section order. The survey is normalised the way the area engine
+    normalises it (non-finite rows dropped, stable sort by chainage) so CalculateCPATool and batch_cpa
+    produce the same key for the same profile.
+    """
+    mc = np.ascontiguousarray(master_chainage, dtype=np.float64)
+    me = np.ascontiguousarray(master_elevation, dtype=np.float64)
+    x = np.asarray(chainage, dtype=np.float64)
+    y = np.asarray(elevation, dtype=np.float64)
+
+    finite = np.isfinite(x) & np.isfinite(y)
+    x = x[finite]
+    y = y[finite]
+    order = np.argsort(x, kind='stable')
+
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(CPA_ENGINE_VERSION.encode())
+    for values in (mc, me, np.ascontiguousarray(x[order]), np.ascontiguousarray(y[order])):
+        digest.update(len(values).to_bytes(8, 'little'))
+        digest.update(values.tobytes())
+    return digest.hexdigest()
+
+
+class CPACache:
+    """
+    Thread-safe LRU cache of CPA areas keyed by cpa_fingerprint, with optional SQLite persistence. The file
+    keeps at most max_entries rows: each row records when it was last used, uses are written with the next
+    batch of results, and older rows are deleted after every batch and on close.
+    """
+
+    def __init__(self, max_entries=50_000, db_path=None):
+        self.max_entries = max_entries
+        self.db_path = Path(db_path) if db_path else None
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._used = {}  # {key: last use} not yet written to the database
+        self._last_stamp = 0
+        self._lock = threading.Lock()
+        self._db = None
+
+        if self.db_path is not None:
+            try:
+                self.db_path.parent.mkdir(parents=True, exist_ok=True)
+                self._db = sqlite3.connect(str(self.db_path), check_same_thread=False)
+                with self._db:
+                    self._db.execute("CREATE TABLE IF NOT EXISTS cpa_cache (key TEXT PRIMARY KEY, area REAL NOT NULL, "
+                                     "last_used INTEGER NOT NULL DEFAULT 0)")
+                    columns = {row[1] for row in self._db.execute("PRAGMA table_info(cpa_cache)")}
+                    if "last_used" not in columns:  # Cache files written before the size bound
+                        self._db.execute("ALTER TABLE cpa_cache ADD COLUMN last_used INTEGER NOT NULL DEFAULT 0")
+                    self._db.execute("CREATE INDEX IF NOT EXISTS cpa_cache_last_used ON cpa_cache (last_used)")
+                    self._last_stamp = self._db.execute(
+                        "SELECT COALESCE(MAX(last_used), 0) FROM cpa_cache").fetchone()[0]
+            except sqlite3.Error as e:
+                logging.warning(f"CPA cache persistence disabled, could not open {self.db_path}: {e}")
+                self._db = None
+
+    def _remember(self, key, area):
+        self._entries[key] = area
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        """Return the cached area for key, or None on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._mark_used(key)
+                self.hits += 1
+                return self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute("SELECT area FROM cpa_cache WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._remember(key, row[0])
+                    self._mark_used(key)
+                    self.hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def _stamp(self):
+        """Wall-clock nanoseconds, strictly increasing within the process (the clock can tie on Windows)."""
+        self._last_stamp = max(time.time_ns(), self._last_stamp + 1)
+        return self._last_stamp
+
+    def _mark_used(self, key):
+        if self._db is not None:
+            self._used[key] = self._stamp()
+
+    def _persist(self, areas):
+        """Write areas and pending last uses, then drop the oldest rows past max_entries (lock held)."""
+        now = self._stamp()
+        try:
+            with self._db:
+                self._db.executemany("UPDATE cpa_cache SET last_used = ? WHERE key = ?",
+                                     [(used, key) for key, used in self._used.items()])
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO cpa_cache (key, area, last_used) VALUES (?, ?, ?)",
+                    [(key, float(area), now) for key, area in areas.items()],
+                )
+                self._db.execute(PRUNE_SQL, (self.max_entries,))
+            self._used.clear()
+        except sqlite3.Error as e:
+            logging.warning(f"Failed to persist CPA cache entries: {e}")
+
+    def put(self, key, area):
+        self.put_many({key: area})
+
+    def put_many(self, areas):
+        """Store a {key: area} mapping, persisting it in one transaction when a database is configured."""
+        if not areas:
+            return
+        with self._lock:
+            for key, area in areas.items():
+                self._remember(key, float(area))
+
+            if self._db is not None:
+                self._persist(areas)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "persistent": self._db is not None,
+            }
+
+    def clear(self):
+        """Drop every entry (memory and disk) and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._used.clear()
+            self.hits = 0
+            self.misses = 0
+            if self._db is not None:
+                with self._db:
+                    self._db.execute("DELETE FROM cpa_cache")
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._persist({})
+                self._db.close()
+                self._db = None
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_cpa_cache():
+    """
+    Return the process-wide CPA cache. It is persisted to the 'cpa_cache_path' setting, which defaults to
+    cpa_cache.sqlite next to the config file; set it to an empty string to keep the cache in memory only.
+    """
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            from qc_application.config.app_settings import AppSettings
+
+            settings = AppSettings()
+            _shared_cache = CPACache(
+                max_entries=int(settings.get("cpa_cache_max_entries", 50_000)),
+                db_path=settings.get("cpa_cache_path", str(settings.config_path.parent / "cpa_cache.sqlite")) or None,
+            )
+        return _shared_cache
@@ -1,18 +1,39 @@
 import logging
 import pandas as pd
-from sqlalchemy.exc import OperationalError, SQLAlchemyError
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy import text
-from qc_application.services.topo_calculate_cpa_service import CalculateCPATool
+from qc_application.config.app_settings import AppSettings
+from qc_application.services.bulk_write_service import (
+    CPA_COLUMNS, MP_COLUMNS, TOPO_COLUMNS, copy_to_temp, fingerprint_sql, merge_rows, prepare_cpa_rows
+)
+from qc_application.services.topo_calculate_cpa_service import batch_cpa
+from qc_application.services.historical_profile_cache import get_historical_profile_cache
+from qc_application.services.topo_cpa_cache_service import get_cpa_cache
 from qc_application.utils.database_connection import establish_connection
 
+settings = AppSettings()
+
+CPA_KEY = ['survey_unit', 'date', 'profile']
+TOPO_KEY = ['profile', 'date', 'chainage']
+TOPO_GROUP = ['profile', 'date']
+
+# The last staged row of a duplicated key wins, as the pandas drop_duplicates(keep='last') did. staged_seq is
+# the staging tables' insertion serial (qc_application/migrations/002_staged_row_sequence.sql)
+LAST_STAGED_ROW_FIRST = "staged_seq DESC"
+
+# Columns hashed per Master Profile and per (profile, date) survey to detect changes
+MP_FINGERPRINT_COLUMNS = ['sequence', 'chainage', 'elevation', 'date']
+TOPO_FINGERPRINT_COLUMNS = ['chainage', 'easting', 'northing', 'elevation_od', 'fc', 'reg_id', 'survey_unit',
+                            'year', 'month']
+
 class MigrateStagingToLive:
 
     def __init__(self, edit_mode = 'qc',  edit_mode_target = None):
 
         self. conn = None
-        self.all_mp_data =None
-        self.all_topo_data = None
-        self.all_cpa_data = None
+        self.staging_counts = {}  # Rows in scope per staging table
+        self.changed_mp_data = None  # Staged rows of changed Master Profiles only
+        self.recalculated_cpa_data = pd.DataFrame(columns=CPA_COLUMNS)
         self.changed_mp_profiles = []
         self.edit_mode = edit_mode  # 'qc' or 'edit'
         self.edit_mode_target = edit_mode_target  # (unique_profiles ->list, date) tuple if in 'edit' mode
@@ -26,7 +47,7 @@ class MigrateStagingToLive:
         new_cpa_data = self.calculate_addition_cpa_for_changed_mps()
         if not new_cpa_data.empty:
             new_cpa_data.columns = new_cpa_data.columns.str.lower()
-            self.all_cpa_data =  pd.concat([self.all_cpa_data, new_cpa_data], ignore_index=True)
+            self.recalculated_cpa_data = new_cpa_data
 
 
         update_successful = self.update_live_tables()
@@ -38,194 +59,115 @@ class MigrateStagingToLive:
             logging.error("Data migration failed during live table update.")
             return False
 
-    def check_all_tables_have_matching_data(self, cpa_df, mp_df, topo_df):
-        #Format column headers so comparisons can be made
-
-        all_survey_units = list(cpa_df['survey_unit'].unique())
-        all_profiles = list(cpa_df['profile'].unique())
-
-        # check mp has exactly the same profiles as cpa, duplicates are okay
-        mp_profiles = list(mp_df['profile_id'].unique())
-        for profile in all_profiles:
-            if profile not in mp_profiles:
-                logging.error(f"Profile {profile} in CPA data not found in Master Profile data.")
-                return False
-
-
-        # check topo has exactly the same survey units as cpa, duplicates are okay
-        topo_survey_units = list(topo_df['survey_unit'].unique())
-        for survey_unit in all_survey_units:
-            if survey_unit not in topo_survey_units:
-                logging.error(f"Survey Unit {survey_unit} in CPA data not found in Topo data.")
-                return False
-
-        # check topo has exactly the same survey units as cpa, duplicates are okay
-        topo_profiles = list(topo_df['profile'].unique())
-        for profile in all_profiles:
-            if profile not in topo_profiles:
-                logging.error(f"Profile {profile} in CPA data not found in Topo data.")
-                return False
-        return True
-
-    def check_for_mp_changes(self, mp_df):
-        # Get list of IDs from incoming data
-        all_new_mp_ids = list(mp_df['profile_id'].unique())
-
-        # Query current data from the database
-        get_current_mp_data_result = self.conn.execute(text("""
-            SELECT *
-            FROM topo_qc.master_profiles 
-            WHERE profile_id IN :mp_ids
-        """), {"mp_ids": tuple(all_new_mp_ids)})
-
-        current_mp_data = pd.DataFrame(
-            get_current_mp_data_result.fetchall(),
-            columns=get_current_mp_data_result.keys()
-        )
-
-        # Ensure both datasets are sorted and column-aligned
-        mp_df_sorted = mp_df.sort_values("profile_id").reset_index(drop=True)
-        current_mp_data_sorted = current_mp_data.sort_values("profile_id").reset_index(drop=True)
-
-        # If shapes differ, changes exist
-        if mp_df_sorted.shape != current_mp_data_sorted.shape:
-            logging.info("Master Profile structure changed.")
-            return True, None
-
-        # Compare dataframes
-        diff = mp_df_sorted.compare(current_mp_data_sorted)
-
-        if diff.empty:
-            # No changes detected
-            logging.info("No changes in Master Profile data.")
-            return False, None
-
-        # Identify changed profile_id values
-        changed_profile_ids = mp_df_sorted.loc[diff.index, "profile_id"].unique().tolist()
-
-        logging.info(f"Changes detected in Master Profile data for profile_id(s): {changed_profile_ids}")
-
-        return True, changed_profile_ids
+    def staging_scope(self, profile_column='profile', with_date=True):
+        """WHERE clause selecting the staging rows to migrate: the edited profiles in 'edit' mode, else all."""
+        if self.edit_mode != 'edit':
+            return "TRUE"
+        clause = f"{profile_column} = ANY(:profile_ids)"
+        return f"{clause} AND date = :date" if with_date else clause
+
+    def scope_params(self):
+        if self.edit_mode != 'edit':
+            return {}
+        return {"profile_ids": list(self.edit_mode_target[0]), "date": self.edit_mode_target[1]}
+
+    def count_staging_rows(self):
+        result = self.conn.execute(text(f"""
+            SELECT
+                (SELECT count(*) FROM staging_data.cpa_table WHERE {self.staging_scope()}) AS cpa_table,
+                (SELECT count(*) FROM staging_data.master_profiles
+                 WHERE {self.staging_scope('profile_id', with_date=False)}) AS master_profiles,
+                (SELECT count(*) FROM staging_data.topo_data WHERE {self.staging_scope()}) AS topo_data
+        """), self.scope_params())
+        return dict(result.mappings().one())
+
+    def check_all_tables_have_matching_data(self):
+        """
+        Anti-join the staging tables: every CPA profile needs a Master Profile and topo rows, and every CPA survey
+        unit needs topo rows. Returns {check: [missing values]}, empty if the tables match.
+        """
+        cpa_scope = self.staging_scope()
+        mp_scope = self.staging_scope('profile_id', with_date=False)
+        result = self.conn.execute(text(f"""
+            SELECT 'Master Profile profile' AS missing_from, value FROM (
+                SELECT profile AS value FROM staging_data.cpa_table WHERE {cpa_scope}
+                EXCEPT
+                SELECT profile_id FROM staging_data.master_profiles WHERE {mp_scope}
+            ) AS missing_mp_profiles
+            UNION ALL
+            SELECT 'Topo survey unit', value FROM (
+                SELECT survey_unit AS value FROM staging_data.cpa_table WHERE {cpa_scope}
+                EXCEPT
+                SELECT survey_unit FROM staging_data.topo_data WHERE {cpa_scope}
+            ) AS missing_topo_survey_units
+            UNION ALL
+            SELECT 'Topo profile', value FROM (
+                SELECT profile AS value FROM staging_data.cpa_table WHERE {cpa_scope}
+                EXCEPT
+                SELECT profile FROM staging_data.topo_data WHERE {cpa_scope}
+            ) AS missing_topo_profiles
+        """), self.scope_params())
+
+        mismatches = {}
+        for missing_from, value in result.fetchall():
+            mismatches.setdefault(missing_from, []).append(value)
+        for missing_from, values in mismatches.items():
+            logging.error(f"{len(values)} value(s) in CPA data not found in {missing_from} data: {sorted(values)}")
+        return mismatches
+
+    def check_for_mp_changes(self):
+        """Profile ids whose staged Master Profile rows differ from the live ones, compared by fingerprint."""
+        mp_scope = self.staging_scope('profile_id', with_date=False)
+        result = self.conn.execute(text(f"""
+            WITH staged AS (
+                {fingerprint_sql("staging_data.master_profiles", ['profile_id'], MP_FINGERPRINT_COLUMNS, mp_scope)}
+            ),
+            live AS (
+                {fingerprint_sql("topo_qc.master_profiles", ['profile_id'], MP_FINGERPRINT_COLUMNS,
+                                 "profile_id IN (SELECT profile_id FROM staged)")}
+            )
+            SELECT staged.profile_id
+            FROM staged LEFT JOIN live USING (profile_id)
+            WHERE live.fingerprint IS DISTINCT FROM staged.fingerprint
+            ORDER BY staged.profile_id
+        """), self.scope_params())
+        return [row[0] for row in result.fetchall()]
 
     def verify_data(self):
-        # 1) Get Master Profile Data
-
+        """Check the staging tables in SQL. Only the changed Master Profiles are loaded, for CPA recomputation."""
         if not self.conn:
             try:
                 self.conn = establish_connection()
-            except Exception as e:
-                self.status_label.setText("Error: Could not connect to database")
-
+            except Exception:
+                logging.error("Error: Could not connect to database")
+                return False
+            if not self.conn:
                 return False
 
         try:
-
-            if self.edit_mode:
-                staging_cpa_data_result = self.conn.execute(
-                    text("""
-                            SELECT *
-                            FROM staging_data.cpa_table
-                            WHERE profile = ANY(:profile_ids)
-                              AND date = :date
-                        """),
-                    {
-                        "profile_ids": self.edit_mode_target[0],  # must be a tuple/list
-                        "date": self.edit_mode_target[1]
-                    }
-                )
-            else:
-
-                staging_cpa_data_result = self.conn.execute(text("""
-                    SELECT *
-                    FROM staging_data.cpa_table
-                """))
-
-            self.all_cpa_data = pd.DataFrame(
-                staging_cpa_data_result.fetchall(),
-                columns=staging_cpa_data_result.keys()
-            )
-
-            if self.edit_mode:
-                staging_mp_data_result = self.conn.execute(
-                    text("""
-                        SELECT *
-                        FROM staging_data.master_profiles
-                        WHERE profile_id = ANY(:profile_ids)
-                         
-                    """),
-                    {
-                        "profile_ids": self.edit_mode_target[0],  # must be a tuple/list
-
-                    }
-                )
-            else:
-
-
-                staging_mp_data_result = self.conn.execute(text("""
-                               SELECT *
-                               FROM staging_data.master_profiles
-                           """))
-
-
-
-            self.all_mp_data = pd.DataFrame(
-                staging_mp_data_result.fetchall(),
-                columns=staging_mp_data_result.keys()
-            )
-
-
-            if self.edit_mode:
-                staging_topo_data_result = self.conn.execute(
-                    text("""
-                        SELECT *
-                        FROM staging_data.topo_data
-                        WHERE profile = ANY(:profile_ids)
-                          AND date = :date
-                    """),
-                    {
-                        "profile_ids": self.edit_mode_target[0],  # must be a tuple/list
-                        "date": self.edit_mode_target[1]
-                    }
-                )
-            else:
-
-                staging_topo_data_result = self.conn.execute(text("""
-                                           SELECT *
-                                           FROM staging_data.topo_data
-                                       """))
-
-            self.all_topo_data = pd.DataFrame(
-                staging_topo_data_result.fetchall(),
-                columns=staging_topo_data_result.keys()
-            )
-
-            if self.all_cpa_data.empty or self.all_mp_data.empty or self.all_topo_data.empty:
-
+            self.staging_counts = self.count_staging_rows()
+            logging.info(f"Staging rows to migrate: {self.staging_counts}")
+            if not all(self.staging_counts.values()):
                 logging.error("One or more staging tables are empty.")
                 return False
 
-            print("Staging CPA Data:")
-            print(self.all_cpa_data)
-            print("Staging Master Profile Data:")
-            print(self.all_mp_data)
-            print("Staging Topo Data:")
-            print(self.all_topo_data)
-
-            match_check = self.check_all_tables_have_matching_data(self.all_cpa_data, self.all_mp_data, self.all_topo_data)
-            if not match_check:
+            if self.check_all_tables_have_matching_data():
                 logging.error("Data mismatch between staging tables. Migration aborted.")
                 return False
-            print(match_check)
 
-            mp_changes_check, changed_profiles = self.check_for_mp_changes(self.all_mp_data)
-            print(mp_changes_check, changed_profiles)
-            if mp_changes_check:
-                self.changed_mp_profiles = changed_profiles
-                logging.info("Master Profile changes detected.")
+            self.changed_mp_profiles = self.check_for_mp_changes()
+            if self.changed_mp_profiles:
+                logging.info(f"Changes detected in Master Profile data for profile_id(s): {self.changed_mp_profiles}")
+                self.changed_mp_data = pd.read_sql_query(
+                    text("SELECT * FROM staging_data.master_profiles WHERE profile_id = ANY(:profile_ids)"),
+                    self.conn,
+                    params={"profile_ids": self.changed_mp_profiles},
+                )
+            else:
+                logging.info("No changes in Master Profile data.")
 
             return True
 
-
         except SQLAlchemyError as e:
             logging.error(f"Database query error: {e}")
             return None
@@ -233,42 +175,32 @@ class MigrateStagingToLive:
     def calculate_addition_cpa_for_changed_mps(self):
         if not self.changed_mp_profiles:
             logging.info("No changed Master Profiles to recalculate CPA for.")
-            return pd.DataFrame
-
-        recalculated_cpa_dfs = []
-
-        for profile_id in self.changed_mp_profiles:
-
-            # Get exsiting topo data for this profile
-            existing_profile_topo_data_result  = self.conn.execute(text(""" 
-                SELECT *
-                FROM topo_qc.topo_data
-                WHERE profile = :profile_id
-            """), {"profile_id": profile_id})
-            existing_profile_topo_data = pd.DataFrame(
-                existing_profile_topo_data_result.fetchall(),
-                columns=existing_profile_topo_data_result.keys()
-            )
-
-            unique_survey_dates = existing_profile_topo_data['date'].unique()
-            for survey_date in unique_survey_dates:
-                profile_topo_data = existing_profile_topo_data[existing_profile_topo_data['date'] == survey_date]
+            return pd.DataFrame()
+
+        # Get existing topo data for every changed profile and survey date in one query
+        existing_topo_data_result = self.conn.execute(text("""
+            SELECT survey_unit, date, profile, chainage, elevation_od
+            FROM topo_qc.topo_data
+            WHERE profile = ANY(:profile_ids)
+        """), {"profile_ids": list(self.changed_mp_profiles)})
+        existing_topo_data = pd.DataFrame(
+            existing_topo_data_result.fetchall(),
+            columns=existing_topo_data_result.keys()
+        )
 
-                # Get Master Profile data for this profile
-                master_profile_data = self.all_mp_data[self.all_mp_data['profile_id'] == profile_id]
+        if existing_topo_data.empty:
+            logging.info("No existing topo data found for changed Master Profiles.")
+            return pd.DataFrame()
 
-                # Recalculate CPA
-                cpa_tool = CalculateCPATool(
-                    survey_unit=profile_topo_data['survey_unit'].iloc[0],
-                    profile=profile_id,
-                    master_profile_data= master_profile_data,
-                    new_profile_data= profile_topo_data,
-                    survey_date = survey_date
-                )
-                recalculated_cpa_df = cpa_tool.calculate_cpa()
-                recalculated_cpa_dfs.append(recalculated_cpa_df)
+        # Recalculate CPA for all profiles and dates in one batch
+        all_new_cpa_data = batch_cpa(
+            existing_topo_data,
+            self.changed_mp_data,
+            max_workers=int(settings.get("cpa_workers", 1)),
+        )
+        logging.info(f"Recalculated CPA for {len(all_new_cpa_data)} profile/date combinations. "
+                     f"CPA cache: {get_cpa_cache().stats()}")
 
-        all_new_cpa_data = pd.concat(recalculated_cpa_dfs, ignore_index=True)
         return all_new_cpa_data
 
     def update_live_tables(self):
@@ -286,103 +218,97 @@ class MigrateStagingToLive:
         try:
             with engine.begin() as conn:  # Atomic transaction
 
+                scope = self.staging_scope()
+                mp_scope = self.staging_scope('profile_id', with_date=False)
+                params = self.scope_params()
+
                 # ----------------------------------------------------------------------
-                # 1) UPSERT CPA DATA
+                # 1) UPSERT CPA DATA (recalculated CPA rows win over staged ones)
                 # ----------------------------------------------------------------------
-                insert_cpa_sql = text("""
-                    INSERT INTO topo_qc.cpa_table (survey_unit, date, profile, area)
-                    VALUES (:survey_unit, :date, :profile, :area)
-                    ON CONFLICT (survey_unit, date, profile)
-                    DO UPDATE SET area = EXCLUDED.area
-                """)
-                conn.execute(insert_cpa_sql, self.all_cpa_data.to_dict(orient='records'))
+                recalculated_rows = prepare_cpa_rows(self.recalculated_cpa_data).drop_duplicates(CPA_KEY, keep='last')
+                copy_to_temp(conn, "merge_cpa_table", "topo_qc.cpa_table", recalculated_rows, CPA_COLUMNS)
+                conn.execute(text(f"""
+                    INSERT INTO merge_cpa_table ({', '.join(CPA_COLUMNS)})
+                    SELECT DISTINCT ON ({', '.join(CPA_KEY)}) {', '.join(CPA_COLUMNS)}
+                    FROM staging_data.cpa_table AS staged
+                    WHERE {scope}
+                      AND NOT EXISTS (
+                          SELECT 1 FROM merge_cpa_table AS recalculated
+                          WHERE recalculated.survey_unit = staged.survey_unit
+                            AND recalculated.date = staged.date
+                            AND recalculated.profile = staged.profile
+                      )
+                    ORDER BY {', '.join(CPA_KEY)}, {LAST_STAGED_ROW_FIRST}
+                """), params)
+                merged = merge_rows(conn, "topo_qc.cpa_table", "merge_cpa_table", CPA_COLUMNS, CPA_KEY,
+                                    only_changed=False)
+                logging.info(f"Merged {merged} CPA rows into topo_qc.cpa_table")
 
                 # ----------------------------------------------------------------------
-                # 2) UPDATE MASTER PROFILES
+                # 2) REPLACE CHANGED MASTER PROFILES
                 # ----------------------------------------------------------------------
                 if self.changed_mp_profiles:
-
-                    delete_mp_sql = text("""
-                        DELETE FROM topo_qc.master_profiles 
-                        WHERE profile_id = :profile_id
-                    """)
-
-                    insert_mp_sql = text("""
-                        INSERT INTO topo_qc.master_profiles 
-                        (profile_id, date, chainage, elevation, sequence)
-                        VALUES (:profile_id, :date, :chainage, :elevation, :sequence)
-                    """)
-
-                    for profile_id in self.changed_mp_profiles:
-                        conn.execute(delete_mp_sql, {"profile_id": profile_id})
-
-                        profile_data = (
-                            self.all_mp_data[self.all_mp_data['profile_id'] == profile_id]
-                            .copy()
-                        )
-                        profile_data['sequence'] = profile_data['sequence'].apply(
-                            lambda x: int(x) if pd.notna(x) else None
-                        )
-
-                        conn.execute(insert_mp_sql, profile_data.to_dict(orient='records'))
+                    mp_params = {"profile_ids": list(self.changed_mp_profiles)}
+                    conn.execute(text("""
+                        DELETE FROM topo_qc.master_profiles
+                        WHERE profile_id = ANY(:profile_ids)
+                    """), mp_params)
+                    conn.execute(text(f"""
+                        INSERT INTO topo_qc.master_profiles ({', '.join(MP_COLUMNS)})
+                        SELECT {', '.join(MP_COLUMNS)} FROM staging_data.master_profiles
+                        WHERE profile_id = ANY(:profile_ids)
+                    """), mp_params)
 
                 # ----------------------------------------------------------------------
                 # 3) UPSERT TOPO DATA (ONLY UPDATE IF CHANGED)
                 # ----------------------------------------------------------------------
-                insert_topo_sql = text("""
-                    INSERT INTO topo_qc.topo_data
-                    (easting, northing, elevation_od, chainage, fc, profile, reg_id,
-                     survey_unit, date, year, month)
-                    VALUES (:easting, :northing, :elevation_od, :chainage, :fc, :profile,
-                            :reg_id, :survey_unit, :date, :year, :month)
-                    ON CONFLICT (profile, date, chainage)
-                    DO UPDATE SET
-                        easting      = EXCLUDED.easting,
-                        northing     = EXCLUDED.northing,
-                        elevation_od = EXCLUDED.elevation_od,
-                        fc           = EXCLUDED.fc,
-                        reg_id       = EXCLUDED.reg_id,
-                        survey_unit  = EXCLUDED.survey_unit,
-                        year         = EXCLUDED.year,
-                        month        = EXCLUDED.month
-                    WHERE
-                        topo_qc.topo_data.easting      IS DISTINCT FROM EXCLUDED.easting OR
-                        topo_qc.topo_data.northing     IS DISTINCT FROM EXCLUDED.northing OR
-                        topo_qc.topo_data.elevation_od IS DISTINCT FROM EXCLUDED.elevation_od OR
-                        topo_qc.topo_data.fc           IS DISTINCT FROM EXCLUDED.fc OR
-                        topo_qc.topo_data.reg_id       IS DISTINCT FROM EXCLUDED.reg_id OR
-                        topo_qc.topo_data.survey_unit  IS DISTINCT FROM EXCLUDED.survey_unit OR
-                        topo_qc.topo_data.year         IS DISTINCT FROM EXCLUDED.year OR
-                        topo_qc.topo_data.month        IS DISTINCT FROM EXCLUDED.month;
-                """)
-
-                conn.execute(insert_topo_sql, self.all_topo_data.to_dict(orient='records'))
+                conn.execute(text(f"""
+                    CREATE TEMP TABLE staged_topo_data ON COMMIT DROP AS
+                    SELECT DISTINCT ON ({', '.join(TOPO_KEY)}) {', '.join(TOPO_COLUMNS)}
+                    FROM staging_data.topo_data
+                    WHERE {scope}
+                    ORDER BY {', '.join(TOPO_KEY)}, {LAST_STAGED_ROW_FIRST}
+                """), params)
+
+                # Only (profile, date) groups whose fingerprint differs from the live rows are merged
+                conn.execute(text(f"""
+                    CREATE TEMP TABLE merge_topo_data ON COMMIT DROP AS
+                    WITH staged AS (
+                        {fingerprint_sql("staged_topo_data", TOPO_GROUP, TOPO_FINGERPRINT_COLUMNS)}
+                    ),
+                    live AS (
+                        {fingerprint_sql("topo_qc.topo_data", TOPO_GROUP, TOPO_FINGERPRINT_COLUMNS,
+                                         "(profile, date) IN (SELECT profile, date FROM staged)")}
+                    )
+                    SELECT staged_topo_data.*
+                    FROM staged_topo_data
+                    JOIN staged USING (profile, date)
+                    LEFT JOIN live USING (profile, date)
+                    WHERE live.fingerprint IS DISTINCT FROM staged.fingerprint
+                """))
+                merged = merge_rows(conn, "topo_qc.topo_data", "merge_topo_data", TOPO_COLUMNS, TOPO_KEY)
+                logging.info(f"Merged {merged} new or changed topo rows into topo_qc.topo_data")
 
                 # ----------------------------------------------------------------------
                 # 4) Update QC Log (only outside edit mode)
                 # ----------------------------------------------------------------------
                 if self.edit_mode != 'edit':
-                    unique_survey_dates = (
-                        self.all_topo_data[['survey_unit', 'date']].drop_duplicates()
-                    )
-
-                    update_qc_log_sql = text("""
-                        UPDATE topo_qc.qc_log
+                    conn.execute(text("""
+                        UPDATE topo_qc.qc_log AS qc_log
                         SET pushed_to_dash = TRUE
-                        WHERE survey_unit = :survey_unit AND completion_date = :date
-                    """)
-
-                    for _, row in unique_survey_dates.iterrows():
-                        conn.execute(update_qc_log_sql, {
-                            'survey_unit': row['survey_unit'],
-                            'date': row['date']
-                        })
+                        FROM (SELECT DISTINCT survey_unit, date FROM staged_topo_data) AS surveys
+                        WHERE qc_log.survey_unit = surveys.survey_unit
+                          AND qc_log.completion_date = surveys.date
+                    """))
 
                 # ----------------------------------------------------------------------
                 # 5) CLEAR STAGING TABLES (column names differ by table)
                 # ----------------------------------------------------------------------
-                profile_ids = self.all_topo_data['profile'].unique().tolist()
-                dates = self.all_topo_data['date'].unique().tolist()
+                profile_ids = conn.execute(text("SELECT DISTINCT profile FROM staged_topo_data")).scalars().all()
+                dates = conn.execute(text("SELECT DISTINCT date FROM staged_topo_data")).scalars().all()
+                mp_profile_ids = conn.execute(text(f"""
+                    SELECT DISTINCT profile_id FROM staging_data.master_profiles WHERE {mp_scope}
+                """), params).scalars().all()
 
                 # Tables that use "profile"
                 tables_with_profile = [
@@ -409,7 +335,6 @@ class MigrateStagingToLive:
                         {"profiles": profile_ids, "dates": dates}
                     )
 
-                mp_profile_ids = self.all_mp_data['profile_id'].unique().tolist()
                 delete_profile_id_sql = text("""
                     DELETE FROM staging_data.{table}
                     WHERE profile_id = ANY(:profile_ids)
@@ -423,6 +348,8 @@ class MigrateStagingToLive:
 
             # All operations succeeded (commit happens automatically)
             logging.info("Live tables updated successfully and staging cleared.")
+            # The viewer's cached history of these profiles is now out of date
+            get_historical_profile_cache().evict_profiles(profile_ids)
             return True
 
         except Exception as e:
@@ -22,10 +22,13 @@ import sys
 import subprocess
 import tempfile
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
 try:
     from qc_application.utils.main_qc_tool_helper_functions import *
+    from qc_application.utils.point_spacing import spacing_tolerance
+    from qc_application.utils.profile_line_checks import get_profile_line_backend
     from qc_application.dependencies import mlsw_dict
     from qc_application.dependencies.system_paths import OS_TILES_PATH
 except ImportError as e:
@@ -61,6 +64,8 @@ class TopoQCTool:
 
         self.outputs_for_map = {}
         self.survey_results: List[SurveyResult] = []
+        self.profile_lines = get_profile_line_backend()
+        logging.info(f"Profile line geoprocessing backend: {self.profile_lines.name}")
 
     def run_topo_qc(self) -> Dict[str, any]:
         """
@@ -70,27 +75,15 @@ class TopoQCTool:
             dict: Contains 'success_count', 'failed_count', 'results' list
         """
         env.overwriteOutput = True
-        spacing_unit_error = 2.5
+        # Default planar tolerance, surveys use their region's tolerance when one is configured
+        spacing_unit_error = spacing_tolerance('planar', settings=settings)
 
-        for input_text_file in self.input_text_files:
-            result = SurveyResult(file_path=input_text_file)
-
-            try:
-                success = self._process_single_survey(
-                    input_text_file,
-                    spacing_unit_error,
-                    result
-                )
-                result.success = success
-
-            except Exception as e:
-                result.success = False
-                result.error_message = str(e)
-                result.stage = result.stage or "Unknown"
-                logging.error(f"Failed processing {input_text_file}: {str(e)}")
-
-            finally:
-                self.survey_results.append(result)
+        workers = min(int(settings.get("qc_workers", 1)), len(self.input_text_files))
+        if workers > 1:
+            self._run_surveys_in_parallel(spacing_unit_error, workers)
+        else:
+            for input_text_file in self.input_text_files:
+                self.survey_results.append(self._run_survey(input_text_file, spacing_unit_error))
 
         # Generate summary
         success_count = sum(1 for r in self.survey_results if r.success)
@@ -124,6 +117,66 @@ class TopoQCTool:
             'total': len(self.survey_results)
         }
 
+    def _run_survey(self, input_text_file: str, spacing_unit_error: float) -> SurveyResult:
+        """Process one survey, recording any exception on its result instead of raising."""
+        result = SurveyResult(file_path=input_text_file)
+
+        try:
+            result.success = self._process_single_survey(
+                input_text_file,
+                spacing_unit_error,
+                result
+            )
+
+        except Exception as e:
+            result.success = False
+            result.error_message = str(e)
+            result.stage = result.stage or "Unknown"
+            logging.error(f"Failed processing {input_text_file}: {str(e)}")
+
+        return result
+
+    def _run_surveys_in_parallel(self, spacing_unit_error: float, workers: int):
+        """
+        Process the surveys in a pool of worker processes, each with its own ArcPy scratch workspace.
+        Results and map outputs are merged in input order, so they do not depend on which survey finishes first.
+        """
+        logging.info(f"Processing {len(self.input_text_files)} surveys with {workers} worker processes")
+
+        results: List[Optional[SurveyResult]] = [None] * len(self.input_text_files)
+        outputs: List[Dict[str, list]] = [{} for _ in self.input_text_files]
+        scratch_root = tempfile.mkdtemp(prefix="topo_qc_scratch_")
+
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_qc_worker,
+                                     initargs=(scratch_root,)) as pool:
+                futures = {
+                    pool.submit(_run_survey_in_worker, input_text_file, self.interim_survey_lines,
+                                spacing_unit_error): index
+                    for index, input_text_file in enumerate(self.input_text_files)
+                }
+                for future in as_completed(futures):
+                    index = futures[future]
+                    try:
+                        results[index], outputs[index] = future.result()
+                    except Exception as e:  # The worker process died or its result could not be returned
+                        results[index] = SurveyResult(file_path=self.input_text_files[index],
+                                                      error_message=str(e), stage="Worker Process")
+                        logging.error(f"Failed processing {self.input_text_files[index]}: {str(e)}")
+        finally:
+            shutil.rmtree(scratch_root, ignore_errors=True)
+
+        for result, new_outputs in zip(results, outputs):
+            self.survey_results.append(result)
+            self._merge_map_outputs(new_outputs)
+
+    def _merge_map_outputs(self, new_outputs: Dict[str, list]):
+        for key, value in new_outputs.items():
+            if key in self.outputs_for_map:
+                self.outputs_for_map[key].extend(value)
+            else:
+                self.outputs_for_map[key] = value
+
     def _process_single_survey(self, input_text_file: str, spacing_unit_error: float,
                                result: SurveyResult) -> bool:
         """
@@ -231,7 +284,7 @@ class TopoQCTool:
         # Create point file
         result.stage = "Point File Creation"
         points_file_name = create_point_file_name(extracted_cell, file_friendly_survey_unit, survey_completion_date)
-        points_file_path = make_xy_event_layer(standardised_df, workspace, points_file_name)
+        points_file_path = self.profile_lines.make_xy_event_layer(standardised_df, workspace, points_file_name)
 
         # Feature code check
         result.stage = "Feature Code Validation"
@@ -239,7 +292,7 @@ class TopoQCTool:
 
         # Extract interim lines
         result.stage = "Interim Lines Extraction"
-        selected_interim_lines = extract_interim_lines(
+        selected_interim_lines = self.profile_lines.extract_interim_lines(
             survey_profile_lines_shp,
             workspace,
             extracted_cell,
@@ -248,18 +301,19 @@ class TopoQCTool:
         )
 
         region = get_region(input_text)
+        spacing_unit_error = spacing_tolerance('planar', region=region, settings=settings)
 
         # Create offline buffer
         result.stage = "Offline Buffer Creation"
         offline_line_buffer_path = create_offline_buffer_file_name(
             region, workspace, extracted_cell, file_friendly_survey_unit
         )
-        create_offline_buffer(region, offline_line_buffer_path, selected_interim_lines)
+        self.profile_lines.create_offline_buffer(region, offline_line_buffer_path, selected_interim_lines)
 
         # Get offline points
         result.stage = "Offline Points Detection"
         offline_points_path = generate_offline_points_path(workspace, extracted_cell, file_friendly_survey_unit)
-        offline_points = get_offline_points(
+        offline_points = self.profile_lines.get_offline_points(
             points_file_path, offline_line_buffer_path, standardised_df,
             offline_points_path, workspace
         )
@@ -279,8 +333,8 @@ class TopoQCTool:
 
         # Profile line check
         result.stage = "Profile Line Check"
-        points_lie_on_correct_profile = check_points_lie_on_correct_profile_lines(
-            points_file_path, offline_line_buffer_path
+        points_lie_on_correct_profile = self.profile_lines.check_points_lie_on_correct_profile_lines(
+            points_file_path, offline_line_buffer_path, standardised_df=standardised_df
         )
 
         # Extract survey metadata
@@ -343,11 +397,7 @@ class TopoQCTool:
         )
 
         # Merge into main dict
-        for key, value in new_outputs.items():
-            if key in self.outputs_for_map:
-                self.outputs_for_map[key].extend(value)
-            else:
-                self.outputs_for_map[key] = value
+        self._merge_map_outputs(new_outputs)
 
         logging.info(f"✅ Successfully processed: {extracted_survey_unit}")
         return True
@@ -438,5 +488,19 @@ class TopoQCTool:
             logging.error("Failed to create ArcGIS project.")
 
 
-f= TopoQCTool(r'I:\Data\Survey_Topo\Phase4\TSW04\7e\7eSU17-2 Portishead\7eSU17-2_20250211tip\Batch', r'C:\Users\darle\PycharmProjects\QC_Gui\qc_application\dependencies\SW_PROFILES_PHASE4_ALL')
-f.run_topo_qc()
\ No newline at end of file
+def _init_qc_worker(scratch_root):
+    """Process pool initializer: a private scratch workspace per worker, so geoprocessing temp data never clashes."""
+    env.scratchWorkspace = tempfile.mkdtemp(prefix=f"worker_{os.getpid()}_", dir=scratch_root)
+    env.overwriteOutput = True
+
+
+def _run_survey_in_worker(input_text_file, interim_survey_lines, spacing_unit_error):
+    """Process one survey in a pool worker. env.workspace is set to the survey's own QC folder while it runs."""
+    tool = TopoQCTool(input_text_file, interim_survey_lines)
+    result = tool._run_survey(input_text_file, spacing_unit_error)
+    return result, tool.outputs_for_map
+
+
+if __name__ == "__main__":
+    f= TopoQCTool(r'I:\Data\Survey_Topo\Phase4\TSW04\7e\7eSU17-2 Portishead\7eSU17-2_20250211tip\Batch', r'C:\Users\darle\PycharmProjects\QC_Gui\qc_application\dependencies\SW_PROFILES_PHASE4_ALL')
+    f.run_topo_qc()
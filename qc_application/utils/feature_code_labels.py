@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+from matplotlib.collections import PathCollection
+from matplotlib.textpath import TextPath
+from matplotlib.transforms import Affine2D
+
+"""Level-of-detail feature code labels for the profile viewer. All labels are drawn by one PathCollection (one
+   glyph path per code, placed at the data points) instead of one Text artist per point. Only labels inside the
+   view that do not overlap are shown; when the profile's most common ('default') code cannot be shown for every
+   visible point, it is hidden and only the other codes are labelled. The selection is recomputed after
+   zoom/pan, debounced, so redraw cost follows the number of visible labels rather than the number of points."""
+
+
+def select_labels(px, py, widths, heights, is_default, padding=2.0):
+    """
+    Choose which labels to show, in display (pixel) coordinates.
+
+    px, py: bottom-centre of each label. widths, heights: label sizes. is_default: True for default-code labels.
+    Non-default labels are placed first, in order, skipping any that overlap a placed label. Default labels
+    are then shown only if all of them fit. Returns a boolean mask.
+    """
+    px, py = np.asarray(px, dtype=float), np.asarray(py, dtype=float)
+    half_w = np.asarray(widths, dtype=float) / 2 + padding
+    x0, x1 = px - half_w, px + half_w
+    y0, y1 = py - padding, py + np.asarray(heights, dtype=float) + padding
+    is_default = np.asarray(is_default, dtype=bool)
+
+    shown = np.zeros(len(px), dtype=bool)
+    placed = []
+
+    def fits(i):
+        if not placed:
+            return True
+        p = np.asarray(placed)
+        return not np.any((x0[i] < x1[p]) & (x0[p] < x1[i]) & (y0[i] < y1[p]) & (y0[p] < y1[i]))
+
+    for i in np.flatnonzero(~is_default):
+        if fits(i):
+            shown[i] = True
+            placed.append(i)
+
+    defaults = np.flatnonzero(is_default)
+    for i in defaults:
+        if not fits(i):
+            # Zoomed out too far for every default code, leave them all off rather than an arbitrary subset
+            for j in defaults:
+                shown[j] = False
+            break
+        shown[i] = True
+        placed.append(i)
+
+    return shown
+
+
+class FeatureCodeLabels:
+    """Batched, zoom-dependent feature code labels drawn a fixed offset (in data units) above each point."""
+
+    def __init__(self, ax, fontsize=8, color='darkblue', zorder=4, offset=0.05, padding=2.0, debounce_ms=150):
+        self.ax = ax
+        self.fontsize = fontsize
+        self.offset = offset
+        self.padding = padding
+
+        self.collection = PathCollection([], offsets=np.empty((0, 2)), offset_transform=ax.transData,
+                                         facecolors=color, edgecolors='none', zorder=zorder)
+        ax.add_collection(self.collection, autolim=False)
+
+        self._paths = {}  # {code: (path, width_pt, height_pt)}, glyph outlines in points
+        self.xy = np.empty((0, 2))
+        self.codes = np.array([], dtype=object)
+        self.default_code = None
+
+        canvas = ax.figure.canvas
+        self._timer = canvas.new_timer(interval=debounce_ms)
+        self._timer.single_shot = True
+        self._timer.add_callback(self._on_settled)
+        ax.callbacks.connect('xlim_changed', self.schedule_update)
+        ax.callbacks.connect('ylim_changed', self.schedule_update)
+        canvas.mpl_connect('resize_event', self.schedule_update)
+
+    def _path(self, code):
+        """Glyph path for a code, centred horizontally with its bottom on the anchor point (points units)."""
+        if code not in self._paths:
+            path = TextPath((0, 0), code, size=self.fontsize)
+            extents = path.get_extents()
+            path = path.transformed(Affine2D().translate(-(extents.x0 + extents.x1) / 2, -extents.y0))
+            self._paths[code] = (path, extents.width, extents.height)
+        return self._paths[code]
+
+    def set_labels(self, x, y, codes):
+        """Label the points (x, y) with codes (None or empty clears them). Call update() once the limits are set."""
+        self.xy = np.empty((0, 2))
+        self.codes = np.array([], dtype=object)
+        self.default_code = None
+        if codes is None:
+            return
+
+        codes = pd.Series(codes).astype(str).str.strip().to_numpy(dtype=object)
+        labelled = codes != ''  # Blank codes have nothing to draw
+        if labelled.any():
+            self.xy = np.column_stack([np.asarray(x, dtype=float), np.asarray(y, dtype=float) + self.offset])[labelled]
+            self.codes = codes[labelled]
+            self.default_code = pd.Series(self.codes).mode().iloc[0]
+
+    def update(self):
+        """Recompute the shown labels for the current view limits and canvas size."""
+        self._timer.stop()
+        points_to_px = self.ax.figure.dpi / 72
+        self.collection.set_transform(Affine2D().scale(points_to_px))
+
+        (xmin, xmax), (ymin, ymax) = sorted(self.ax.get_xlim()), sorted(self.ax.get_ylim())
+        x, y = self.xy[:, 0], self.xy[:, 1]
+        candidates = np.flatnonzero((x >= xmin) & (x <= xmax) & (y >= ymin) & (y <= ymax))
+
+        shown = candidates[:0]
+        if len(candidates):
+            codes = self.codes[candidates]
+            sizes = np.array([self._path(code)[1:] for code in codes]) * points_to_px
+            px, py = self.ax.transData.transform(self.xy[candidates]).T
+            mask = select_labels(px, py, sizes[:, 0], sizes[:, 1], codes == self.default_code, self.padding)
+            shown = candidates[mask]
+
+        self.collection.set_paths([self._path(code)[0] for code in self.codes[shown]])
+        self.collection.set_offsets(self.xy[shown])
+        self.collection.stale = True
+        return len(shown)
+
+    def schedule_update(self, *args):
+        """Debounced update, called on every zoom/pan/resize step."""
+        self._timer.stop()
+        self._timer.start()
+
+    def cancel_pending(self):
+        self._timer.stop()
+
+    def _on_settled(self):
+        self.update()
+        self.ax.figure.canvas.draw_idle()
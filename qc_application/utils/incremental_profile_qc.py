@@ -0,0 +1,194 @@
+import numpy as np
+import pandas as pd
+
+from qc_application.services.topo_calculate_cpa_service import positive_trapezoid_area
+from qc_application.utils.profile_viewer_pure_functions import segments_intersect_array
+
+"""Incremental CPA and master crossing state for the profile being edited in the viewer. Dragging one vertex
+   only touches the two segments either side of it, so only those segments' crossings and the master sections
+   they overlap are recalculated. This gives a live readout while dragging; save_changes still runs the full
+   qc_profile and CPA calculation."""
+
+
+class IncrementalProfileQC:
+    """
+    Live CPA and crossing count for one survey profile against its master profile.
+
+    Survey and master points are addressed by their position in the arrays passed in, which is the row
+    position (iloc) of the DataFrames plotted by the viewer. Only finite points take part, matching
+    section_areas. Crossings are counted the same way as count_crossings, on both lines sorted by chainage.
+    A move that changes the chainage order of a line falls back to a full rebuild.
+    """
+
+    def __init__(self, master_chainage, master_elevation, chainage, elevation):
+        self.master_chainage = np.array(master_chainage, dtype=float)
+        self.master_elevation = np.array(master_elevation, dtype=float)
+        self.chainage = np.array(chainage, dtype=float)
+        self.elevation = np.array(elevation, dtype=float)
+        self.rebuilds = 0
+        self.rebuild()
+
+    @classmethod
+    def from_frames(cls, master_df, survey_df):
+        """Build from the viewer's master and survey DataFrames ('elevation_od' is used if 'elevation' is missing)."""
+
+        def columns(df):
+            elevation = df['elevation'] if 'elevation' in df.columns else df['elevation_od']
+            return (pd.to_numeric(df['chainage'], errors='coerce').to_numpy(dtype=float),
+                    pd.to_numeric(elevation, errors='coerce').to_numpy(dtype=float))
+
+        return cls(*columns(master_df), *columns(survey_df))
+
+    # --- Full build ---
+
+    def rebuild(self):
+        """Recalculate every segment and section from the current point arrays."""
+        self.rebuilds += 1
+
+        finite = np.isfinite(self.chainage) & np.isfinite(self.elevation)
+        self._survey_rows = np.flatnonzero(finite)[np.argsort(self.chainage[finite], kind='stable')]
+        self._survey_rank = np.full(len(self.chainage), -1)
+        self._survey_rank[self._survey_rows] = np.arange(len(self._survey_rows))
+        self._xs = self.chainage[self._survey_rows]
+        self._ys = self.elevation[self._survey_rows]
+
+        finite = np.isfinite(self.master_chainage) & np.isfinite(self.master_elevation)
+        self._master_rows = np.flatnonzero(finite)[np.argsort(self.master_chainage[finite], kind='stable')]
+        self._master_rank = np.full(len(self.master_chainage), -1)
+        self._master_rank[self._master_rows] = np.arange(len(self._master_rows))
+        self._mxs = self.master_chainage[self._master_rows]
+        self._mys = self.master_elevation[self._master_rows]
+
+        self._segment_crossings = np.zeros(max(len(self._xs) - 1, 0), dtype=np.int64)
+        self._update_crossings(np.arange(len(self._segment_crossings)))
+
+        self._section_area = np.zeros(max(len(self.master_chainage) - 1, 0))
+        self._update_sections(np.arange(len(self._section_area)))
+
+    # --- Per-segment / per-section kernels ---
+
+    def _update_crossings(self, segments):
+        """Recount master crossings for the given survey segments (indices into the sorted survey)."""
+        segments = np.asarray(segments, dtype=np.intp)
+        if len(segments) == 0:
+            return
+        if len(self._mxs) < 2:
+            self._segment_crossings[segments] = 0
+            return
+
+        # Sorted lines: only master segments whose chainage range overlaps the survey segment can intersect it
+        start = np.maximum(np.searchsorted(self._mxs, self._xs[segments], side='left') - 1, 0)
+        stop = np.minimum(np.searchsorted(self._mxs, self._xs[segments + 1], side='right'), len(self._mxs) - 1)
+        counts = np.clip(stop - start, 0, None)
+
+        k = np.repeat(segments, counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        j = np.repeat(start, counts) + offsets
+
+        hits = segments_intersect_array(self._mxs[j], self._mys[j], self._mxs[j + 1], self._mys[j + 1],
+                                        self._xs[k], self._ys[k], self._xs[k + 1], self._ys[k + 1])
+        self._segment_crossings[segments] = 0
+        np.add.at(self._segment_crossings, k, hits.astype(np.int64))
+
+    def _update_sections(self, sections):
+        """Recalculate the CPA of the given master sections from the survey points they cover."""
+        for i in np.asarray(sections, dtype=np.intp):
+            lower, upper = self.master_chainage[i], self.master_chainage[i + 1]
+            if not lower < upper or len(self._xs) < 2:
+                self._section_area[i] = 0.0
+                continue
+            # Same integral as section_areas, over just the survey segments that overlap the section
+            lower = max(lower, self._xs[0])
+            upper = min(upper, self._xs[-1])
+            if not lower < upper:
+                self._section_area[i] = 0.0
+                continue
+            first = max(np.searchsorted(self._xs, lower, side='right') - 1, 0)
+            last = min(np.searchsorted(self._xs, upper, side='left') + 1, len(self._xs))
+            x = self._xs[first:last]
+            y = self._ys[first:last]
+
+            a = np.maximum(lower, x[:-1])
+            b = np.minimum(upper, x[1:])
+            keep = b > a
+            x0, x1, y0, y1, a, b = x[:-1][keep], x[1:][keep], y[:-1][keep], y[1:][keep], a[keep], b[keep]
+
+            slope = (y1 - y0) / (x1 - x0)
+            baseline = self.master_elevation[i]
+            h0 = y0 + slope * (a - x0) - baseline
+            h1 = y0 + slope * (b - x0) - baseline
+            self._section_area[i] = positive_trapezoid_area(h0, h1, b - a).sum()
+
+    def _sections_overlapping(self, lower, upper):
+        mc = self.master_chainage
+        return np.flatnonzero((np.fmax(mc[:-1], mc[1:]) >= lower) & (np.fmin(mc[:-1], mc[1:]) <= upper))
+
+    @staticmethod
+    def _keeps_order(values, rank, value):
+        """True if value can replace values[rank] without changing the sorted order (strictly between neighbours)."""
+        return ((rank == 0 or values[rank - 1] < value) and
+                (rank == len(values) - 1 or value < values[rank + 1]))
+
+    # --- Edits ---
+
+    def move_survey_point(self, position, chainage, elevation):
+        """Move survey point `position` and update only the segments and sections it touches."""
+        rank = self._survey_rank[position]
+        self.chainage[position] = chainage
+        self.elevation[position] = elevation
+
+        if rank < 0 or not np.isfinite(elevation) or not self._keeps_order(self._xs, rank, chainage):
+            self.rebuild()
+            return
+
+        lower = min(self._xs[max(rank - 1, 0)], self._xs[rank], chainage)
+        upper = max(self._xs[min(rank + 1, len(self._xs) - 1)], self._xs[rank], chainage)
+        self._xs[rank] = chainage
+        self._ys[rank] = elevation
+
+        segments = [k for k in (rank - 1, rank) if 0 <= k < len(self._segment_crossings)]
+        self._update_crossings(segments)
+        self._update_sections(self._sections_overlapping(lower, upper))
+
+    def move_master_point(self, position, chainage, elevation):
+        """Move master point `position` and update the two sections and the survey segments it touches."""
+        rank = self._master_rank[position]
+        old_chainage = self.master_chainage[position]
+        self.master_chainage[position] = chainage
+        self.master_elevation[position] = elevation
+
+        if rank < 0 or not np.isfinite(elevation) or not self._keeps_order(self._mxs, rank, chainage):
+            self.rebuild()
+            return
+
+        lower = min(self._mxs[max(rank - 1, 0)], old_chainage, chainage)
+        upper = max(self._mxs[min(rank + 1, len(self._mxs) - 1)], old_chainage, chainage)
+        self._mxs[rank] = chainage
+        self._mys[rank] = elevation
+
+        if len(self._xs) >= 2:
+            start = max(np.searchsorted(self._xs, lower, side='left') - 1, 0)
+            stop = min(np.searchsorted(self._xs, upper, side='right'), len(self._xs) - 1)
+            self._update_crossings(np.arange(start, max(stop, start)))
+
+        # Section i spans master points i and i + 1 and takes its baseline from point i
+        self._update_sections([i for i in (position - 1, position) if 0 <= i < len(self._section_area)])
+
+    # --- Readout ---
+
+    @property
+    def area(self):
+        return float(self._section_area.sum())
+
+    @property
+    def crossings(self):
+        return int(self._segment_crossings.sum())
+
+    def status_text(self):
+        """One-line readout for the viewer status bar."""
+        text = f"Live CPA: {self.area:.2f} | Crossings: {self.crossings}"
+        if self.crossings == 0:
+            text += " (does not cross master profile)"
+        elif self.crossings > 2:
+            text += " (expected ≤2)"
+        return text
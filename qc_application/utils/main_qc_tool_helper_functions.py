@@ -1,6 +1,7 @@
 import os
 import logging
 import re
+import threading
 from datetime import datetime
 from typing import Optional
 import arcpy
@@ -9,6 +10,9 @@ import numpy as np
 import pandas as pd
 from itertools import chain
 from qc_application.utils.database_connection import establish_connection
+from qc_application.utils.point_features import POINT_FIELDS, points_record_array
+from qc_application.utils.point_spacing import over_spacing
+from qc_application.utils.profile_line_checks import offline_buffer_distance
 from sqlalchemy import text
 
 from qc_application.utils.check_photo_helper_functions import *
@@ -80,6 +84,29 @@ def extract_survey_unit(input_path: str) -> Optional[str]:
     except (IndexError, TypeError):
         return None
 
+_profile_line_field_values = {}  # {(shapefile path, field, shapefile version): set of values}
+_profile_line_field_values_lock = threading.Lock()
+
+
+def profile_line_field_values(shapefile_path: str, field: str) -> set:
+    """
+    Distinct values of a field of the survey profile lines shapefile. Read with one SearchCursor per process
+    and kept until the shapefile changes (its modification time or size), so validating every survey of a
+    batch does not re-read the shapefile.
+    """
+    try:
+        stat = os.stat(shapefile_path)
+        version = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        version = None
+    key = (os.path.abspath(shapefile_path), field, version)
+
+    with _profile_line_field_values_lock:
+        if key not in _profile_line_field_values:
+            with arcpy.da.SearchCursor(shapefile_path, field) as cursor:
+                _profile_line_field_values[key] = {row[0] for row in cursor}
+        return _profile_line_field_values[key]
+
 def check_survey_unit_in_shapefile(unit: str, shapefile_path: str) -> bool:
     """
     Checks if a given survey unit exists in the 'SURVEY_UNT' column
@@ -97,14 +124,13 @@ def check_survey_unit_in_shapefile(unit: str, shapefile_path: str) -> bool:
         return False
 
     try:
-        # Use a list comprehension for efficiency and to handle large datasets.
-        # This is generally faster than converting to a DataFrame for a simple check.
-        with arcpy.da.SearchCursor(shapefile_path, 'SURVEY_UNT') as cursor:
-            units = {row[0] for row in cursor}
-            return unit in units
+        # The column is read once per run and shapefile version, later checks are set lookups
+        return unit in profile_line_field_values(shapefile_path, 'SURVEY_UNT')
     except RuntimeError:
         logging.error("Column 'SURVEY_UNT' not found in shapefile!")
         return False
+    except ImportError:
+        raise
     except Exception as e:
         logging.error(f"An unexpected error occurred: {e}")
         return False
@@ -192,14 +218,13 @@ def check_cell_in_shapefile(cell: str, shapefile_path: str) -> bool:
         logging.error(f"Shapefile not found: {shapefile_path}")
         return False
     try:
-        # Using a search cursor is more memory-efficient for a simple existence check.
-        with arcpy.da.SearchCursor(shapefile_path, 'CELL') as cursor:
-            # Create a set for quick lookups
-            cells = {row[0] for row in cursor}
-            return cell in cells
+        # The column is read once per run and shapefile version, later checks are set lookups
+        return cell in profile_line_field_values(shapefile_path, 'CELL')
     except RuntimeError:
         logging.error("Column 'CELL' not found in the supplied survey profile lines shapefile!")
         return False
+    except ImportError:
+        raise
     except Exception as e:
         logging.error(f"An unexpected error occurred while checking shapefile: {e}")
         return False
@@ -386,13 +411,33 @@ def create_point_file_name(extracted_cell, file_friendly_survey_unit, survey_com
     file_name = f"{extracted_cell}{file_friendly_survey_unit}_{survey_completion_date}_tip_Auto.shp"
     return file_name
 
+def write_points_feature_class(points_df, out_feature_class):
+    """
+    Writes a DataFrame of survey points as a PointZ feature class in British National Grid.
+
+    Args:
+        points_df (pd.DataFrame): Points with 'Easting', 'Northing' and 'Elevation' columns.
+        out_feature_class (str): The output shapefile path.
+
+    Returns:
+        str: The output path.
+    """
+    arcpy.da.NumPyArrayToFeatureClass(
+        points_record_array(points_df),
+        out_feature_class,
+        list(POINT_FIELDS),
+        arcpy.SpatialReference(27700)
+    )
+    return out_feature_class
+
 def make_xy_event_layer(standardised_df, workspace, output_file_name):
     """
     Creates a point feature class (.shp) from a pandas DataFrame.
 
-    This function first saves the DataFrame to a temporary CSV file, as the
-    arcpy.management.XYTableToPoint tool cannot directly process a DataFrame.
-    It then uses the temporary CSV to create the point feature class.
+    The DataFrame is converted to a NumPy structured array and written with
+    arcpy.da.NumPyArrayToFeatureClass, using the Easting, Northing and Elevation
+    columns as the point geometry and keeping every column as an attribute. No
+    intermediate CSV is written to the workspace.
 
     Args:
         standardised_df (pd.DataFrame): The input DataFrame containing 'Easting', 'Northing',
@@ -403,29 +448,14 @@ def make_xy_event_layer(standardised_df, workspace, output_file_name):
     Returns:
         str: The full path to the newly created point feature class.
     """
-    # Create the full path for the temporary and output files
-    temp_csv_path = os.path.join(workspace, "temp.csv")
     out_feature_class = os.path.join(workspace, output_file_name)
 
     arcpy.AddMessage(f"Creating XY point layer: {output_file_name}")
 
     try:
-        # Save the DataFrame to a temporary CSV file
-        standardised_df.to_csv(temp_csv_path, index=False)
-
-        # Set the local variables for the geoprocessing tool
-        in_table = temp_csv_path
-
         # Check if the output file already exists to prevent an overwrite error
         if not arcpy.Exists(out_feature_class):
-            arcpy.management.XYTableToPoint(
-                in_table = in_table,
-                out_feature_class  =out_feature_class,
-                x_field = "Easting",
-                y_field = "Northing",
-                z_field = "Elevation",
-                coordinate_system=arcpy.SpatialReference(27700)
-            )
+            write_points_feature_class(standardised_df, out_feature_class)
             logging.info(f"Successfully created point feature class: {out_feature_class}")
         else:
             logging.warning(f"Output file already exists, skipping creation: {out_feature_class}")
@@ -434,11 +464,6 @@ def make_xy_event_layer(standardised_df, workspace, output_file_name):
         logging.error(f"Error creating point feature class: {e}")
         # Re-raise the exception to be handled by the calling function
         raise
-    finally:
-        # Ensure the temporary CSV file is always removed
-        if os.path.exists(temp_csv_path):
-            os.remove(temp_csv_path)
-            logging.debug(f"Removed temporary file: {temp_csv_path}")
 
     return out_feature_class
 
@@ -580,14 +605,8 @@ def create_offline_buffer(region, offline_line_buffer_path, selected_interim_lin
         offline_line_buffer_path (str): The full path for the output buffer shapefile.
         selected_interim_lines (str): The full path to the input line feature class.
     """
-    # Determine the buffer distance based on the region.
-    # A dictionary is used to handle the specific cases, with a default value.
-    buffer_distances = {
-        "TSW_IoS": 0.03,
-        "TSW_PCO": 0.03
-    }
-
-    buffer_distance = buffer_distances.get(region, 0.1)
+    # Determine the buffer distance based on the region, shared with the shapely backend
+    buffer_distance = offline_buffer_distance(region)
 
     # Run the buffer analysis with the determined distance.
     # arcpy.env.overwriteOutput = True handles the overwrite, so no pre-check is needed.
@@ -638,9 +657,8 @@ def get_offline_points(points_file_path, offline_line_buffer_path, standardised_
     Returns:
         pd.DataFrame: A DataFrame containing the data for all identified offline points.
     """
-    # Create robust paths for temporary files
+    # Create robust path for the temporary clip output
     clip_points_path = os.path.join(workspace, "clipped_points.shp")
-    offline_points_csv_path = os.path.join(workspace, "offline_points.csv")
 
     try:
         arcpy.AddMessage("Identifying offline points...")
@@ -663,18 +681,8 @@ def get_offline_points(points_file_path, offline_line_buffer_path, standardised_
             # 4. If offline points exist, save them to a shapefile
             arcpy.AddWarning(f"{len(offline_points_df)} offline points were found.")
 
-            # Save filtered DataFrame to a temporary CSV
-            offline_points_df.to_csv(offline_points_csv_path, index=False)
-
-            # Create the output shapefile from the temporary CSV
-            arcpy.management.XYTableToPoint(
-                in_table=offline_points_csv_path,
-                out_feature_class=offline_points_path,
-                x_field="Easting",
-                y_field="Northing",
-                z_field="Elevation",
-                coordinate_system=arcpy.SpatialReference(27700)
-            )
+            # Write the filtered DataFrame straight to the output shapefile
+            write_points_feature_class(offline_points_df, offline_points_path)
 
         else:
             arcpy.AddMessage("No offline points were found. ✅")
@@ -687,11 +695,9 @@ def get_offline_points(points_file_path, offline_line_buffer_path, standardised_
         logging.error(f"An unexpected error occurred: {e}")
         raise
     finally:
-        # 5. Clean up temporary files, ensuring they are deleted even if an error occurs
+        # 5. Clean up the temporary clip output, ensuring it is deleted even if an error occurs
         if arcpy.Exists(clip_points_path):
             arcpy.Delete_management(clip_points_path)
-        if os.path.exists(offline_points_csv_path):
-            os.remove(offline_points_csv_path)
 
     return offline_points_df
 
@@ -782,25 +788,12 @@ def spacing_check(df, spacing_unit_error):
     df['Easting'] = pd.to_numeric(df['Easting'], errors='coerce')
     df['Northing'] = pd.to_numeric(df['Northing'], errors='coerce')
 
-    over_spacing_dict = {}
-
-    for profile_name, group in df.groupby("Reg_ID"):
-
-        # Drop rows with missing coords to avoid NaN propagation
-        group = group.dropna(subset=['Easting', 'Northing'])
-
-        if len(group) < 2:
-            continue  # can't compute spacing with fewer than 2 points
-
-        easting_diff = group['Easting'].diff().iloc[1:]
-        northing_diff = group['Northing'].diff().iloc[1:]
-
-        distances = np.sqrt(easting_diff ** 2 + northing_diff ** 2)
-
-        values_over_spec = distances[distances > spacing_unit_error]
-
-        if not values_over_spec.empty:
-            over_spacing_dict[profile_name] = values_over_spec.tolist()
+    # Planar gaps for every profile in one pass, rows with missing coords are skipped
+    gaps_over_spec = over_spacing(df, spacing_unit_error, mode='planar', group_col='Reg_ID')
+    over_spacing_dict = (
+        gaps_over_spec.groupby('profile', sort=True)['gap'].apply(list).to_dict()
+        if not gaps_over_spec.empty else {}
+    )
 
     over_spacing_df = pd.DataFrame.from_dict(over_spacing_dict, orient='index')
 
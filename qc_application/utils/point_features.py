@@ -0,0 +1,75 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+"""Point shapefiles written straight from the survey DataFrame. Geometry is built from the Easting, Northing and
+   Elevation arrays and every column is kept as an attribute, as arcpy's XYTableToPoint did, but without first
+   saving the frame to a CSV in the QC folder for the tool to read back. The shapely backend writes them with
+   geopandas (write_point_shapefile); the ArcPy backend hands points_record_array to
+   arcpy.da.NumPyArrayToFeatureClass, so it needs nothing beyond ArcGIS Pro's Python."""
+
+BRITISH_NATIONAL_GRID = "EPSG:27700"
+POINT_FIELDS = ("Easting", "Northing", "Elevation")
+
+
+def numeric_points(points_df, fields=POINT_FIELDS):
+    """
+    The frame with the coordinate fields as numbers (the text file converter reads every column as text) and
+    without rows missing a coordinate, which are logged and left out as XYTableToPoint did.
+    """
+    points_df = points_df.copy()
+    for field in fields:
+        points_df[field] = pd.to_numeric(points_df[field], errors='coerce')
+
+    missing = points_df[list(fields)].isna().any(axis=1)
+    if missing.any():
+        logging.warning(f"{int(missing.sum())} points have no {'/'.join(fields)} and are left out: "
+                        f"rows {list(points_df.index[missing])}")
+    return points_df[~missing]
+
+
+def points_record_array(points_df, fields=POINT_FIELDS):
+    """
+    The frame as a NumPy structured array for arcpy.da.NumPyArrayToFeatureClass, which takes no object
+    columns: text becomes fixed-width unicode (missing values as ''), nullable integers become floats, booleans
+    become integers and datetimes are kept at microsecond precision.
+    """
+    points_df = numeric_points(points_df, fields)
+    columns = {}
+    for name, column in points_df.items():
+        if pd.api.types.is_bool_dtype(column):
+            values = column.astype(int).to_numpy()
+        elif pd.api.types.is_datetime64_any_dtype(column):
+            values = column.to_numpy(dtype='datetime64[us]')
+        elif pd.api.types.is_numeric_dtype(column):
+            as_float = name in fields or column.hasnans
+            values = column.to_numpy(dtype=float if as_float else None, na_value=np.nan if as_float else None)
+        else:
+            text = column.astype(object).where(column.notna(), '').astype(str)
+            width = max(int(text.str.len().max()), 1) if len(text) else 1
+            values = text.to_numpy(dtype=f"U{width}")
+        columns[str(name)] = values
+
+    records = np.empty(len(points_df), dtype=[(name, values.dtype) for name, values in columns.items()])
+    for name, values in columns.items():
+        records[name] = values
+    return records
+
+
+def points_geodataframe(points_df, x_field="Easting", y_field="Northing", z_field="Elevation"):
+    """The frame as a GeoDataFrame of 3D points in British National Grid."""
+    import geopandas as gpd
+
+    points_df = numeric_points(points_df, (x_field, y_field, z_field))
+    geometry = gpd.points_from_xy(points_df[x_field], points_df[y_field], points_df[z_field],
+                                  crs=BRITISH_NATIONAL_GRID)
+    return gpd.GeoDataFrame(points_df, geometry=geometry)
+
+
+def write_point_shapefile(points_df, out_feature_class):
+    """Write the frame as a PointZ shapefile in one pass. Returns the output path."""
+    points = points_geodataframe(points_df)
+    points.to_file(out_feature_class, engine="pyogrio")
+    logging.debug(f"Wrote {len(points)} points to {out_feature_class}")
+    return out_feature_class
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+"""Shared point spacing checks used by the profile viewer (colouring over-spaced points) and the automated QC
+   report (spacing_check). Gaps are measured between consecutive points of each profile, either along the
+   chainage or in plan (easting/northing), for every profile in one vectorised pass."""
+
+# Used when the config has no 'spacing_tolerances' entry for a region or mode
+DEFAULT_SPACING_TOLERANCES = {"chainage": 5.0, "planar": 2.5}
+
+SPACING_MODES = ("chainage", "planar")
+
+
+def spacing_tolerance(mode, region=None, settings=None):
+    """
+    Maximum allowed gap (m) for a spacing mode, optionally for a region (e.g. 'TSW01').
+
+    Tolerances come from the 'spacing_tolerances' setting, e.g.
+    {"default": {"chainage": 5.0, "planar": 2.5}, "TSW_IoS": {"planar": 5.0}}.
+    A region only needs to list the modes it overrides.
+    """
+    if mode not in SPACING_MODES:
+        raise ValueError(f"Unknown spacing mode '{mode}', expected one of {SPACING_MODES}")
+
+    if settings is None:
+        from qc_application.config.app_settings import AppSettings
+        settings = AppSettings()
+
+    tolerances = settings.get("spacing_tolerances", {}) or {}
+    default = (tolerances.get("default") or {}).get(mode, DEFAULT_SPACING_TOLERANCES[mode])
+    return float((tolerances.get(region) or {}).get(mode, default))
+
+
+def _column(df, name):
+    """Find a column case-insensitively (the viewer uses 'easting', the QC tool 'Easting')."""
+    for column in df.columns:
+        if str(column).lower() == name:
+            return df[column]
+    raise KeyError(f"DataFrame has no '{name}' column")
+
+
+def _gap_positions(df, mode, group_col):
+    """Row positions (start, end) of every gap, the gap sizes, and the profile code/labels of each gap."""
+    if mode == "chainage":
+        x = pd.to_numeric(_column(df, "chainage"), errors="coerce").to_numpy(dtype=float)
+        valid = np.isfinite(x)
+    elif mode == "planar":
+        x = pd.to_numeric(_column(df, "easting"), errors="coerce").to_numpy(dtype=float)
+        y = pd.to_numeric(_column(df, "northing"), errors="coerce").to_numpy(dtype=float)
+        valid = np.isfinite(x) & np.isfinite(y)
+    else:
+        raise ValueError(f"Unknown spacing mode '{mode}', expected one of {SPACING_MODES}")
+
+    if group_col is None:
+        profiles = np.zeros(len(df), dtype=np.int64)
+        labels = pd.Index([None])
+    else:
+        profiles, labels = pd.factorize(df[group_col], use_na_sentinel=False)
+
+    rows = np.flatnonzero(valid)
+    # Stable sort by profile keeps each profile's points in their original order
+    rows = rows[np.argsort(profiles[rows], kind="stable")]
+    start, end = rows[:-1], rows[1:]
+    same_profile = profiles[start] == profiles[end]
+    start, end = start[same_profile], end[same_profile]
+
+    if mode == "chainage":
+        gap = x[end] - x[start]
+    else:
+        gap = np.hypot(x[end] - x[start], y[end] - y[start])
+
+    return start, end, gap, labels[profiles[end]]
+
+
+def point_gaps(df, mode="chainage", group_col=None):
+    """
+    Gap between each point and the previous point of the same profile, in the current row order.
+
+    mode: 'chainage' (difference in chainage) or 'planar' (easting/northing distance).
+    group_col: profile column (e.g. 'reg_id'); None treats the whole frame as one profile.
+    Points with missing coordinates are skipped, so the gap is measured to the previous valid point.
+
+    Returns a DataFrame with one row per gap: 'profile', 'start_index' and 'end_index' (index labels of
+    the two points) and 'gap'.
+    """
+    start, end, gap, profile = _gap_positions(df, mode, group_col)
+    return pd.DataFrame({
+        "profile": profile,
+        "start_index": df.index[start],
+        "end_index": df.index[end],
+        "gap": gap,
+    })
+
+
+def over_spacing(df, tolerance, mode="chainage", group_col=None):
+    """Gap table (see point_gaps) restricted to gaps larger than tolerance."""
+    gaps = point_gaps(df, mode=mode, group_col=group_col)
+    return gaps[gaps["gap"] > tolerance].reset_index(drop=True)
+
+
+def over_spacing_mask(df, tolerance, mode="chainage", group_col=None):
+    """Boolean Series aligned with df, True for each point that ends a gap larger than tolerance."""
+    _, end, gap, _ = _gap_positions(df, mode, group_col)
+    mask = np.zeros(len(df), dtype=bool)
+    mask[end[gap > tolerance]] = True
+    return pd.Series(mask, index=df.index)
@@ -0,0 +1,207 @@
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from qc_application.utils.point_features import write_point_shapefile
+from qc_application.utils.profile_lines_index import (
+    ProfileLinesIndex, get_profile_lines_index, query_points_within
+)
+
+"""Profile-line geoprocessing for the topo QC tool: selecting a survey unit's profile lines, the offline buffer,
+   offline points and the correct-profile-line check. Two interchangeable backends share one interface:
+   ArcPyProfileLineBackend runs the original ArcPy tools, ShapelyProfileLineBackend runs the same checks in
+   memory with shapely 2 vectorised predicates over the STRtree of the shared profile lines index (see
+   profile_lines_index), and writes only the shapefiles the map shows. The 'geoprocessing_backend' setting
+   chooses one ('arcpy' by default). Only the shapely backend needs geopandas, which is imported lazily."""
+
+OFFLINE_BUFFER_DISTANCES = {"TSW_IoS": 0.03, "TSW_PCO": 0.03}  # Metres, by region
+DEFAULT_OFFLINE_BUFFER_DISTANCE = 0.1
+
+
+def offline_buffer_distance(region):
+    return OFFLINE_BUFFER_DISTANCES.get(region, DEFAULT_OFFLINE_BUFFER_DISTANCE)
+
+
+def normalise_reg_id(reg_id):
+    """reg_id as written in REGIONAL_N: surrounding whitespace and underscores removed."""
+    return str(reg_id).strip().replace('_', '')
+
+
+def reg_id_column(points_df):
+    """The points' profile ids: 'Reg_ID' from the text file converter or 'reg_id' from a shapefile/database."""
+    for column in points_df.columns:
+        if str(column).lower() == 'reg_id':
+            return points_df[column]
+    raise KeyError("Survey points have no 'Reg_ID' column")
+
+
+def point_line_pairs(x, y, line_geometries, distance):
+    """
+    (point index, line position) pairs of points within distance of a line, i.e. inside its buffer, found with
+    one STRtree query.
+    """
+    import shapely
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if len(x) == 0 or len(line_geometries) == 0:
+        return np.empty((2, 0), dtype=int)
+
+    return query_points_within(shapely.STRtree(np.asarray(line_geometries)), x, y, distance)
+
+
+def offline_point_mask(point_count, pairs):
+    """True for points that are in no (point, line) pair, i.e. not within the buffer of any line."""
+    offline = np.ones(point_count, dtype=bool)
+    offline[pairs[0]] = False
+    return offline
+
+
+def profile_line_mismatches(reg_ids, regional_names, pairs):
+    """Indices of points paired with a line whose REGIONAL_N (regional_names[line]) is not the point's reg_id."""
+    point_index, line_index = pairs
+    point_ids = np.array([normalise_reg_id(r) for r in np.asarray(reg_ids, dtype=object)[point_index]],
+                         dtype=object)
+    line_ids = np.array([str(n).strip() for n in np.asarray(regional_names, dtype=object)[line_index]],
+                        dtype=object)
+    return np.unique(point_index[point_ids != line_ids])
+
+
+class ShapelyProfileLineBackend:
+    """
+    In-memory profile-line checks against the shared profile lines index. Only the selected lines, buffer and
+    offline points are written, for the map.
+    """
+
+    name = "shapely"
+
+    def __init__(self):
+        self._lines = {}  # {path: (lines, buffer distance, ProfileLinesIndex or None)}
+
+    @staticmethod
+    def read_lines(path):
+        import geopandas as gpd
+
+        return gpd.read_file(path, engine="pyogrio")
+
+    def _lines_for(self, path):
+        if path not in self._lines:
+            self._lines[path] = (self.read_lines(path), 0.0, None)
+        return self._lines[path]
+
+    def _pairs(self, offline_line_buffer_path, standardised_df):
+        """(point index, line position) pairs of survey points inside the buffer, and the buffered lines."""
+        lines, distance, index = self._lines_for(offline_line_buffer_path)
+        # Text coordinates from the converter; blanks become NaN and match no line, i.e. count as offline
+        x = pd.to_numeric(standardised_df["Easting"], errors='coerce')
+        y = pd.to_numeric(standardised_df["Northing"], errors='coerce')
+        if index is None:  # A buffer made elsewhere, used as polygons
+            return point_line_pairs(x, y, lines.geometry.values, distance), lines
+
+        point_index, line_ids = index.line_pairs(x, y, distance, lines.index.to_numpy())
+        return np.vstack([point_index, lines.index.get_indexer(line_ids)]), lines
+
+    def make_xy_event_layer(self, standardised_df, workspace, output_file_name):
+        out_feature_class = os.path.join(workspace, output_file_name)
+        if os.path.exists(out_feature_class):
+            logging.warning(f"Output file already exists, skipping creation: {out_feature_class}")
+        else:
+            write_point_shapefile(standardised_df, out_feature_class)
+            logging.info(f"Successfully created point feature class: {out_feature_class}")
+        return out_feature_class
+
+    def extract_interim_lines(self, survey_profile_lines_shp, workspace, extracted_cell, file_friendly_survey_unit,
+                              is_baseline_survey=False):
+        try:
+            output_shp = os.path.join(
+                workspace,
+                f"SelectedInterimLines_{extracted_cell}{file_friendly_survey_unit}_Auto.shp"
+            )
+            index = get_profile_lines_index(survey_profile_lines_shp)
+            selected = index.select(file_friendly_survey_unit, is_baseline_survey)
+            selected.to_file(output_shp, engine="pyogrio")
+            self._lines[output_shp] = (selected, 0.0, index)
+            logging.info(f"Selected {len(selected)} lines saved to: {output_shp}")
+            return output_shp
+        except Exception as e:
+            logging.error(f"An unexpected error occurred: {e}")
+            return None
+
+    def create_offline_buffer(self, region, offline_line_buffer_path, selected_interim_lines):
+        lines, _, index = self._lines_for(selected_interim_lines)
+        buffer_distance = offline_buffer_distance(region)
+
+        lines.set_geometry(lines.buffer(buffer_distance)).to_file(offline_line_buffer_path, engine="pyogrio")
+        if index is None:
+            index = ProfileLinesIndex(lines)
+            lines = index.lines
+        self._lines[offline_line_buffer_path] = (lines, buffer_distance, index)
+        logging.info(f"Offline Buffer of {buffer_distance}m created at: {offline_line_buffer_path}")
+
+    def get_offline_points(self, points_file_path, offline_line_buffer_path, standardised_df, offline_points_path,
+                           workspace):
+        pairs, _ = self._pairs(offline_line_buffer_path, standardised_df)
+        offline_points_df = standardised_df[offline_point_mask(len(standardised_df), pairs)]
+
+        if not offline_points_df.empty:
+            logging.warning(f"{len(offline_points_df)} offline points were found.")
+            write_point_shapefile(offline_points_df, offline_points_path)
+        else:
+            logging.info("No offline points were found. ✅")
+
+        return offline_points_df
+
+    def check_points_lie_on_correct_profile_lines(self, points_file_path, offline_line_buffer_path,
+                                                  standardised_df=None):
+        if standardised_df is None:
+            standardised_df = self.read_lines(points_file_path)
+
+        pairs, lines = self._pairs(offline_line_buffer_path, standardised_df)
+        mismatches = profile_line_mismatches(reg_id_column(standardised_df), lines["REGIONAL_N"].to_numpy(), pairs)
+        if len(mismatches):
+            logging.info(f"{len(mismatches)} points lie on the buffer of a different profile line")
+        return len(mismatches) == 0
+
+
+class ArcPyProfileLineBackend:
+    """The original ArcPy geoprocessing (Select, Buffer, Clip and Intersect through shapefiles)."""
+
+    name = "arcpy"
+
+    def __init__(self):
+        from qc_application.utils import main_qc_tool_helper_functions as helpers
+
+        self._helpers = helpers
+
+    def make_xy_event_layer(self, standardised_df, workspace, output_file_name):
+        return self._helpers.make_xy_event_layer(standardised_df, workspace, output_file_name)
+
+    def extract_interim_lines(self, *args, **kwargs):
+        return self._helpers.extract_interim_lines(*args, **kwargs)
+
+    def create_offline_buffer(self, region, offline_line_buffer_path, selected_interim_lines):
+        return self._helpers.create_offline_buffer(region, offline_line_buffer_path, selected_interim_lines)
+
+    def get_offline_points(self, *args, **kwargs):
+        return self._helpers.get_offline_points(*args, **kwargs)
+
+    def check_points_lie_on_correct_profile_lines(self, points_file_path, offline_line_buffer_path,
+                                                  standardised_df=None):
+        return self._helpers.check_points_lie_on_correct_profile_lines(points_file_path, offline_line_buffer_path)
+
+
+BACKENDS = {backend.name: backend for backend in (ArcPyProfileLineBackend, ShapelyProfileLineBackend)}
+
+
+def get_profile_line_backend(name=None):
+    """A new backend instance, chosen by name or the 'geoprocessing_backend' setting."""
+    if name is None:
+        from qc_application.config.app_settings import AppSettings
+
+        name = AppSettings().get("geoprocessing_backend", "arcpy")
+    if name not in BACKENDS:
+        logging.warning(f"Unknown geoprocessing backend '{name}', using arcpy.")
+        name = "arcpy"
+    return BACKENDS[name]()
@@ -0,0 +1,143 @@
+import hashlib
+import logging
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+"""Process-wide index of the survey profile lines shapefile (SW_PROFILES_PHASE4_ALL.shp) for the shapely
+   profile-line backend. The layer is read once per process into a GeoDataFrame with row lookups by SURVEY_UNT
+   and CELL, the REGIONAL_N of every line and an STRtree over the geometries, so selecting a survey's lines and
+   the profile-line checks never re-read the shapefile. The layer is also cached as Feather (needs pyarrow)
+   next to the app config, keyed by the shapefile's name, modification time and size, so later runs skip
+   parsing it. Only the shapely backend uses it: the ArcPy backend and the survey unit/cell validation keep to
+   ArcPy, which is all ArcGIS Pro's Python environment is guaranteed to have."""
+
+INDEX_COLUMNS = ['SURVEY_UNT', 'CELL', 'REGIONAL_N', 'INTERIM', 'BASELINE']
+SHAPEFILE_PARTS = ('.shp', '.dbf', '.shx')
+
+
+class ProfileLinesIndex:
+    """Profile lines with lookups by survey unit and cell. Row positions in `lines` are the line ids."""
+
+    def __init__(self, lines):
+        lines = lines.reset_index(drop=True)
+        missing = [column for column in INDEX_COLUMNS if column not in lines.columns]
+        if missing:
+            logging.warning(f"Profile lines have no {missing} attribute(s), they are treated as empty.")
+            for column in missing:
+                lines[column] = None
+        self.lines = lines
+
+        self.by_survey_unit = self._row_lookup('SURVEY_UNT')
+        self.by_cell = self._row_lookup('CELL')
+        self.regional_names = np.array([str(name).strip() for name in lines['REGIONAL_N']], dtype=object)
+        self._tree = None
+        self._tree_lock = threading.Lock()
+
+    def _row_lookup(self, column):
+        return dict(self.lines.groupby(column, dropna=True).indices)
+
+    @property
+    def tree(self):
+        with self._tree_lock:
+            if self._tree is None:
+                import shapely
+
+                self._tree = shapely.STRtree(self.lines.geometry.values)
+            return self._tree
+
+    def has_survey_unit(self, survey_unit):
+        return survey_unit in self.by_survey_unit
+
+    def has_cell(self, cell):
+        return cell in self.by_cell
+
+    def select(self, file_friendly_survey_unit, is_baseline_survey=False):
+        """The survey unit's baseline or interim lines (index labels are line ids)."""
+        query_type = "BASELINE" if is_baseline_survey else "INTERIM"
+        rows = self.by_survey_unit.get(file_friendly_survey_unit.replace("_", "-"), np.empty(0, dtype=int))
+        selected = self.lines.iloc[np.sort(rows)]
+        return selected[selected[query_type] == 'YES']
+
+    def line_pairs(self, x, y, distance, line_ids=None):
+        """(point index, line id) pairs of points within distance of a line, optionally only lines in line_ids."""
+        pairs = query_points_within(self.tree, x, y, distance)
+        if line_ids is not None:
+            pairs = pairs[:, np.isin(pairs[1], line_ids)]
+        return pairs
+
+    @classmethod
+    def load(cls, shapefile_path, cache_dir=None):
+        """Read the layer from its Feather cache when the shapefile is unchanged, else parse and re-cache it."""
+        import geopandas as gpd
+
+        cache_file = feather_cache_path(shapefile_path, cache_dir) if cache_dir else None
+        if cache_file is not None and cache_file.exists():
+            try:
+                lines = gpd.read_feather(cache_file)
+                logging.info(f"Loaded {len(lines)} profile lines from cache {cache_file}")
+                return cls(lines)
+            except Exception as e:
+                logging.warning(f"Ignoring unreadable profile lines cache {cache_file}: {e}")
+
+        lines = gpd.read_file(shapefile_path, engine="pyogrio")
+        logging.info(f"Loaded {len(lines)} profile lines from {shapefile_path}")
+        index = cls(lines)
+
+        if cache_file is not None:
+            try:
+                cache_file.parent.mkdir(parents=True, exist_ok=True)
+                for stale in cache_file.parent.glob(f"{cache_file.name.rsplit('_', 1)[0]}_*.feather"):
+                    stale.unlink()
+                index.lines.to_feather(cache_file)
+            except Exception as e:
+                logging.warning(f"Could not write profile lines cache {cache_file}: {e}")
+        return index
+
+
+def query_points_within(tree, x, y, distance):
+    """
+    (point index, tree index) pairs of points within distance of a tree geometry. Points with a missing
+    coordinate match nothing (GEOS rejects them in the query).
+    """
+    import shapely
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    finite = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+    pairs = tree.query(shapely.points(x[finite], y[finite]), predicate='dwithin', distance=distance)
+    return np.vstack([finite[pairs[0]], pairs[1]])
+
+
+def feather_cache_path(shapefile_path, cache_dir):
+    """
+    Cache file named by the shapefile's name and a hash of its parts' modification times and sizes. The
+    directory is left out because each QC run works on a fresh copy of the dependencies (copytree keeps mtimes).
+    """
+    stem = os.path.splitext(os.path.abspath(shapefile_path))[0]
+    versions = []
+    for extension in SHAPEFILE_PARTS:
+        if os.path.exists(stem + extension):
+            stat = os.stat(stem + extension)
+            versions.append(f"{extension}:{stat.st_mtime_ns}:{stat.st_size}")
+
+    version_key = hashlib.md5("|".join(versions).encode()).hexdigest()[:12]
+    return Path(cache_dir) / f"{os.path.basename(stem)}_{version_key}.feather"
+
+
+_shared_indexes = {}
+_shared_indexes_lock = threading.Lock()
+
+
+def get_profile_lines_index(shapefile_path):
+    """Return the process-wide index of a profile lines shapefile, loading it on first use."""
+    key = os.path.abspath(shapefile_path)
+    with _shared_indexes_lock:
+        if key not in _shared_indexes:
+            from qc_application.config.app_settings import AppSettings
+
+            cache_dir = AppSettings().config_path.parent / "cache"
+            _shared_indexes[key] = ProfileLinesIndex.load(shapefile_path, cache_dir)
+        return _shared_indexes[key]
@@ -0,0 +1,185 @@
+import logging
+
+import numpy as np
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.colors import to_rgba_array
+
+from qc_application.utils.feature_code_labels import FeatureCodeLabels
+
+"""Retained-mode renderer for the profile viewer plot. The lines, point collections and labels are created once
+   and updated in place (set_data / set_offsets) when the profile changes, instead of clearing the axes and
+   rebuilding every artist. Feature code labels are a single level-of-detail collection (see feature_code_labels). While a point is dragged only the moving artists are redrawn, blitted over a cached
+   background of the rest of the figure."""
+
+HISTORICAL_ZORDER = 1
+
+
+def _runs(*arrays):
+    """Slices of the runs where every array is finite, so bands and lines break over gaps."""
+    finite = np.logical_and.reduce([np.isfinite(a) for a in arrays])
+    edges = np.flatnonzero(np.diff(np.r_[0, finite.astype(np.int8), 0]))
+    return [slice(start, end) for start, end in zip(edges[::2], edges[1::2])]
+
+
+def _xy(x, y):
+    """(n, 2) float array of points, used for scatter offsets."""
+    return np.column_stack([np.asarray(x, dtype=float), np.asarray(y, dtype=float)]).reshape(-1, 2)
+
+
+class ProfilePlotRenderer:
+    """
+    Owns the artists of the profile viewer axes.
+
+    Call the set_* methods for the current profile then draw(). Hidden artists keep a '_' label so they
+    stay out of the legend.
+    """
+
+    def __init__(self, canvas, ax):
+        self.canvas = canvas
+        self.ax = ax
+
+        self.survey_line, = ax.plot([], [], color='blue', zorder=2)
+        self.survey_points = ax.scatter([], [], color='lightblue', picker=5, zorder=3)
+        self.master_line, = ax.plot([], [], color='red')
+        self.master_points = ax.scatter([], [], color='gray', picker=5, zorder=3)
+        self.added_points = ax.scatter([], [], color='red', zorder=5)
+        self.fc_labels = FeatureCodeLabels(ax)
+        self.historical_lines = []  # Pool of Line2D artists, reused between profiles
+
+        # Historical envelope: min-max band, mean line and percentile lines
+        self.envelope_band = PolyCollection([], facecolors='gray', edgecolors='none', alpha=0.25,
+                                            zorder=HISTORICAL_ZORDER)
+        self.envelope_percentiles = LineCollection([], colors='gray', linestyles='dotted', linewidths=1,
+                                                   zorder=HISTORICAL_ZORDER)
+        ax.add_collection(self.envelope_band, autolim=False)
+        ax.add_collection(self.envelope_percentiles, autolim=False)
+        self.envelope_mean, = ax.plot([], [], color='dimgray', linestyle='--', linewidth=1, zorder=HISTORICAL_ZORDER)
+
+        ax.set_xlabel('Chainage')
+        ax.set_ylabel('Elevation')
+
+        self._background = None
+        self._drag_artists = []
+        self.cid_draw = canvas.mpl_connect('draw_event', self.on_draw)
+
+    @staticmethod
+    def _show(artist, label, visible):
+        artist.set_visible(visible)
+        artist.set_label(label if visible else f'_{label}')
+
+    def set_survey(self, chainage, elevation, colors='lightblue', labels=None):
+        """Survey line and points; labels is an optional sequence of feature codes drawn above each point."""
+        visible = len(chainage) > 0
+        self.survey_line.set_data(chainage, elevation)
+        self.survey_points.set_offsets(_xy(chainage, elevation))
+        self.survey_points.set_color(to_rgba_array(colors) if visible else 'lightblue')
+        self._show(self.survey_line, 'Profile Data Line', visible)
+        self._show(self.survey_points, 'Profile Data Points', visible)
+        self.fc_labels.set_labels(chainage, elevation, labels if visible else None)
+
+    def set_master(self, chainage, elevation):
+        visible = len(chainage) > 0
+        self.master_line.set_data(chainage, elevation)
+        self.master_points.set_offsets(_xy(chainage, elevation))
+        self._show(self.master_line, 'Master Profile', visible)
+        self._show(self.master_points, 'Master Profile Points', visible)
+
+    def set_added_points(self, x, y):
+        self.added_points.set_offsets(_xy(x, y))
+        self._show(self.added_points, 'Added Points', len(x) > 0)
+
+    def set_historical(self, lines):
+        """lines: list of dicts with 'x', 'y', 'color', 'alpha' and 'label' (None for no legend entry)."""
+        while len(self.historical_lines) < len(lines):
+            line, = self.ax.plot([], [], zorder=HISTORICAL_ZORDER)
+            self.historical_lines.append(line)
+
+        for artist, line in zip(self.historical_lines, lines):
+            artist.set_data(line['x'], line['y'])
+            artist.set_color(line['color'])
+            artist.set_alpha(line['alpha'])
+            artist.set_label(line['label'] if line['label'] else '_historical')
+            artist.set_visible(True)
+        for artist in self.historical_lines[len(lines):]:
+            self._show(artist, 'historical', False)
+
+    def set_envelope(self, envelope):
+        """Historical envelope from profile_envelope, or None to hide it."""
+        visible = envelope is not None
+        band, percentile_lines = [], []
+        if visible:
+            x, low, high = envelope['chainage'], envelope['min'], envelope['max']
+            for run in _runs(low, high):
+                band.append(np.r_[np.column_stack([x[run], low[run]]), np.column_stack([x[run], high[run]])[::-1]])
+            for values in envelope['percentiles'].values():
+                percentile_lines += [np.column_stack([x[run], values[run]]) for run in _runs(values)]
+            self.envelope_mean.set_data(x, envelope['mean'])
+            band_label = f"Historical range ({envelope['surveys']} surveys)"
+            percentile_label = "Historical P" + "/".join(str(p) for p in envelope['percentiles'])
+        else:
+            self.envelope_mean.set_data([], [])
+            band_label, percentile_label = 'Historical range', 'Historical percentiles'
+
+        self.envelope_band.set_verts(band)
+        self.envelope_percentiles.set_segments(percentile_lines)
+        self._show(self.envelope_band, band_label, visible)
+        self._show(self.envelope_mean, 'Historical mean', visible)
+        self._show(self.envelope_percentiles, percentile_label, visible and bool(percentile_lines))
+
+    def draw(self, title):
+        """Rescale to the visible data, rebuild the legend and redraw the whole figure."""
+        self.end_drag(redraw=False)
+        ax = self.ax
+
+        ax.set_title(title)
+        ax.relim(visible_only=True)
+        # relim ignores collections, the added points can lie outside the lines
+        if self.added_points.get_visible():
+            ax.update_datalim(self.added_points.get_offsets())
+        if self.envelope_band.get_visible() and self.envelope_band.get_paths():
+            ax.update_datalim(np.vstack([path.vertices for path in self.envelope_band.get_paths()]))
+        ax.autoscale()
+
+        ax.legend()
+        self.fc_labels.update()  # Labels for the new limits, so the limit change needs no debounced redraw
+        self.canvas.draw()
+        self.fc_labels.cancel_pending()
+
+    # --- Blitting while dragging ---
+
+    def begin_drag(self, artists):
+        """Mark artists as moving: they are left out of the cached background and redrawn by blit()."""
+        self._drag_artists = [artist for artist in artists if artist is not None]
+        for artist in self._drag_artists:
+            artist.set_animated(True)
+        self.canvas.draw()  # Fires on_draw, which caches the background without the moving artists
+
+    def on_draw(self, event):
+        """Re-cache the background after any full redraw (resize, zoom) while a drag is in progress."""
+        if self._drag_artists and self.canvas.supports_blit:
+            self._background = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+            self._draw_drag_artists()
+
+    def _draw_drag_artists(self):
+        for artist in self._drag_artists:
+            self.ax.draw_artist(artist)
+
+    def blit(self):
+        """Redraw only the moving artists over the cached background."""
+        if self._background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self._background)
+        self._draw_drag_artists()
+        self.canvas.blit(self.canvas.figure.bbox)
+
+    def end_drag(self, redraw=True):
+        if not self._drag_artists:
+            return
+        for artist in self._drag_artists:
+            artist.set_animated(False)
+        self._drag_artists = []
+        self._background = None
+        if redraw:
+            self.canvas.draw_idle()
+        logging.debug("Drag rendering finished, full redraw scheduled.")
@@ -1,13 +1,196 @@
+import numpy as np
 import pandas as pd
 
+from qc_application.utils.point_spacing import over_spacing_mask
+
+
+def orientation(p, q, r):
+    val = (q[1]-p[1]) * (r[0]-q[0]) - (q[0]-p[0]) * (r[1]-q[1])
+    if val == 0: return 0  # collinear
+    return 1 if val > 0 else 2  # clockwise / counterclockwise
+
+
+def on_segment(p, q, r):
+    return (min(p[0], r[0]) <= q[0] <= max(p[0], r[0]) and
+            min(p[1], r[1]) <= q[1] <= max(p[1], r[1]))
+
+
+def segments_intersect(p1, q1, p2, q2):
+    """Scalar reference test for a single segment pair (touching and collinear overlap count)."""
+    o1 = orientation(p1, q1, p2)
+    o2 = orientation(p1, q1, q2)
+    o3 = orientation(p2, q2, p1)
+    o4 = orientation(p2, q2, q1)
+
+    if o1 != o2 and o3 != o4:
+        return True
+    if o1 == 0 and on_segment(p1, p2, q1): return True
+    if o2 == 0 and on_segment(p1, q2, q1): return True
+    if o3 == 0 and on_segment(p2, p1, q2): return True
+    if o4 == 0 and on_segment(p2, q1, q2): return True
+    return False
+
+
+# --- Vectorised crossing kernel ---
+# The array versions below evaluate exactly the same float64 expressions as the scalar helpers above,
+# including Python's min()/max() behaviour with NaN, so results match segments_intersect pair for pair.
+
+def _orientation_array(px, py, qx, qy, rx, ry):
+    with np.errstate(invalid='ignore'):
+        val = (qy - py) * (rx - qx) - (qx - px) * (ry - qy)
+    return np.where(val == 0, 0, np.where(val > 0, 1, 2))
+
+
+def _py_min(a, b):
+    return np.where(b < a, b, a)
+
+
+def _py_max(a, b):
+    return np.where(b > a, b, a)
+
+
+def _on_segment_array(px, py, qx, qy, rx, ry):
+    return ((_py_min(px, rx) <= qx) & (qx <= _py_max(px, rx)) &
+            (_py_min(py, ry) <= qy) & (qy <= _py_max(py, ry)))
+
+
+def segments_intersect_array(p1x, p1y, q1x, q1y, p2x, p2y, q2x, q2y):
+    """Vectorised segments_intersect: every argument is an equal-length array, one entry per segment pair."""
+    o1 = _orientation_array(p1x, p1y, q1x, q1y, p2x, p2y)
+    o2 = _orientation_array(p1x, p1y, q1x, q1y, q2x, q2y)
+    o3 = _orientation_array(p2x, p2y, q2x, q2y, p1x, p1y)
+    o4 = _orientation_array(p2x, p2y, q2x, q2y, q1x, q1y)
+
+    result = (o1 != o2) & (o3 != o4)
+    result |= (o1 == 0) & _on_segment_array(p1x, p1y, p2x, p2y, q1x, q1y)
+    result |= (o2 == 0) & _on_segment_array(p1x, p1y, q2x, q2y, q1x, q1y)
+    result |= (o3 == 0) & _on_segment_array(p2x, p2y, p1x, p1y, q2x, q2y)
+    result |= (o4 == 0) & _on_segment_array(p2x, p2y, q1x, q1y, q2x, q2y)
+    return result
+
+
+def _expand_windows(rows, start, stop, order):
+    """Expand per-row [start, stop) windows into flat (row, order[k]) index pairs."""
+    counts = np.clip(stop - start, 0, None)
+    i = np.repeat(rows, counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    j = order[np.repeat(start, counts) + offsets]
+    return i, j
+
+
+def candidate_segment_pairs(ax, bx, a_groups=None, b_groups=None):
+    """
+    Return (i, j) index arrays of the segments of polyline a and polyline b whose chainage ranges overlap.
+    Segment k joins point k and k + 1. When group codes are given (e.g. factorised reg_id) several
+    polylines can be passed at once: segments that join two groups are dropped and only pairs from the
+    same group are returned.
+
+    Segments that share no chainage cannot touch, so only these pairs need the full intersection test.
+    The pruning uses exact comparisons and does not require either polyline to be sorted. Segments with a
+    non-finite chainage are paired with every segment of their group on the other side so they get the
+    same answer as the scalar test. The only pairs left out are chainage-disjoint ones, which
+    segments_intersect can report only through round-off on near-collinear geometry.
+    """
+    ax = np.asarray(ax, dtype=float)
+    bx = np.asarray(bx, dtype=float)
+    a_groups = np.zeros(len(ax), dtype=np.int64) if a_groups is None else np.asarray(a_groups, dtype=np.int64)
+    b_groups = np.zeros(len(bx), dtype=np.int64) if b_groups is None else np.asarray(b_groups, dtype=np.int64)
+    empty = np.empty(0, dtype=np.intp)
+    if len(ax) < 2 or len(bx) < 2:
+        return empty, empty
+
+    a_lo = _py_min(ax[:-1], ax[1:])
+    a_hi = _py_max(ax[:-1], ax[1:])
+    b_lo = _py_min(bx[:-1], bx[1:])
+    b_hi = _py_max(bx[:-1], bx[1:])
+    a_seg_group = a_groups[:-1]
+    b_seg_group = b_groups[:-1]
+
+    a_real = a_groups[:-1] == a_groups[1:]
+    b_real = b_groups[:-1] == b_groups[1:]
+    a_finite = np.isfinite(ax[:-1]) & np.isfinite(ax[1:])
+    b_finite = np.isfinite(bx[:-1]) & np.isfinite(bx[1:])
+    a_ok = np.flatnonzero(a_real & a_finite)
+    b_ok = np.flatnonzero(b_real & b_finite)
+
+    pairs_i = []
+    pairs_j = []
+
+    if a_ok.size and b_ok.size:
+        # Replace chainage by its exact rank so (group, chainage) packs into one sortable integer key
+        values = np.unique(np.concatenate([a_lo[a_ok], a_hi[a_ok], b_lo[b_ok], b_hi[b_ok]]))
+        width = len(values) + 1
+
+        def key(groups, chainage):
+            return groups * width + np.searchsorted(values, chainage)
+
+        # Order b by its lower bound; a running max of the upper bound then gives a contiguous candidate
+        # window. The group term dominates the key, so windows never spill into another group.
+        order = b_ok[np.argsort(key(b_seg_group[b_ok], b_lo[b_ok]), kind='stable')]
+        lo_sorted = key(b_seg_group[order], b_lo[order])
+        hi_running_max = np.maximum.accumulate(key(b_seg_group[order], b_hi[order]))
+
+        start = np.searchsorted(hi_running_max, key(a_seg_group[a_ok], a_lo[a_ok]), side='left')
+        stop = np.searchsorted(lo_sorted, key(a_seg_group[a_ok], a_hi[a_ok]), side='right')
+        i, j = _expand_windows(a_ok, start, stop, order)
+
+        # The window is a superset for unsorted input, finish with the exact overlap test
+        keep = (b_lo[j] <= a_hi[i]) & (b_hi[j] >= a_lo[i])
+        pairs_i.append(i[keep])
+        pairs_j.append(j[keep])
+
+    # Non-finite segments are rare (coerced bad values); test them against their whole group
+    a_bad = np.flatnonzero(a_real & ~a_finite)
+    b_bad = np.flatnonzero(b_real & ~b_finite)
+    if a_bad.size:
+        b_all = np.flatnonzero(b_real)
+        b_all = b_all[np.argsort(b_seg_group[b_all], kind='stable')]
+        start = np.searchsorted(b_seg_group[b_all], a_seg_group[a_bad], side='left')
+        stop = np.searchsorted(b_seg_group[b_all], a_seg_group[a_bad], side='right')
+        i, j = _expand_windows(a_bad, start, stop, b_all)
+        pairs_i.append(i)
+        pairs_j.append(j)
+    if b_bad.size and a_ok.size:
+        b_bad = b_bad[np.argsort(b_seg_group[b_bad], kind='stable')]
+        start = np.searchsorted(b_seg_group[b_bad], a_seg_group[a_ok], side='left')
+        stop = np.searchsorted(b_seg_group[b_bad], a_seg_group[a_ok], side='right')
+        i, j = _expand_windows(a_ok, start, stop, b_bad)
+        pairs_i.append(i)
+        pairs_j.append(j)
+
+    if not pairs_i:
+        return empty, empty
+    return np.concatenate(pairs_i).astype(np.intp), np.concatenate(pairs_j).astype(np.intp)
+
+
+def crossing_mask(ax, ay, bx, by, a_groups=None, b_groups=None):
+    """Return (i, j, hits) for the candidate segment pairs of polylines a and b and whether each pair intersects."""
+    ax = np.asarray(ax, dtype=float)
+    ay = np.asarray(ay, dtype=float)
+    bx = np.asarray(bx, dtype=float)
+    by = np.asarray(by, dtype=float)
+
+    i, j = candidate_segment_pairs(ax, bx, a_groups, b_groups)
+    hits = segments_intersect_array(ax[i], ay[i], ax[i + 1], ay[i + 1],
+                                    bx[j], by[j], bx[j + 1], by[j + 1])
+    return i, j, hits
+
+
+def count_crossings(ax, ay, bx, by):
+    """Count the segment pairs of polylines a and b that intersect (same rules as segments_intersect)."""
+    _, _, hits = crossing_mask(ax, ay, bx, by)
+    return int(np.count_nonzero(hits))
+
+
 def qc_profile(master_df, survey_df):
     """
     master_df, survey_df: pandas DataFrames with columns ['chainage', 'elevation']
     chainage increases seaward.
     Returns dict with flags and diagnostics.
     """
-    master = master_df.sort_values('chainage').reset_index(drop=True)
-    survey = survey_df.sort_values('chainage').reset_index(drop=True)
+    # Stable sorts keep tied chainages in survey order, as qc_survey's lexsort does
+    master = master_df.sort_values('chainage', kind='stable').reset_index(drop=True)
+    survey = survey_df.sort_values('chainage', kind='stable').reset_index(drop=True)
 
     flags = []
 
@@ -30,7 +213,7 @@ def qc_profile(master_df, survey_df):
 
     # Check chainage order increases for each point
     survey_raw_chainage = survey_df['chainage']
-    sorted_survey_chainage = survey_df['chainage'].sort_values().reset_index(drop=True)
+    sorted_survey_chainage = survey_df['chainage'].sort_values(kind='stable').reset_index(drop=True)
     survey_raw_chainage_reset = survey_raw_chainage.reset_index(drop=True)
     if not survey_raw_chainage_reset.equals(sorted_survey_chainage):
         flags.append("Survey chainage values are not strictly increasing")
@@ -42,38 +225,10 @@ def qc_profile(master_df, survey_df):
             flags.append("Survey elevation does not meet depth at seaward end")
 
     # --- Check 3: Count crossings between master and survey ---
-    def orientation(p, q, r):
-        val = (q[1]-p[1]) * (r[0]-q[0]) - (q[0]-p[0]) * (r[1]-q[1])
-        if val == 0: return 0  # collinear
-        return 1 if val > 0 else 2  # clockwise / counterclockwise
-
-    def on_segment(p, q, r):
-        return (min(p[0], r[0]) <= q[0] <= max(p[0], r[0]) and
-                min(p[1], r[1]) <= q[1] <= max(p[1], r[1]))
-
-    def segments_intersect(p1, q1, p2, q2):
-        o1 = orientation(p1, q1, p2)
-        o2 = orientation(p1, q1, q2)
-        o3 = orientation(p2, q2, p1)
-        o4 = orientation(p2, q2, q1)
-
-        if o1 != o2 and o3 != o4:
-            return True
-        if o1 == 0 and on_segment(p1, p2, q1): return True
-        if o2 == 0 and on_segment(p1, q2, q1): return True
-        if o3 == 0 and on_segment(p2, p1, q2): return True
-        if o4 == 0 and on_segment(p2, q1, q2): return True
-        return False
-
-    crossings = 0
-    for i in range(len(master) - 1):
-        m1 = (master.loc[i, 'chainage'], master.loc[i, 'elevation'])
-        m2 = (master.loc[i + 1, 'chainage'], master.loc[i + 1, 'elevation'])
-        for j in range(len(survey) - 1):
-            s1 = (survey.loc[j, 'chainage'], survey.loc[j, 'elevation'])
-            s2 = (survey.loc[j + 1, 'chainage'], survey.loc[j + 1, 'elevation'])
-            if segments_intersect(m1, m2, s1, s2):
-                crossings += 1
+    crossings = count_crossings(
+        master['chainage'].to_numpy(dtype=float), master['elevation'].to_numpy(dtype=float),
+        survey['chainage'].to_numpy(dtype=float), survey['elevation'].to_numpy(dtype=float),
+    )
 
     if crossings == 0:
         flags.clear()
@@ -96,24 +251,165 @@ def qc_profile(master_df, survey_df):
     return {"flags": flags, "diagnostics": diagnostics}
 
 
-def find_over_spacing(df, max_spacing=5.0):
+def qc_survey(master_profiles_df, survey_df):
     """
-    Identify segments in the profile where the spacing between consecutive chainage points exceeds max_spacing.
-    Returns a list of tuples indicating the start and end chainage of each over-spaced segment.
+    Run every qc_profile check for all profiles of a survey in one grouped pass.
+
+    master_profiles_df: master profiles for the survey with columns ['profile_id', 'chainage', 'elevation']
+    survey_df: survey points with columns ['reg_id', 'chainage', 'elevation'] ('elevation_od' is accepted)
+    Thresholds are the same as qc_profile (0.9/0.3 master chainage quantiles, master minimum as MLSW).
+
+    Returns a DataFrame with one row per survey reg_id (first-seen order) holding the diagnostics,
+    one boolean column per check, the list of flag messages and an overall 'flagged' column.
     """
+    survey = survey_df.copy()
+    if 'elevation' not in survey.columns and 'elevation_od' in survey.columns:
+        survey['elevation'] = survey['elevation_od']
+    survey['reg_id'] = survey['reg_id'].astype(str).str.strip()
+    survey['chainage'] = pd.to_numeric(survey['chainage'], errors='coerce')
+    survey['elevation'] = pd.to_numeric(survey['elevation'], errors='coerce')
+
+    master = master_profiles_df[['profile_id', 'chainage', 'elevation']].copy()
+    master['profile_id'] = master['profile_id'].astype(str).str.strip()
+    master['chainage'] = pd.to_numeric(master['chainage'], errors='coerce')
+    master['elevation'] = pd.to_numeric(master['elevation'], errors='coerce')
+
+    # One shared integer code per profile so master and survey rows can be matched by array ops
+    profiles = pd.Index(pd.unique(survey['reg_id']))
+    survey_codes = profiles.get_indexer(survey['reg_id'])
+    master = master[master['profile_id'].isin(profiles)]
+    master_codes = profiles.get_indexer(master['profile_id'])
+    n_profiles = len(profiles)
+
+    master_groups = master.groupby(master_codes)
+    mlsw = master_groups['elevation'].min().reindex(range(n_profiles))
+    cutoff_chainage = master_groups['chainage'].quantile(0.9).reindex(range(n_profiles))
+    min_cutoff_chainage = master_groups['chainage'].quantile(0.3).reindex(range(n_profiles))
+    max_master_chainage = master_groups['chainage'].max().reindex(range(n_profiles))
+
+    survey_groups = survey.groupby(survey_codes)
+    min_survey_elevation = survey_groups['elevation'].min().reindex(range(n_profiles))
+    max_survey_chainage = survey_groups['chainage'].max().reindex(range(n_profiles))
+
+    survey_chainage = survey['chainage'].to_numpy(dtype=float)
+    survey_elevation = survey['elevation'].to_numpy(dtype=float)
+
+    # --- Check 1: Profile reaches MLW ---
+    misses_mlw = (min_survey_elevation > mlsw).to_numpy()
+
+    # --- Check 2: Survey extent (landward) ---
+    landward_cutoff = min_cutoff_chainage.to_numpy()[survey_codes]
+    reaches_landward = np.bincount(survey_codes[survey_chainage <= landward_cutoff], minlength=n_profiles) > 0
+    misses_landward = ~reaches_landward
+
+    # Chainage order: each profile's raw chainage must equal its sorted chainage (NaN sorts last)
+    raw_order = np.argsort(survey_codes, kind='stable')
+    sorted_order = np.lexsort((survey_chainage, survey_codes))
+    raw_values = survey_chainage[raw_order]
+    sorted_values = survey_chainage[sorted_order]
+    differs = ~((raw_values == sorted_values) | (np.isnan(raw_values) & np.isnan(sorted_values)))
+    not_increasing = np.bincount(survey_codes[raw_order][differs], minlength=n_profiles) > 0
+
+    # --- Check 4: Seaward section stays above MLSW ---
+    seaward = survey_chainage >= cutoff_chainage.to_numpy()[survey_codes]
+    seaward_min = (pd.Series(survey_elevation[seaward])
+                   .groupby(survey_codes[seaward]).min()
+                   .reindex(range(n_profiles)))
+    seaward_above_mlsw = (seaward_min > mlsw).to_numpy() & ~misses_mlw
+
+    # --- Check 3: Count crossings between master and survey ---
+    # Sort each profile by chainage exactly as qc_profile does before walking the segments
+    master_sorted = np.lexsort((master['chainage'].to_numpy(dtype=float), master_codes))
+    survey_sorted = sorted_order
+    master_codes_sorted = master_codes[master_sorted]
+    i, _, hits = crossing_mask(
+        master['chainage'].to_numpy(dtype=float)[master_sorted],
+        master['elevation'].to_numpy(dtype=float)[master_sorted],
+        survey_chainage[survey_sorted], survey_elevation[survey_sorted],
+        a_groups=master_codes_sorted, b_groups=survey_codes[survey_sorted],
+    )
+    crossings = np.bincount(master_codes_sorted[i[hits]], minlength=n_profiles)
+
+    no_crossings = crossings == 0
+    excess_crossings = ~no_crossings & (crossings > 2) & ~not_increasing
+
+    results = pd.DataFrame({
+        'reg_id': profiles,
+        'mlsw': mlsw.to_numpy(),
+        'cutoff_chainage': cutoff_chainage.to_numpy(),
+        'max_master_chainage': max_master_chainage.to_numpy(),
+        'max_survey_chainage': max_survey_chainage.to_numpy(),
+        'crossings': crossings,
+        'misses_mlw': misses_mlw & ~no_crossings,
+        'misses_landward_limit': misses_landward & ~no_crossings,
+        'chainage_not_increasing': not_increasing & ~no_crossings,
+        'seaward_above_mlsw': seaward_above_mlsw & ~no_crossings,
+        'no_crossings': no_crossings,
+        'excess_crossings': excess_crossings,
+    })
+
+    messages = {
+        'misses_mlw': "Profile does not reach MLW elevation",
+        'misses_landward_limit': "Survey does not reach master profile landward limit",
+        'chainage_not_increasing': "Survey chainage values are not strictly increasing",
+        'seaward_above_mlsw': "Survey elevation does not meet depth at seaward end",
+        'no_crossings': "Survey does not cross master profile anywhere!",
+    }
+    flag_columns = list(messages) + ['excess_crossings']
+    results['flags'] = [
+        [messages[col] for col in messages if row[col]]
+        + ([f"Survey crosses master profile {row['crossings']} times (expected ≤2)"] if row['excess_crossings'] else [])
+        for row in results[flag_columns + ['crossings']].to_dict(orient='records')
+    ]
+    results['flagged'] = results[flag_columns].any(axis=1)
+
+    return results
 
-    over_spaced_segments = []
 
-    for i in range(len(df) - 1):
+# Flags that block pushing a survey
+CRITICAL_QC_FLAGS = frozenset({
+    "Survey chainage values are not strictly increasing",
+    "Survey does not cross master profile anywhere!",
+    "Survey does not reach master profile landward limit",
+    "Profile does not reach MLW elevation",
+})
 
-        chainage_current = df.iloc[i]['chainage']
-        chainage_next = df.iloc[i + 1]['chainage']
-        spacing = chainage_next - chainage_current
 
-        if spacing > max_spacing:
-            over_spaced_segments.append(df.index[i+1])
+def _stack_profile_frames(frames, id_column):
+    """One frame of every profile's chainage/elevation, built from the column arrays (no per-frame pandas ops)."""
+    frames = [(str(profile), df) for profile, df in frames]
+    return pd.DataFrame({
+        id_column: np.repeat([profile for profile, _ in frames], [len(df) for _, df in frames]).astype(object),
+        'chainage': np.concatenate([df['chainage'].to_numpy(dtype=float) for _, df in frames] or [[]]),
+        'elevation': np.concatenate([df['elevation'].to_numpy(dtype=float) for _, df in frames] or [[]]),
+    })
 
-    return over_spaced_segments
+
+def qc_profile_frames(master_frames, survey_frames):
+    """
+    qc_survey over per-profile frames, e.g. the viewer's session store: master_frames and survey_frames map
+    (or list as pairs) profile -> DataFrame with ['chainage', 'elevation']. Profiles without survey frames
+    are not checked; a survey profile without a master profile is flagged as not crossing it.
+    """
+    return qc_survey(_stack_profile_frames(dict(master_frames).items(), 'profile_id'),
+                     _stack_profile_frames(dict(survey_frames).items(), 'reg_id'))
+
+
+def flagged_profile_ids(qc_results, flags=None):
+    """reg_ids of the qc_survey results flagged by any check, or only by one of `flags` if given."""
+    if flags is None:
+        return list(qc_results.loc[qc_results['flagged'], 'reg_id'])
+    hit = qc_results['flags'].map(lambda profile_flags: any(flag in flags for flag in profile_flags))
+    return list(qc_results.loc[hit.astype(bool), 'reg_id'])
+
+
+def find_over_spacing(df, max_spacing=5.0):
+    """
+    Identify segments in the profile where the spacing between consecutive chainage points exceeds max_spacing.
+    Returns the index labels of the points that end each over-spaced segment.
+    """
+    mask = over_spacing_mask(df, max_spacing, mode='chainage')
+    return list(df.index[mask.to_numpy()])
 
 
 
@@ -0,0 +1,101 @@
+import logging
+import threading
+
+from PyQt5.QtCore import QRunnable, QThreadPool
+
+"""Background preparation of the profiles either side of the one being reviewed, so next/prev navigation in
+   the profile viewer only has to swap in ready data instead of reading files, running QC and CPA."""
+
+
+class ProfilePrefetchTask(QRunnable):
+    """Runs DataHandler.prepare_profile for one index on the thread pool."""
+
+    def __init__(self, data_handler, index, generation):
+        super().__init__()
+        self.setAutoDelete(False)  # The prefetcher keeps a reference to read the result
+        self.data_handler = data_handler
+        self.index = index
+        self.generation = generation
+
+        self.cancelled = False
+        self.started = False
+        self.result = None
+        self.done = threading.Event()
+
+    def run(self):
+        try:
+            if self.cancelled:
+                return
+            self.started = True
+            self.result = self.data_handler.prepare_profile(self.index)
+        except Exception as e:
+            logging.warning(f"Prefetch of profile index {self.index} failed, it will load on demand: {e}")
+        finally:
+            self.done.set()
+
+
+class ProfilePrefetcher:
+    """
+    Keeps the profiles within `depth` of the current index prepared in the background.
+    Must be used from the GUI thread; only the prepare_profile work runs on the pool.
+    """
+
+    def __init__(self, data_handler, depth=1, max_threads=2, wait_timeout=0.25):
+        self.data_handler = data_handler
+        self.depth = max(int(depth), 0)
+        self.wait_timeout = wait_timeout
+
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_threads)
+        self.tasks = {}  # {index: ProfilePrefetchTask}
+
+    def _cancel(self, index):
+        task = self.tasks.pop(index)
+        task.cancelled = True
+        # Remove it from the queue if it has not started yet, a running task just finishes and is dropped
+        self.pool.tryTake(task)
+
+    def schedule(self, current_index):
+        """Prefetch the neighbours of current_index, nearest first, and cancel prefetches that are out of range."""
+        total = len(self.data_handler.unique_profiles)
+        generation = self.data_handler.data_generation
+
+        wanted = []
+        for distance in range(1, self.depth + 1):
+            for index in (current_index + distance, current_index - distance):
+                if 0 <= index < total:
+                    wanted.append(index)
+
+        for index in list(self.tasks):
+            if index not in wanted or self.tasks[index].generation != generation:
+                self._cancel(index)
+
+        for index in wanted:
+            if index not in self.tasks:
+                task = ProfilePrefetchTask(self.data_handler, index, generation)
+                self.tasks[index] = task
+                self.pool.start(task)
+
+    def take(self, index):
+        """
+        Return the prepared data for index, waiting briefly (wait_timeout seconds, this runs on the GUI thread)
+        if it is already being prepared, or None if it has not been prefetched, is out of date or is not ready
+        in time, in which case the caller loads it directly.
+        """
+        task = self.tasks.pop(index, None)
+        if task is None or task.generation != self.data_handler.data_generation:
+            return None
+
+        if not task.done.is_set():
+            if not task.started and self.pool.tryTake(task):
+                # Still queued, loading it directly is quicker than waiting for the pool
+                return None
+            if not task.done.wait(self.wait_timeout):
+                logging.info(f"Prefetch of profile index {index} is not ready, loading it directly")
+                return None
+
+        return task.result
+
+    def cancel_all(self):
+        for index in list(self.tasks):
+            self._cancel(index)
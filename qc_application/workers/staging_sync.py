@@ -0,0 +1,154 @@
+import logging
+import threading
+from collections import OrderedDict
+
+from qc_application.services.profile_session_store import SURVEY, CPA
+from qc_application.services.staging_sync_service import (
+    check_pending_tables, discard_pending, publish_pending, sync_profile
+)
+
+"""Optional write-behind of profile viewer edits ('staging_write_behind' setting). Every profile written to the
+   session store is queued, and a background thread copies its latest topo rows and CPA value to the pending
+   tables (see staging_sync_service), so the final push only has to move them into staging_data server-side.
+   Repeated saves of a profile are coalesced."""
+
+
+class StagingSyncWorker:
+    """Background thread syncing session store profiles to the pending tables, one profile per transaction."""
+
+    def __init__(self, session_store, survey_unit, date, connect=None):
+        self.session_store = session_store
+        self.survey_unit = survey_unit
+        self.date = date
+        self.connect = connect
+
+        self.pending = OrderedDict()  # Profiles waiting to be synced, in first-queued order
+        self.active = None  # Profile being synced
+        self.synced = set()
+        self.failed = {}  # {profile: error message}
+
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._conn = None
+        self._thread = threading.Thread(target=self._run, name="staging-write-behind", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, profile):
+        profile = str(profile)
+        with self._condition:
+            self.pending[profile] = True
+            self.synced.discard(profile)
+            self.failed.pop(profile, None)
+            self._condition.notify_all()
+
+    def _connect(self):
+        if self.connect is None:
+            from qc_application.utils.database_connection import establish_connection
+            self.connect = establish_connection
+        return self.connect()
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = self._connect()
+            if self._conn is None:
+                raise ConnectionError("Could not connect to the database")
+            check_pending_tables(self._conn)
+        return self._conn
+
+    def _close_connection(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def _run(self):
+        try:
+            # Anything pending for this survey is left from a session that crashed or was not pushed
+            discard_pending(self._connection(), self.survey_unit, self.date)
+        except Exception as e:
+            self._close_connection()
+            logging.warning(f"Could not prepare write-behind tables: {e}")
+
+        while True:
+            with self._condition:
+                while not self.pending and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    break
+                profile, _ = self.pending.popitem(last=False)
+                self.active = profile
+
+            error = None
+            try:
+                sync_profile(self._connection(), self.survey_unit, self.date, profile,
+                             self.session_store.get(SURVEY, profile), self.session_store.get(CPA, profile))
+            except Exception as e:
+                error = str(e)
+                self._close_connection()  # Reconnect for the next profile
+                logging.warning(f"Write-behind sync of profile {profile} failed, the final push will send it: {e}")
+
+            with self._condition:
+                self.active = None
+                if profile not in self.pending:  # Not saved again while it was syncing
+                    if error is None:
+                        self.synced.add(profile)
+                    else:
+                        self.failed[profile] = error
+                self._condition.notify_all()
+
+        self._close_connection()
+
+    def flush(self, timeout=None):
+        """
+        Wait for queued profiles to sync. Returns True if every profile in the session store is in staging,
+        False if any failed, were never queued, or the wait timed out.
+        """
+        with self._condition:
+            drained = self._condition.wait_for(lambda: not self.pending and self.active is None, timeout)
+            stored = self.session_store.profiles(SURVEY) | self.session_store.profiles(CPA)
+            complete = drained and not self.failed and stored <= self.synced
+
+        if not complete:
+            logging.warning(f"Write-behind incomplete ({len(self.synced)} synced, {len(self.failed)} failed), "
+                            f"falling back to a full push.")
+        return complete
+
+    def publish(self, user_name, timeout=None):
+        """
+        Final push: wait for the queue, then move the pending rows into staging_data. Returns False (nothing
+        moved) if the session is not fully synced, so the caller should push from the session store instead.
+        """
+        if not self.flush(timeout):
+            return False
+        self.stop()
+        conn = self._connect()
+        if conn is None:
+            return False
+        try:
+            publish_pending(conn, self.survey_unit, self.date, user_name)
+        finally:
+            conn.close()
+        logging.info(f"Published {len(self.synced)} write-behind profiles to staging.")
+        return True
+
+    def discard(self):
+        """Stop syncing and remove what this session wrote to the pending tables."""
+        self.stop()
+        conn = self._connect()
+        if conn is None:
+            logging.error("Could not remove write-behind rows, DB connection failed. They are cleared next session.")
+            return
+        try:
+            discard_pending(conn, self.survey_unit, self.date)
+            self.synced.clear()
+        finally:
+            conn.close()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self.pending.clear()
+            self._condition.notify_all()
+        self._thread.join(timeout=30)
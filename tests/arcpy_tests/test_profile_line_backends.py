@@ -0,0 +1,86 @@
+import importlib
+import os
+import sys
+import unittest
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+
+# ArcGIS Pro's Python often has neither, and the ArcPy backend must not need them. pyarrow (the shapely
+# backend's Feather cache) is left importable: newer pandas builds its string columns on it.
+SHAPELY_BACKEND_PACKAGES = ("geopandas", "pyogrio")
+QC_MODULES = ("qc_application.utils.point_features", "qc_application.utils.profile_lines_index",
+              "qc_application.utils.profile_line_checks", "qc_application.utils.main_qc_tool_helper_functions")
+
+
+class TestArcPyBackendWithoutGeopandas(unittest.TestCase):
+
+    def setUp(self):
+        hidden = patch.dict(sys.modules, {name: None for name in SHAPELY_BACKEND_PACKAGES})
+        hidden.start()
+        self.addCleanup(hidden.stop)  # Also restores the QC modules popped below
+        for name in QC_MODULES:
+            sys.modules.pop(name, None)
+
+        self.profile_line_checks = importlib.import_module("qc_application.utils.profile_line_checks")
+        self.helpers = importlib.import_module("qc_application.utils.main_qc_tool_helper_functions")
+        self.backend = self.profile_line_checks.get_profile_line_backend("arcpy")
+        self.survey = pd.DataFrame({"Easting": ["10.0", "20.0"], "Northing": ["0.0", "5.0"],
+                                    "Elevation": ["1.0", "2.0"], "FC": ["S", "S"], "Reg_ID": ["_6d00001"] * 2,
+                                    "Unique_ID": ["0_6d00001", "1_6d00001"]})
+
+    def test_geopandas_is_hidden(self):
+        with self.assertRaises(ImportError):
+            import geopandas  # noqa: F401
+        self.assertEqual(self.backend.name, "arcpy")
+
+    @patch("arcpy.Select_analysis")
+    def test_extract_interim_lines_uses_select(self, mock_select):
+        output = self.backend.extract_interim_lines("lines.shp", "workspace", "6d", "6D2_13")
+
+        self.assertEqual(output, os.path.join("workspace", "SelectedInterimLines_6d6D2_13_Auto.shp"))
+        mock_select.assert_called_once_with("lines.shp", output, "SURVEY_UNT = '6D2-13' AND INTERIM = 'YES'")
+
+    @patch("arcpy.SpatialReference")
+    @patch("arcpy.da.NumPyArrayToFeatureClass")
+    @patch("arcpy.Exists", return_value=False)
+    def test_make_xy_event_layer_uses_numpy_array_to_feature_class(self, mock_exists, mock_to_feature_class,
+                                                                   mock_spatial_ref):
+        output = self.backend.make_xy_event_layer(self.survey, "workspace", "points.shp")
+
+        self.assertEqual(output, os.path.join("workspace", "points.shp"))
+        records, out_path, shape_fields, _ = mock_to_feature_class.call_args[0]
+        self.assertEqual(out_path, output)
+        self.assertEqual(shape_fields, ["Easting", "Northing", "Elevation"])
+        self.assertEqual(list(records["Unique_ID"]), ["0_6d00001", "1_6d00001"])
+
+    @patch("arcpy.Delete_management")
+    @patch("arcpy.Exists", return_value=False)
+    @patch("arcpy.SpatialReference")
+    @patch("arcpy.da.NumPyArrayToFeatureClass")
+    @patch("arcpy.da.SearchCursor")
+    @patch("arcpy.analysis.Clip")
+    def test_offline_points_written_with_arcpy(self, mock_clip, mock_cursor, mock_to_feature_class, *_):
+        mock_cursor.return_value = iter([("0_6d00001",)])
+
+        offline = self.backend.get_offline_points("points.shp", "buffer.shp", self.survey, "offline.shp",
+                                                  "workspace")
+
+        self.assertEqual(list(offline["Unique_ID"]), ["1_6d00001"])
+        mock_clip.assert_called_once()
+        self.assertEqual(mock_to_feature_class.call_args[0][1], "offline.shp")
+
+    @patch("arcpy.da.SearchCursor")
+    @patch("arcpy.Exists", return_value=True)
+    def test_survey_unit_check_reads_shapefile_with_arcpy(self, mock_exists, mock_cursor):
+        cursor = MagicMock()
+        cursor.__enter__.return_value = iter([("6D2-13",), ("6D2-14",)])
+        mock_cursor.return_value = cursor
+
+        self.assertTrue(self.helpers.check_survey_unit_in_shapefile("6D2-13", "lines.shp"))
+        self.assertFalse(self.helpers.check_survey_unit_in_shapefile("6D2-99", "lines.shp"))
+        mock_cursor.assert_called_once_with("lines.shp", "SURVEY_UNT")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from qc_application.services import topo_qc_service
+from qc_application.services.topo_qc_service import TopoQCTool
+
+INPUT_FILES = ["a_tip.txt", "b_tip.txt", "c_tip.txt"]
+
+
+def fake_process_single_survey(self, input_text_file, spacing_unit_error, result):
+    """Later files finish first, so the pool completes out of input order."""
+    time.sleep(0.05 * (len(INPUT_FILES) - INPUT_FILES.index(input_text_file)))
+    result.survey_unit = input_text_file.split("_")[0]
+    self.outputs_for_map[result.survey_unit] = [f"{result.survey_unit}.shp"]
+    return True
+
+
+# Spawned worker processes re-import the module and would not see the patched method, so the pool runs in
+# threads; the submit/merge logic under test is the same.
+@patch.object(topo_qc_service, "ProcessPoolExecutor", ThreadPoolExecutor)
+@patch.object(TopoQCTool, "_process_single_survey", fake_process_single_survey)
+class TestRunSurveysInParallel(unittest.TestCase):
+
+    def make_tool(self):
+        return TopoQCTool(";".join(INPUT_FILES), "lines.shp")
+
+    def test_results_and_outputs_follow_input_order(self):
+        tool = self.make_tool()
+        tool._run_surveys_in_parallel(0.5, workers=3)
+
+        self.assertEqual([r.file_path for r in tool.survey_results], INPUT_FILES)
+        self.assertTrue(all(r.success for r in tool.survey_results))
+        self.assertEqual(list(tool.outputs_for_map), ["a", "b", "c"])
+
+    def test_worker_failure_is_recorded_against_its_survey(self):
+        run_survey = topo_qc_service._run_survey_in_worker
+
+        def dying_worker(input_text_file, *args):
+            if input_text_file == "b_tip.txt":
+                raise RuntimeError("worker died")
+            return run_survey(input_text_file, *args)
+
+        tool = self.make_tool()
+        with patch.object(topo_qc_service, "_run_survey_in_worker", dying_worker):
+            tool._run_surveys_in_parallel(0.5, workers=2)
+
+        failed = tool.survey_results[1]
+        self.assertEqual(failed.file_path, "b_tip.txt")
+        self.assertFalse(failed.success)
+        self.assertEqual(failed.stage, "Worker Process")
+        self.assertEqual(failed.error_message, "worker died")
+        self.assertEqual([r.success for r in tool.survey_results], [True, False, True])
+        self.assertEqual(list(tool.outputs_for_map), ["a", "c"])
+
+
+if __name__ == '__main__':
+    unittest.main()
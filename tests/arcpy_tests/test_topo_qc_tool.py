@@ -235,6 +235,7 @@ class TestSurveyCellFunctions(unittest.TestCase):
         self.assertIsNone(result)
 
     # -------------------- check_cell_in_shapefile --------------------
+    @patch.dict("qc_application.utils.main_qc_tool_helper_functions._profile_line_field_values", clear=True)
     @patch("qc_application.utils.main_qc_tool_helper_functions.arcpy.Exists")
     @patch("qc_application.utils.main_qc_tool_helper_functions.arcpy.da.SearchCursor")
     def test_check_cell_found(self, mock_cursor, mock_exists):
@@ -245,6 +246,7 @@ class TestSurveyCellFunctions(unittest.TestCase):
         result = check_cell_in_shapefile("7e", "fake_shapefile.shp")
         self.assertTrue(result)
 
+    @patch.dict("qc_application.utils.main_qc_tool_helper_functions._profile_line_field_values", clear=True)
     @patch("qc_application.utils.main_qc_tool_helper_functions.arcpy.Exists")
     @patch("qc_application.utils.main_qc_tool_helper_functions.arcpy.da.SearchCursor")
     def test_check_cell_not_found(self, mock_cursor, mock_exists):
@@ -253,6 +255,16 @@ class TestSurveyCellFunctions(unittest.TestCase):
         result = check_cell_in_shapefile("7e", "fake_shapefile.shp")
         self.assertFalse(result)
 
+    @patch.dict("qc_application.utils.main_qc_tool_helper_functions._profile_line_field_values", clear=True)
+    @patch("qc_application.utils.main_qc_tool_helper_functions.arcpy.Exists")
+    @patch("qc_application.utils.main_qc_tool_helper_functions.arcpy.da.SearchCursor")
+    def test_check_cell_reads_shapefile_once(self, mock_cursor, mock_exists):
+        mock_exists.return_value = True
+        mock_cursor.return_value.__enter__.return_value = [("7e",), ("8f",)]
+        self.assertTrue(check_cell_in_shapefile("7e", "fake_shapefile.shp"))
+        self.assertFalse(check_cell_in_shapefile("9g", "fake_shapefile.shp"))
+        mock_cursor.assert_called_once_with("fake_shapefile.shp", "CELL")
+
     @patch("qc_application.utils.main_qc_tool_helper_functions.arcpy.Exists")
     def test_check_cell_shapefile_not_exist(self, mock_exists):
         mock_exists.return_value = False
@@ -374,27 +386,34 @@ class TestCreatePointFileName(unittest.TestCase):
 
 class TestMakeXYEventLayer(unittest.TestCase):
 
-    @patch("qc_application.utils.main_qc_tool_helper_functions.arcpy.management.XYTableToPoint")
+    @patch("qc_application.utils.main_qc_tool_helper_functions.arcpy.SpatialReference")
+    @patch("qc_application.utils.main_qc_tool_helper_functions.arcpy.da.NumPyArrayToFeatureClass")
     @patch("qc_application.utils.main_qc_tool_helper_functions.arcpy.Exists")
-    @patch("qc_application.utils.main_qc_tool_helper_functions.os.remove")
-    @patch("qc_application.utils.main_qc_tool_helper_functions.os.path.exists")
-    def test_xy_layer_creation(self, mock_exists, mock_remove, mock_exists_arcpy, mock_xy):
+    @patch("qc_application.utils.main_qc_tool_helper_functions.pd.DataFrame.to_csv")
+    def test_xy_layer_creation(self, mock_to_csv, mock_exists_arcpy, mock_to_feature_class, mock_spatial_ref):
         # Setup mocks
-        mock_exists.return_value = True
         mock_exists_arcpy.return_value = False
+        mock_spatial_ref.return_value = "SR27700"
 
-        df = pd.DataFrame({"Easting": [1000], "Northing": [2000], "Elevation": [10]})
+        df = pd.DataFrame({"Easting": ["1000"], "Northing": ["2000"], "Elevation": ["10"], "FC": ["S"]})
         workspace = r"C:\temp"
         output_file_name = "points.shp"
 
         result = make_xy_event_layer(df, workspace, output_file_name)
 
-        # Check that XYTableToPoint was called
-        mock_xy.assert_called_once()
+        # Check the points were written straight from the DataFrame as a structured array
+        mock_to_feature_class.assert_called_once()
+        records, out_path, shape_fields, spatial_ref = mock_to_feature_class.call_args[0]
+        self.assertEqual(out_path, r"C:\temp\points.shp")
+        self.assertEqual(shape_fields, ["Easting", "Northing", "Elevation"])
+        self.assertEqual(spatial_ref, "SR27700")
+        mock_spatial_ref.assert_called_once_with(27700)
+        self.assertEqual(records["Easting"][0], 1000.0)
+        self.assertEqual(records["FC"][0], "S")
         # Check the function returns the correct path
         self.assertEqual(result, r"C:\temp\points.shp")
-        # Check temporary file removal is attempted
-        mock_remove.assert_called_once_with(r"C:\temp\temp.csv")
+        # Check no temporary CSV is written
+        mock_to_csv.assert_not_called()
 
 class TestFeatureCodeCheck(unittest.TestCase):
 
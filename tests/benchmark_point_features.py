@@ -0,0 +1,104 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from qc_application.utils.point_features import write_point_shapefile
+
+"""Benchmark of the two point shapefiles written per survey (all survey points and the offline points): the old
+   DataFrame -> temp CSV -> XYTableToPoint round trip against writing the shapefile straight from the frame.
+   Without ArcGIS the tool's read of the CSV is stood in for by pandas.read_csv and its shapefile write by the
+   direct writer, so the difference is the CSV write and read back. Use --workspace to time a folder on the
+   network drive and --arcpy to run the real XYTableToPoint.
+
+       python -m tests.benchmark_point_features --rows 20000 --workspace X:\\some\\qc\\folder"""
+
+OFFLINE_FRACTION = 0.05
+
+
+def make_survey(rows, profile_size=250):
+    rng = np.random.default_rng(0)
+    profiles = np.arange(rows) // profile_size
+    reg_ids = np.array([f'6d{p:05d}' for p in profiles], dtype=object)
+    return pd.DataFrame({
+        'Easting': 250000 + rng.random(rows) * 1000,
+        'Northing': 50000 + rng.random(rows) * 1000,
+        'Elevation': rng.normal(2.0, 1.5, rows),
+        'FC': np.where(rng.random(rows) < 0.9, 'S', 'CT'),
+        'reg_id': reg_ids,
+        'Unique_ID': np.arange(rows).astype(str) + reg_ids,
+    })
+
+
+def legacy_write(points_df, workspace, out_feature_class, use_arcpy):
+    """The old path: save the frame as a CSV in the workspace, build the shapefile from it, remove the CSV."""
+    csv_path = os.path.join(workspace, "temp.csv")
+    points_df.to_csv(csv_path, index=False)
+    csv_bytes = os.path.getsize(csv_path)
+    try:
+        if use_arcpy:
+            import arcpy
+
+            arcpy.management.XYTableToPoint(
+                in_table=csv_path, out_feature_class=out_feature_class, x_field="Easting", y_field="Northing",
+                z_field="Elevation", coordinate_system=arcpy.SpatialReference(27700)
+            )
+        else:
+            write_point_shapefile(pd.read_csv(csv_path), out_feature_class)
+    finally:
+        os.remove(csv_path)
+    return csv_bytes
+
+
+def shapefile_bytes(out_feature_class):
+    stem = os.path.splitext(out_feature_class)[0]
+    folder = os.path.dirname(out_feature_class)
+    return sum(os.path.getsize(os.path.join(folder, name)) for name in os.listdir(folder)
+               if os.path.join(folder, name).startswith(stem + '.'))
+
+
+def timed(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workspace', help="Folder to write to (default: a local temporary folder)")
+    parser.add_argument('--arcpy', action='store_true', help="Run the real XYTableToPoint for the old path")
+    args = parser.parse_args()
+
+    survey = make_survey(args.rows)
+    offline = survey.sample(frac=OFFLINE_FRACTION, random_state=0)
+    workspace = tempfile.mkdtemp(dir=args.workspace)
+    print(f"Point shapefiles for a survey of {args.rows} points ({len(offline)} offline) in {workspace}")
+
+    try:
+        for label, points_df in (("all points", survey), ("offline points", offline)):
+            legacy_path = os.path.join(workspace, f"legacy_{label.split()[0]}.shp")
+            direct_path = os.path.join(workspace, f"direct_{label.split()[0]}.shp")
+
+            legacy_time, csv_bytes = timed(
+                lambda: legacy_write(points_df, workspace, legacy_path, args.arcpy), args.repeat)
+            direct_time, _ = timed(lambda: write_point_shapefile(points_df, direct_path), args.repeat)
+            output_bytes = shapefile_bytes(direct_path)
+
+            print(f"{label:<15} CSV round trip {legacy_time:7.3f} s "
+                  f"({(csv_bytes * 2 + output_bytes) / 1e6:6.2f} MB read/written)")
+            print(f"{'':<15} direct write   {direct_time:7.3f} s ({output_bytes / 1e6:6.2f} MB written)")
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from qc_application.utils.profile_viewer_pure_functions import qc_profile, qc_profile_frames
+
+"""Benchmark of the final QC check the profile viewer runs before showing 'Finish and Push': qc_profile once per
+   profile against qc_survey over the whole survey (through qc_profile_frames, as the viewer calls it).
+
+       python -m tests.benchmark_qc_survey --profiles 60 --points 150"""
+
+
+def make_frames(profiles, points):
+    rng = np.random.default_rng(0)
+    master_frames, survey_frames = [], []
+    for p in range(profiles):
+        reg_id = f'6d{p:05d}'
+        chainage = np.linspace(0, 200, points)
+        master = pd.DataFrame({'chainage': chainage, 'elevation': 6 - chainage / 25})
+        survey = pd.DataFrame({'chainage': np.sort(chainage + rng.uniform(0, 1, points)),
+                               'elevation': 6 - chainage / 25 + rng.normal(0, 0.3, points)})
+        master_frames.append((reg_id, master))
+        survey_frames.append((reg_id, survey))
+    return master_frames, survey_frames
+
+
+def timed(label, function, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    print(f"{label:<40} {min(times):8.3f} s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--profiles', type=int, default=60)
+    parser.add_argument('--points', type=int, default=150, help="Points per survey and master profile")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    master_frames, survey_frames = make_frames(args.profiles, args.points)
+    masters = dict(master_frames)
+    print(f"Final QC check of {args.profiles} profiles of {args.points} points")
+
+    per_profile = timed("qc_profile per profile",
+                        lambda: [qc_profile(masters[p], df)['flags'] for p, df in survey_frames], args.repeat)
+    results = timed("qc_survey (qc_profile_frames)",
+                    lambda: qc_profile_frames(master_frames, survey_frames), args.repeat)
+    assert [sorted(flags) for flags in results['flags']] == [sorted(flags) for flags in per_profile]
+
+
+if __name__ == '__main__':
+    main()
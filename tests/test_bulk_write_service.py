@@ -0,0 +1,112 @@
+import csv
+import unittest
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from qc_application.services.bulk_write_service import (
+    MP_COLUMNS, TOPO_COLUMNS, copy_rows, merge_rows, prepare_mp_rows, prepare_topo_rows, to_copy_buffer,
+    to_records
+)
+
+
+class FakeCopyCursor:
+    """psycopg2-style cursor capturing what copy_expert streams."""
+
+    def __init__(self, copies):
+        self.copies = copies
+
+    def copy_expert(self, statement, buffer):
+        self.copies.append((statement, buffer.read()))
+
+    def close(self):
+        pass
+
+
+class FakeCopyConnection:
+    """SQLAlchemy-style connection exposing a DB-API connection with COPY support."""
+
+    def __init__(self):
+        self.copies = []
+        self.connection = self
+
+    def cursor(self):
+        return FakeCopyCursor(self.copies)
+
+
+class TestPrepareRows(unittest.TestCase):
+
+    def test_elevation_replaces_elevation_od_and_fills_survey_fields(self):
+        topo = pd.DataFrame({'Chainage': [0.0, 5.0], 'elevation': [1.5, 2.5], 'elevation_od': [9.0, 9.0],
+                             'reg_id': ['6d00001', '6d00001'], 'date': [None, '2023-02-22']})
+        rows = prepare_topo_rows(topo, '6d6D2-13', datetime(2024, 3, 5))
+
+        self.assertEqual(list(rows.columns), TOPO_COLUMNS)
+        self.assertEqual(list(rows['elevation_od']), [1.5, 2.5])
+        self.assertEqual(list(rows['survey_unit']), ['6d6D2-13', '6d6D2-13'])
+        self.assertEqual(list(rows['date']), [date(2024, 3, 5), date(2023, 2, 22)])
+        self.assertEqual(list(rows['year']), [2024, 2023])
+        self.assertEqual(list(rows['month']), [3, 2])
+        self.assertIsNone(to_records(rows)[0]['fc'])
+
+    def test_missing_sequence_is_numbered_per_profile(self):
+        mp = pd.DataFrame({'Profile_ID': ['a', 'a', 'b'], 'chainage': [0.0, 1.0, 0.0],
+                           'elevation': [1.0, 2.0, 3.0], 'date': ['2020-01-01'] * 3})
+        rows = prepare_mp_rows(mp)
+
+        self.assertEqual(list(rows.columns), MP_COLUMNS)
+        self.assertEqual(list(rows['sequence']), [0, 1, 0])
+
+
+class TestCopyRows(unittest.TestCase):
+
+    def test_copy_buffer_keeps_nulls_and_empty_strings_apart(self):
+        rows = pd.DataFrame({'fc': ['S', '', None, 'a,b'], 'chainage': [0.5, np.nan, 2.0, 3.0]})
+        lines = list(csv.reader(to_copy_buffer(rows, ['fc', 'chainage'])))
+        self.assertEqual(lines, [['S', '0.5'], ['', r'\N'], [r'\N', '2.0'], ['a,b', '3.0']])
+
+    def test_copy_streams_through_copy_expert(self):
+        conn = FakeCopyConnection()
+        rows = prepare_mp_rows(pd.DataFrame({'profile_id': ['a'], 'date': [date(2020, 1, 1)], 'chainage': [0.0],
+                                             'elevation': [1.25], 'sequence': [3.0]}))
+        self.assertEqual(copy_rows(conn, 'staging_data.master_profiles', rows, MP_COLUMNS), 1)
+
+        statement, data = conn.copies[0]
+        self.assertTrue(statement.startswith(
+            'COPY staging_data.master_profiles (profile_id, date, chainage, elevation, sequence) FROM STDIN'))
+        self.assertEqual(data, 'a,2020-01-01,0.0,1.25,3\n')
+
+    def test_falls_back_to_executemany_without_copy(self):
+        engine = create_engine('sqlite://')
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE cpa (survey_unit TEXT, date TEXT, profile TEXT, area REAL)"))
+            rows = pd.DataFrame({'survey_unit': ['6d6D2-13'] * 2, 'date': ['2024-03-05'] * 2,
+                                 'profile': ['6d00001', '6d00002'], 'area': [10.5, None]})
+            self.assertEqual(copy_rows(conn, 'cpa', rows, list(rows.columns)), 2)
+            stored = conn.execute(text("SELECT profile, area FROM cpa ORDER BY profile")).fetchall()
+        self.assertEqual([tuple(row) for row in stored], [('6d00001', 10.5), ('6d00002', None)])
+
+
+class TestMergeRows(unittest.TestCase):
+
+    def test_upsert_only_touches_new_and_changed_rows(self):
+        engine = create_engine('sqlite://')
+        columns, key = ['profile', 'date', 'chainage', 'elevation_od', 'fc'], ['profile', 'date', 'chainage']
+        with engine.begin() as conn:
+            for table in ('live', 'incoming'):
+                conn.execute(text(f"CREATE TABLE {table} (profile TEXT, date TEXT, chainage REAL, "
+                                  f"elevation_od REAL, fc TEXT, PRIMARY KEY (profile, date, chainage))"))
+            conn.execute(text("INSERT INTO live VALUES ('p1', '2024-03-05', 0, 1.0, 'S'), "
+                              "('p1', '2024-03-05', 1, 2.0, NULL)"))
+            conn.execute(text("INSERT INTO incoming VALUES ('p1', '2024-03-05', 0, 1.0, 'S'), "
+                              "('p1', '2024-03-05', 1, 2.0, 'CT'), ('p1', '2024-03-05', 2, 3.0, 'S')"))
+
+            self.assertEqual(merge_rows(conn, 'live', 'incoming', columns, key), 2)
+            stored = conn.execute(text("SELECT chainage, fc FROM live ORDER BY chainage")).fetchall()
+        self.assertEqual([tuple(row) for row in stored], [(0, 'S'), (1, 'CT'), (2, 'S')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from qc_application.utils.feature_code_labels import FeatureCodeLabels, select_labels
+
+
+class TestSelectLabels(unittest.TestCase):
+
+    def test_overlapping_labels_are_skipped(self):
+        shown = select_labels([0, 5, 30], [0, 0, 0], [10, 10, 10], [8, 8, 8], [False, False, False], padding=0)
+        self.assertEqual(list(shown), [True, False, True])
+
+    def test_defaults_hidden_unless_all_fit(self):
+        is_default = [True, False, True, True]
+        crowded = select_labels([0, 50, 100, 105], [0, 0, 0, 0], [10] * 4, [8] * 4, is_default, padding=0)
+        self.assertEqual(list(crowded), [False, True, False, False])
+
+        spread = select_labels([0, 50, 100, 150], [0, 0, 0, 0], [10] * 4, [8] * 4, is_default, padding=0)
+        self.assertTrue(spread.all())
+
+    def test_labels_at_different_heights_do_not_collide(self):
+        shown = select_labels([0, 2], [0, 50], [10, 10], [8, 8], [False, False], padding=0)
+        self.assertTrue(shown.all())
+
+
+class TestFeatureCodeLabels(unittest.TestCase):
+
+    def setUp(self):
+        figure = Figure(figsize=(6, 4), dpi=100)
+        FigureCanvasAgg(figure)
+        self.ax = figure.add_subplot(111)
+        self.labels = FeatureCodeLabels(self.ax)
+
+    def test_zoomed_out_shows_only_non_default_codes(self):
+        x = np.arange(500, dtype=float)
+        codes = np.full(500, 'S', dtype=object)
+        codes[[100, 400]] = 'CT'
+        self.labels.set_labels(x, np.zeros(500), codes)
+
+        self.ax.set_xlim(0, 500)
+        self.ax.set_ylim(-1, 1)
+        self.assertEqual(self.labels.update(), 2)
+
+        self.ax.set_xlim(95, 105)
+        self.assertEqual(self.labels.update(), 11)
+
+    def test_blank_codes_and_clearing(self):
+        self.labels.set_labels([0, 1, 2], [0, 0, 0], ['', 'S', ' '])
+        self.ax.set_xlim(-1, 3)
+        self.assertEqual(self.labels.update(), 1)
+
+        self.labels.set_labels([], [], None)
+        self.assertEqual(self.labels.update(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
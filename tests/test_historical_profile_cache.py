@@ -0,0 +1,99 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from qc_application.services.historical_profile_cache import HistoricalProfileCache, profile_envelope, split_history
+
+
+class TestSplitHistory(unittest.TestCase):
+
+    def test_split_by_profile_and_date(self):
+        topo = pd.DataFrame({
+            'date': ['2020-01-01', '2021-01-01', '2020-01-01', '2020-01-01', '2020-01-01'],
+            'profile': ['6d00001', '6d00001', '6d00001', '6d00001', '6d00002'],
+            'chainage': ['10', '0', '0', '10', '5'],
+            'elevation_od': ['1.0', '3.0', '2.0', '1.0', '4.0'],
+        })
+        history = split_history(topo)
+
+        self.assertEqual(set(history), {'6d00001', '6d00002'})
+        self.assertEqual(list(history['6d00001']), [pd.Timestamp('2021-01-01'), pd.Timestamp('2020-01-01')])
+
+        older = history['6d00001'][pd.Timestamp('2020-01-01')]
+        np.testing.assert_array_equal(older['chainage'], [0.0, 10.0])  # Sorted, duplicate dropped
+        np.testing.assert_array_equal(older['elevation'], [2.0, 1.0])
+
+    def test_empty(self):
+        self.assertEqual(split_history(pd.DataFrame(columns=['date', 'profile', 'chainage', 'elevation_od'])), {})
+
+
+class TestProfileEnvelope(unittest.TestCase):
+
+    def test_envelope_on_common_grid(self):
+        history = {
+            pd.Timestamp('2019-01-01'): {'chainage': np.array([0.0, 4.0]), 'elevation': np.array([0.0, 4.0])},
+            pd.Timestamp('2020-01-01'): {'chainage': np.array([0.0, 2.0]), 'elevation': np.array([2.0, 2.0])},
+            pd.Timestamp('2024-03-05'): {'chainage': np.array([0.0, 9.0]), 'elevation': np.array([9.0, 9.0])},
+        }
+        envelope = profile_envelope(history, exclude_dates=['2024-03-05'], step=1.0, percentiles=(50,))
+
+        self.assertEqual(envelope['surveys'], 2)
+        np.testing.assert_array_equal(envelope['chainage'], [0, 1, 2, 3, 4])
+        np.testing.assert_array_equal(envelope['min'], [0, 1, 2, 3, 4])
+        np.testing.assert_array_equal(envelope['max'], [2, 2, 2, 3, 4])
+        np.testing.assert_array_equal(envelope['mean'], [1, 1.5, 2, 3, 4])
+        np.testing.assert_array_equal(envelope['percentiles'][50], [1, 1.5, 2, 3, 4])
+
+    def test_no_usable_surveys(self):
+        history = {pd.Timestamp('2020-01-01'): {'chainage': np.array([1.0]), 'elevation': np.array([1.0])}}
+        self.assertIsNone(profile_envelope(history))
+
+
+class TestHistoricalProfileCache(unittest.TestCase):
+
+    def test_loads_each_unit_once_with_lru_eviction(self):
+        calls = []
+
+        def loader(profiles):
+            calls.append(profiles)
+            return {profile: {} for profile in profiles}
+
+        cache = HistoricalProfileCache(max_units=2, loader=loader)
+        cache.prefetch('unit_a', ['p1', 'p2'])
+        self.assertEqual(set(cache.get('unit_a', ['p1'])), {'p1', 'p2'})
+        cache.get('unit_b', ['p3'])
+        cache.get('unit_a', ['p2'])
+        self.assertEqual(len(calls), 2)
+
+        cache.get('unit_c', ['p4'])  # Evicts unit_b, the least recently used
+        cache.get('unit_a', ['p1'])
+        cache.get('unit_b', ['p3'])
+        self.assertEqual(len(calls), 4)
+
+    def test_failed_load_is_retried(self):
+        results = [None, {'p1': {}}]
+        cache = HistoricalProfileCache(loader=lambda profiles: results.pop(0))
+
+        self.assertIsNone(cache.get('unit_a', ['p1']))
+        self.assertEqual(cache.get('unit_a', ['p1']), {'p1': {}})
+
+    def test_units_of_changed_profiles_are_reloaded(self):
+        calls = []
+
+        def loader(profiles):
+            calls.append(profiles)
+            return {profile: {} for profile in profiles}
+
+        cache = HistoricalProfileCache(loader=loader)
+        cache.get('unit_a', ['p1', 'p2'])
+        cache.get('unit_b', ['p3'])
+
+        self.assertEqual(cache.evict_profiles(['p2', 'p9']), ['unit_a'])
+        cache.get('unit_a', ['p1', 'p2'])
+        cache.get('unit_b', ['p3'])
+        self.assertEqual(calls, [['p1', 'p2'], ['p3'], ['p1', 'p2']])
+
+
+if __name__ == '__main__':
+    unittest.main()
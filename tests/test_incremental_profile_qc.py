@@ -0,0 +1,69 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from qc_application.services.topo_calculate_cpa_service import profile_area
+from qc_application.utils.incremental_profile_qc import IncrementalProfileQC
+from qc_application.utils.profile_viewer_pure_functions import count_crossings
+
+
+def full_state(mc, me, x, y):
+    """Reference values recomputed from scratch, the way save_changes does."""
+    master_order = np.argsort(mc, kind='stable')
+    survey_order = np.argsort(x, kind='stable')
+    area = profile_area(mc, me, x, y)
+    crossings = count_crossings(mc[master_order], me[master_order], x[survey_order], y[survey_order])
+    return area, crossings
+
+
+class TestIncrementalProfileQC(unittest.TestCase):
+
+    def test_random_drags_match_full_recalculation(self):
+        rng = np.random.default_rng(5)
+        for _ in range(100):
+            n, m = rng.integers(2, 30), rng.integers(2, 7)
+            # Integer grids give plenty of touching and collinear segments
+            x = np.sort(rng.integers(0, 30, n)).astype(float)
+            y = rng.integers(-3, 4, n).astype(float)
+            mc = np.sort(rng.integers(0, 30, m)).astype(float)
+            me = rng.integers(-3, 4, m).astype(float)
+            state = IncrementalProfileQC(mc, me, x, y)
+
+            for _ in range(20):
+                if rng.random() < 0.7:
+                    i = rng.integers(n)
+                    x[i] += rng.integers(-2, 3) * 0.5
+                    y[i] = rng.integers(-3, 4)
+                    state.move_survey_point(i, x[i], y[i])
+                else:
+                    i = rng.integers(m)
+                    mc[i] += rng.integers(-2, 3) * 0.5
+                    me[i] = rng.integers(-3, 4)
+                    state.move_master_point(i, mc[i], me[i])
+
+                area, crossings = full_state(mc, me, x, y)
+                self.assertAlmostEqual(state.area, area, places=9)
+                self.assertEqual(state.crossings, crossings)
+
+    def test_small_drag_does_not_rebuild(self):
+        x = np.linspace(0, 100, 50)
+        state = IncrementalProfileQC([0, 50, 100], [1, 0, -1], x, np.cos(x / 10))
+        state.move_survey_point(20, x[20] + 0.1, 2.0)
+        self.assertEqual(state.rebuilds, 1)
+
+        state.move_survey_point(20, x[22] + 0.1, 2.0)
+        self.assertEqual(state.rebuilds, 2)
+
+    def test_from_frames_uses_elevation_od(self):
+        master = pd.DataFrame({'chainage': [0, 10], 'elevation': [0.0, 0.0]})
+        survey = pd.DataFrame({'chainage': ['0', '10'], 'elevation_od': ['2', '-2']})
+        state = IncrementalProfileQC.from_frames(master, survey)
+
+        self.assertAlmostEqual(state.area, 5.0)
+        self.assertEqual(state.crossings, 1)
+        self.assertIn("Crossings: 1", state.status_text())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+from qc_application.utils.point_features import points_record_array, write_point_shapefile
+
+
+class TestWritePointShapefile(unittest.TestCase):
+
+    def test_points_keep_attributes_elevation_and_grid(self):
+        survey = pd.DataFrame({'Easting': [250000.5, 250001.5], 'Northing': [50000.25, 50001.25],
+                               'Elevation': [1.5, -0.75], 'FC': ['S', 'CT'], 'reg_id': ['6d00001', '6d00001'],
+                               'Unique_ID': ['06d00001', '16d00001']})
+        with tempfile.TemporaryDirectory() as workspace:
+            path = write_point_shapefile(survey, os.path.join(workspace, 'points.shp'))
+            written = gpd.read_file(path)
+
+            self.assertEqual(sorted(os.listdir(workspace)),
+                             ['points.cpg', 'points.dbf', 'points.prj', 'points.shp', 'points.shx'])
+        self.assertEqual(written.crs.to_epsg(), 27700)
+        self.assertTrue(written.has_z.all())
+        self.assertEqual(list(written.geometry.z), [1.5, -0.75])
+        self.assertEqual(list(written['FC']), ['S', 'CT'])
+        self.assertEqual(list(written['Easting']), [250000.5, 250001.5])
+
+    def test_text_coordinates_are_written_as_numbers(self):
+        # universal_text_file_converter reads every column as text
+        survey = pd.DataFrame({'Easting': ['250000.5'], 'Northing': ['50000.25'], 'Elevation': ['1.5'],
+                               'FC': ['S'], 'Reg_ID': ['_6d00001']})
+        with tempfile.TemporaryDirectory() as workspace:
+            written = gpd.read_file(write_point_shapefile(survey, os.path.join(workspace, 'points.shp')))
+
+        for field in ('Easting', 'Northing', 'Elevation'):
+            self.assertTrue(pd.api.types.is_float_dtype(written[field]), field)
+        self.assertEqual(written['Northing'][0], 50000.25)
+        self.assertEqual(written.geometry[0].z, 1.5)
+
+    def test_rows_missing_a_coordinate_are_left_out_and_reported(self):
+        survey = pd.DataFrame({'Easting': ['250000.5', None, '250002.5', '250003.5'],
+                               'Northing': ['50000.25', '50001.25', '', '50003.25'],
+                               'Elevation': ['1.5', '2.5', '3.5', None],
+                               'Unique_ID': ['0_6d00001', '1_6d00001', '2_6d00001', '3_6d00001']})
+        with tempfile.TemporaryDirectory() as workspace:
+            with self.assertLogs(level='WARNING') as logs:
+                path = write_point_shapefile(survey, os.path.join(workspace, 'points.shp'))
+            written = gpd.read_file(path)
+
+        self.assertEqual(list(written['Unique_ID']), ['0_6d00001'])
+        self.assertIn('3 points', logs.output[0])
+        self.assertIn('[1, 2, 3]', logs.output[0])
+
+
+class TestPointsRecordArray(unittest.TestCase):
+
+    def test_columns_become_arcpy_friendly_dtypes(self):
+        survey = pd.DataFrame({'Easting': ['250000.5', '250001'], 'Northing': ['50000', '50001.25'],
+                               'Elevation': ['1.5', '-0.75'], 'FC': ['S', None],
+                               'Code': pd.array([3, None], dtype='Int64'), 'Flag': [True, False],
+                               'Date': pd.to_datetime(['2024-01-01', '2024-02-01'])})
+        records = points_record_array(survey)
+
+        self.assertEqual(records.dtype.names, ('Easting', 'Northing', 'Elevation', 'FC', 'Code', 'Flag', 'Date'))
+        for field in ('Easting', 'Northing', 'Elevation'):
+            self.assertEqual(records.dtype[field], np.float64, field)
+        self.assertEqual(list(records['Northing']), [50000.0, 50001.25])
+        self.assertEqual(list(records['FC']), ['S', ''])
+        self.assertEqual(records['Code'][0], 3.0)
+        self.assertTrue(np.isnan(records['Code'][1]))
+        self.assertEqual(list(records['Flag']), [1, 0])
+        self.assertEqual(records.dtype['Date'], np.dtype('datetime64[us]'))
+        self.assertFalse(any(records.dtype[name].hasobject for name in records.dtype.names))
+
+    def test_rows_missing_a_coordinate_are_left_out(self):
+        survey = pd.DataFrame({'Easting': ['1', None], 'Northing': ['2', '3'], 'Elevation': ['4', '5'],
+                               'Unique_ID': ['0_6d00001', '1_6d00001']})
+        with self.assertLogs(level='WARNING'):
+            records = points_record_array(survey)
+
+        self.assertEqual(list(records['Unique_ID']), ['0_6d00001'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from qc_application.utils.point_spacing import (
+    over_spacing, over_spacing_mask, point_gaps, spacing_tolerance
+)
+from qc_application.utils.profile_viewer_pure_functions import find_over_spacing
+
+
+class FakeSettings:
+    def __init__(self, data):
+        self.data = data
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+
+class TestPointGaps(unittest.TestCase):
+
+    def test_chainage_gaps_per_profile(self):
+        df = pd.DataFrame({
+            'reg_id': ['A', 'B', 'A', 'B', 'A'],
+            'chainage': [0.0, 0.0, 6.0, 2.0, 8.0],
+        }, index=[10, 11, 12, 13, 14])
+        gaps = point_gaps(df, mode='chainage', group_col='reg_id')
+
+        self.assertEqual(list(gaps['profile']), ['A', 'A', 'B'])
+        self.assertEqual(list(gaps['end_index']), [12, 14, 13])
+        np.testing.assert_allclose(gaps['gap'], [6.0, 2.0, 2.0])
+
+        mask = over_spacing_mask(df, 5.0, mode='chainage', group_col='reg_id')
+        self.assertEqual(list(mask), [False, False, True, False, False])
+
+    def test_planar_skips_missing_coordinates(self):
+        df = pd.DataFrame({
+            'Reg_ID': ['A', 'A', 'A', 'A'],
+            'Easting': [0, None, 3, 3],
+            'Northing': [0, 0, 4, 4.5],
+        })
+        result = over_spacing(df, 2.5, mode='planar', group_col='Reg_ID')
+
+        self.assertEqual(list(result['start_index']), [0])
+        self.assertEqual(list(result['end_index']), [2])
+        self.assertAlmostEqual(result['gap'].iloc[0], 5.0)
+
+    def test_find_over_spacing_matches_loop(self):
+        rng = np.random.default_rng(3)
+        df = pd.DataFrame({'chainage': np.cumsum(rng.random(200) * 7)}, index=rng.permutation(200))
+        expected = [df.index[i + 1] for i in range(len(df) - 1)
+                    if df.iloc[i + 1]['chainage'] - df.iloc[i]['chainage'] > 5.0]
+
+        self.assertEqual(find_over_spacing(df, max_spacing=5.0), expected)
+
+
+class TestSpacingTolerance(unittest.TestCase):
+
+    def test_region_overrides_default(self):
+        settings = FakeSettings({'spacing_tolerances': {'default': {'planar': 3.0}, 'TSW_IoS': {'planar': 5.0}}})
+
+        self.assertEqual(spacing_tolerance('planar', region='TSW_IoS', settings=settings), 5.0)
+        self.assertEqual(spacing_tolerance('planar', region='TSW01', settings=settings), 3.0)
+        self.assertEqual(spacing_tolerance('chainage', region='TSW_IoS', settings=settings), 5.0)
+
+    def test_missing_setting_uses_built_in_defaults(self):
+        settings = FakeSettings({})
+        self.assertEqual(spacing_tolerance('planar', settings=settings), 2.5)
+        with self.assertRaises(ValueError):
+            spacing_tolerance('vertical', settings=settings)
+
+
+if __name__ == '__main__':
+    unittest.main()
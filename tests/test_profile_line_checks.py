@@ -0,0 +1,122 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from shapely.geometry import LineString
+
+from qc_application.utils.profile_line_checks import (
+    ShapelyProfileLineBackend, offline_point_mask, point_line_pairs, profile_line_mismatches
+)
+from qc_application.utils.profile_lines_index import ProfileLinesIndex, feather_cache_path
+
+
+def make_lines():
+    return gpd.GeoDataFrame({
+        'SURVEY_UNT': ['6D2-13', '6D2-13', '6D2-14'],
+        'CELL': ['6d', '6d', '6d'],
+        'INTERIM': ['YES', 'NO', 'YES'],
+        'BASELINE': ['YES', 'YES', 'NO'],
+        'REGIONAL_N': ['6d00001', '6d00002', '6d00003'],
+    }, geometry=[LineString([(0, 0), (100, 0)]), LineString([(0, 10), (100, 10)]),
+                 LineString([(0, 20), (100, 20)])], crs="EPSG:27700")
+
+
+class TestProfileLinesIndex(unittest.TestCase):
+
+    def test_lookups_and_selection(self):
+        index = ProfileLinesIndex(make_lines())
+        self.assertTrue(index.has_survey_unit('6D2-14'))
+        self.assertFalse(index.has_cell('7e'))
+        self.assertEqual(list(index.select('6D2_13')['REGIONAL_N']), ['6d00001'])
+        self.assertEqual(list(index.select('6D2_13', True).index), [0, 1])
+        self.assertTrue(index.select('9Z9').empty)
+
+    def test_line_pairs_restricted_to_selected_lines(self):
+        index = ProfileLinesIndex(make_lines())
+        pairs = index.line_pairs([5, 5, 5], [0.05, 10.05, 20.05], 0.1, line_ids=[0, 2])
+        self.assertEqual(pairs.tolist(), [[0, 2], [0, 2]])
+
+    def test_feather_cache_follows_shapefile_version(self):
+        with tempfile.TemporaryDirectory() as folder:
+            shapefile = os.path.join(folder, 'lines.shp')
+            cache_dir = os.path.join(folder, 'cache')
+            make_lines().to_file(shapefile, engine='pyogrio')
+
+            ProfileLinesIndex.load(shapefile, cache_dir)
+            self.assertTrue(feather_cache_path(shapefile, cache_dir).exists())
+            with patch('geopandas.read_file', side_effect=AssertionError("shapefile re-read")):
+                self.assertTrue(ProfileLinesIndex.load(shapefile, cache_dir).has_survey_unit('6D2-13'))
+
+            make_lines().iloc[:1].to_file(shapefile, engine='pyogrio')
+            os.utime(shapefile, ns=(0, 10 ** 18))
+            self.assertFalse(ProfileLinesIndex.load(shapefile, cache_dir).has_survey_unit('6D2-14'))
+            self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+
+class TestProfileLineChecks(unittest.TestCase):
+
+    def test_offline_mask_matches_buffer_polygons(self):
+        lines = make_lines().geometry.values
+        rng = np.random.default_rng(1)
+        x, y = rng.uniform(-1, 101, 2000), rng.uniform(-1, 21, 2000)
+
+        inside_buffer = np.zeros(len(x), dtype=bool)
+        for polygon in lines.buffer(0.1, quad_segs=64):
+            inside_buffer |= gpd.points_from_xy(x, y).within(polygon)
+
+        pairs = point_line_pairs(x, y, lines, 0.1)
+        np.testing.assert_array_equal(offline_point_mask(len(x), pairs), ~inside_buffer)
+
+    def test_points_missing_a_coordinate_are_offline(self):
+        pairs = point_line_pairs([5, np.nan, 5], [0.05, 0.05, np.nan], make_lines().geometry.values, 0.1)
+        self.assertEqual(pairs.tolist(), [[0], [0]])
+        self.assertEqual(list(offline_point_mask(3, pairs)), [False, True, True])
+
+    def test_points_near_a_different_profile_are_mismatches(self):
+        lines = make_lines()
+        pairs = point_line_pairs([5, 5, 50], [0.05, 10.05, 5], lines.geometry.values, 0.1)
+        mismatches = profile_line_mismatches(['6d_00001', '6d00001', '6d00001'], lines['REGIONAL_N'], pairs)
+        self.assertEqual(list(mismatches), [1])
+
+
+class TestShapelyProfileLineBackend(unittest.TestCase):
+
+    def test_checks_write_map_outputs(self):
+        with tempfile.TemporaryDirectory() as workspace:
+            lines_path = os.path.join(workspace, 'lines.shp')
+            make_lines().to_file(lines_path, engine='pyogrio')
+            # Shaped like universal_text_file_converter output: text columns and '_'-prefixed Reg_ID
+            survey = pd.DataFrame({'Easting': ['10.0', '20.0', '30.0'], 'Northing': ['0.02', '5.0', '20.0'],
+                                   'Elevation': ['1.0', '2.0', '3.0'], 'FC': ['S', 'S', 'S'],
+                                   'Reg_ID': ['_6d00001'] * 3, 'Unique_ID': ['0_6d00001', '1_6d00001', '2_6d00001']})
+
+            backend = ShapelyProfileLineBackend()
+            points_path = backend.make_xy_event_layer(survey, workspace, 'points.shp')
+            self.assertEqual(points_path, os.path.join(workspace, 'points.shp'))
+            self.assertEqual(len(gpd.read_file(points_path)), 3)
+            with patch('qc_application.utils.profile_line_checks.get_profile_lines_index',
+                       return_value=ProfileLinesIndex(make_lines())):
+                selected = backend.extract_interim_lines(lines_path, workspace, '6d', '6D2_13')
+            buffer_path = os.path.join(workspace, 'buffer.shp')
+            backend.create_offline_buffer('TSW04', buffer_path, selected)
+            offline_path = os.path.join(workspace, 'offline.shp')
+            offline = backend.get_offline_points(None, buffer_path, survey, offline_path, workspace)
+
+            self.assertEqual(list(offline['Unique_ID']), ['1_6d00001', '2_6d00001'])
+            self.assertEqual(len(gpd.read_file(offline_path)), 2)
+            self.assertEqual(gpd.read_file(buffer_path).geom_type.unique().tolist(), ['Polygon'])
+            self.assertTrue(backend.check_points_lie_on_correct_profile_lines(None, buffer_path, survey))
+            wrong_profile = survey.assign(Reg_ID=['_6d00002'] * 3)
+            self.assertFalse(backend.check_points_lie_on_correct_profile_lines(None, buffer_path, wrong_profile))
+
+            # A fresh backend works from the buffer shapefile alone
+            self.assertEqual(len(ShapelyProfileLineBackend().get_offline_points(
+                None, buffer_path, survey, offline_path, workspace)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
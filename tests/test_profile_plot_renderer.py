@@ -0,0 +1,83 @@
+import unittest
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from qc_application.utils.profile_plot_renderer import ProfilePlotRenderer
+
+
+def make_renderer():
+    figure = Figure()
+    canvas = FigureCanvasAgg(figure)
+    ax = figure.add_subplot(111)
+    return ProfilePlotRenderer(canvas, ax), ax
+
+
+class TestProfilePlotRenderer(unittest.TestCase):
+
+    def test_artists_are_reused_between_profiles(self):
+        renderer, ax = make_renderer()
+        renderer.set_survey([0, 5, 10], [1, 2, 3], labels=['FC', 'S', 'FC'])
+        renderer.set_master([0, 10], [0, 0])
+        renderer.set_added_points([], [])
+        renderer.draw("Profile 1")
+        artist_count = len(ax.get_children())
+
+        renderer.set_survey([0, 2], [4, 5], colors=['lightblue', '#e312c7'], labels=['S', 'S'])
+        renderer.set_master([], [])
+        renderer.draw("Profile 2")
+
+        self.assertEqual(len(ax.get_children()), artist_count)
+        np.testing.assert_allclose(renderer.survey_points.get_offsets(), [[0, 4], [2, 5]])
+        self.assertEqual(len(renderer.fc_labels.collection.get_paths()), 2)
+        legend = [t.get_text() for t in ax.get_legend().get_texts()]
+        self.assertEqual(legend, ['Profile Data Line', 'Profile Data Points'])
+
+    def test_autoscale_includes_added_points(self):
+        renderer, ax = make_renderer()
+        renderer.set_survey([0, 10], [0, 1])
+        renderer.set_added_points([20], [5])
+        renderer.draw("Profile")
+
+        self.assertGreaterEqual(ax.get_xlim()[1], 20)
+        self.assertGreaterEqual(ax.get_ylim()[1], 5)
+
+    def test_envelope_band_breaks_over_gaps(self):
+        renderer, ax = make_renderer()
+        nan = np.nan
+        renderer.set_survey([0, 10], [0, 1])
+        renderer.set_envelope({
+            'chainage': np.arange(5.0), 'surveys': 3,
+            'min': np.array([0, 0, nan, 1, 1.0]), 'max': np.array([2, 2, nan, 3, 8.0]),
+            'mean': np.array([1, 1, nan, 2, 2.0]), 'percentiles': {10: np.array([0.5, 0.5, nan, 1.5, 1.5])},
+        })
+        renderer.draw("Profile")
+
+        self.assertEqual(len(renderer.envelope_band.get_paths()), 2)
+        self.assertGreaterEqual(ax.get_ylim()[1], 8)
+        self.assertIn('Historical range (3 surveys)', [t.get_text() for t in ax.get_legend().get_texts()])
+
+        renderer.set_envelope(None)
+        renderer.draw("Profile")
+        self.assertFalse(renderer.envelope_band.get_visible())
+
+    def test_drag_blits_moving_artists_only(self):
+        renderer, ax = make_renderer()
+        renderer.set_survey([0, 5, 10], [1, 2, 3])
+        renderer.draw("Profile")
+
+        renderer.begin_drag([renderer.survey_line, renderer.survey_points])
+        self.assertIsNotNone(renderer._background)
+        self.assertTrue(renderer.survey_points.get_animated())
+
+        renderer.survey_line.set_data([0, 6, 10], [1, 2.5, 3])
+        renderer.blit()
+
+        renderer.end_drag()
+        self.assertFalse(renderer.survey_points.get_animated())
+        self.assertIsNone(renderer._background)
+
+
+if __name__ == '__main__':
+    unittest.main()
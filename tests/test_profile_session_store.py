@@ -0,0 +1,56 @@
+import tempfile
+import unittest
+from datetime import datetime
+
+import pandas as pd
+
+from qc_application.services.profile_session_store import ProfileSessionStore, SURVEY, MASTER, CPA
+
+
+class TestProfileSessionStore(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.store = ProfileSessionStore('6d6D2-4', datetime(2024, 3, 5), folder=self.folder.name)
+
+    def tearDown(self):
+        self.store.close()
+        self.folder.cleanup()
+
+    def test_file_per_survey(self):
+        self.assertEqual(self.store.path.name, '6d6D2-4_20240305.sqlite')
+
+    def test_if_missing_keeps_edits(self):
+        edited = pd.DataFrame({'chainage': [0.0, 5.0], 'elevation': [1.0, 2.0]})
+        original = pd.DataFrame({'chainage': [0.0], 'elevation': [9.0]})
+        cpa = pd.DataFrame({'profile': ['6d00001'], 'area': [12.5]})
+
+        self.store.write('6d00001', replace={SURVEY: edited})
+        self.store.write('6d00001', replace={CPA: cpa}, if_missing={SURVEY: original, MASTER: original})
+
+        pd.testing.assert_frame_equal(self.store.get(SURVEY, '6d00001'), edited)
+        pd.testing.assert_frame_equal(self.store.get(MASTER, '6d00001'), original)
+        pd.testing.assert_frame_equal(self.store.get(CPA, '6d00001'), cpa)
+        self.assertIsNone(self.store.get(MASTER, '6d00002'))
+
+    def test_load_combined_and_clear(self):
+        for profile, area in (('6d00002', 2.0), ('6d00001', 1.0)):
+            self.store.write(profile, replace={CPA: pd.DataFrame({'profile': [profile], 'area': [area]})})
+
+        self.assertTrue(self.store.has_data())
+        self.assertEqual(self.store.profiles(CPA), {'6d00001', '6d00002'})
+
+        combined = self.store.load_combined()
+        self.assertEqual(list(combined[CPA]['area']), [1.0, 2.0])
+        self.assertTrue(combined[SURVEY].empty)
+
+        self.store.clear()
+        self.assertFalse(self.store.has_data())
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            self.store.write('6d00001', replace={'history': pd.DataFrame()})
+
+
+if __name__ == '__main__':
+    unittest.main()
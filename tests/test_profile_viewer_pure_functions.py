@@ -0,0 +1,125 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from qc_application.utils.profile_viewer_pure_functions import (
+    CRITICAL_QC_FLAGS, count_crossings, flagged_profile_ids, qc_profile, qc_profile_frames, qc_survey,
+    segments_intersect
+)
+
+
+def brute_force_crossings(ax, ay, bx, by):
+    count = 0
+    for i in range(len(ax) - 1):
+        for j in range(len(bx) - 1):
+            if segments_intersect((ax[i], ay[i]), (ax[i + 1], ay[i + 1]),
+                                  (bx[j], by[j]), (bx[j + 1], by[j + 1])):
+                count += 1
+    return count
+
+
+class TestCrossingKernel(unittest.TestCase):
+
+    def test_simple_crossing(self):
+        """A falling master and a flat survey cross once."""
+        self.assertEqual(count_crossings([0, 10], [5, -5], [0, 10], [0, 0]), 1)
+
+    def test_touching_at_vertex(self):
+        """Touching at a shared vertex counts for both adjacent segments, as segments_intersect does."""
+        master_x, master_y = [0, 5, 10], [0, 0, 0]
+        survey_x, survey_y = [0, 5, 10], [2, 0, 2]
+        self.assertEqual(count_crossings(master_x, master_y, survey_x, survey_y),
+                         brute_force_crossings(master_x, master_y, survey_x, survey_y))
+
+    def test_collinear_overlap(self):
+        master_x, master_y = [0, 4, 8], [1, 1, 1]
+        survey_x, survey_y = [2, 6, 10], [1, 1, 1]
+        self.assertEqual(count_crossings(master_x, master_y, survey_x, survey_y),
+                         brute_force_crossings(master_x, master_y, survey_x, survey_y))
+
+    def test_matches_scalar_reference_on_random_grids(self):
+        """Integer grids force lots of collinear and touching pairs; unsorted and NaN input included."""
+        rng = np.random.default_rng(42)
+        for _ in range(500):
+            n, m = rng.integers(0, 10, size=2)
+            ax = rng.integers(0, 6, n).astype(float)
+            ay = rng.integers(0, 4, n).astype(float)
+            bx = rng.integers(0, 6, m).astype(float)
+            by = rng.integers(0, 4, m).astype(float)
+            if n and rng.random() < 0.2:
+                ax[rng.integers(0, n)] = np.nan
+            self.assertEqual(count_crossings(ax, ay, bx, by), brute_force_crossings(ax, ay, bx, by))
+
+    def test_qc_profile_reports_crossings(self):
+        master = pd.DataFrame({'chainage': [0.0, 50.0, 100.0], 'elevation': [5.0, 1.0, -2.0]})
+        survey = pd.DataFrame({'chainage': [0.0, 25.0, 50.0, 75.0, 100.0],
+                               'elevation': [4.0, 3.5, 1.5, -0.5, -3.0]})
+        result = qc_profile(master, survey)
+        self.assertEqual(result['diagnostics']['crossings'],
+                         brute_force_crossings(master['chainage'], master['elevation'],
+                                               survey['chainage'], survey['elevation']))
+
+
+class TestQcSurvey(unittest.TestCase):
+
+    def setUp(self):
+        self.master = pd.DataFrame({
+            'profile_id': ['P1'] * 3 + ['P2'] * 3,
+            'chainage': [0.0, 50.0, 100.0] * 2,
+            'elevation': [5.0, 1.0, -2.0] * 2,
+        })
+        self.survey = pd.DataFrame({
+            # P1 is a clean profile, P2 stops short and stays high, P3 has no master profile
+            'reg_id': ['P1'] * 5 + ['P2'] * 3 + ['P3'] * 2,
+            'chainage': [0.0, 25.0, 50.0, 75.0, 100.0, 40.0, 60.0, 80.0, 0.0, 10.0],
+            'elevation': [4.0, 3.5, 1.5, 0.5, -3.0, 3.0, 0.5, -1.0, 1.0, 0.0],
+        })
+
+    def test_matches_qc_profile(self):
+        results = qc_survey(self.master, self.survey).set_index('reg_id')
+        self.assertEqual(list(results.index), ['P1', 'P2', 'P3'])
+
+        for reg_id, row in results.iterrows():
+            expected = qc_profile(self.master[self.master['profile_id'] == reg_id],
+                                  self.survey[self.survey['reg_id'] == reg_id])
+            self.assertEqual(sorted(row['flags']), sorted(expected['flags']))
+            self.assertEqual(row['crossings'], expected['diagnostics']['crossings'])
+
+    def test_tied_chainages_match_qc_profile(self):
+        # Pairs of points at the same chainage, recorded seaward to landward: the crossings depend on the
+        # order tied points are walked in, which both functions must take from the survey
+        chainage = np.repeat(np.linspace(100.0, 0.0, 10), 2)
+        survey = pd.DataFrame({
+            'reg_id': ['P1'] * 20,
+            'chainage': chainage,
+            'elevation': np.tile([4.0, -1.0], 10) - chainage * 0.05,
+        })
+        master = self.master[self.master['profile_id'] == 'P1']
+
+        result = qc_survey(master, survey).iloc[0]
+        expected = qc_profile(master, survey)
+        self.assertEqual(result['crossings'], expected['diagnostics']['crossings'])
+        self.assertEqual(sorted(result['flags']), sorted(expected['flags']))
+
+    def test_flagged_column(self):
+        results = qc_survey(self.master, self.survey).set_index('reg_id')
+        self.assertFalse(results.loc['P1', 'flagged'])
+        self.assertTrue(results.loc['P2', 'misses_landward_limit'])
+        self.assertTrue(results.loc['P3', 'no_crossings'])
+
+    def test_session_frames_give_the_same_flags(self):
+        master_frames = [(reg_id, group[['chainage', 'elevation']]) for reg_id, group in
+                         self.master.groupby('profile_id')]
+        survey_frames = [(reg_id, group[['chainage', 'elevation']]) for reg_id, group in
+                         self.survey.groupby('reg_id')]
+        results = qc_profile_frames(master_frames, survey_frames)
+
+        self.assertEqual(list(results['flags']), list(qc_survey(self.master, self.survey)['flags']))
+        self.assertEqual(flagged_profile_ids(results), ['P2', 'P3'])
+        self.assertEqual(flagged_profile_ids(results, CRITICAL_QC_FLAGS), ['P2', 'P3'])
+        self.assertEqual(flagged_profile_ids(results, {"Survey does not cross master profile anywhere!"}), ['P3'])
+
+
+if __name__ == '__main__':
+    unittest.main()
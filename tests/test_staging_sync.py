@@ -0,0 +1,116 @@
+import contextlib
+import tempfile
+import unittest
+from datetime import datetime
+
+import pandas as pd
+
+from qc_application.services.profile_session_store import ProfileSessionStore, SURVEY, CPA
+from qc_application.workers.staging_sync import StagingSyncWorker
+
+
+class FakeConnection:
+    """Records executed SQL, optionally failing statements that contain fail_on."""
+
+    def __init__(self, log, fail_on=None, tables_exist=True):
+        self.log = log
+        self.fail_on = fail_on
+        self.tables_exist = tables_exist
+
+    @contextlib.contextmanager
+    def begin(self):
+        yield
+
+    def execute(self, statement, params=None):
+        sql = " ".join(str(statement).split())
+        if self.fail_on and self.fail_on in sql:
+            raise RuntimeError("statement failed")
+        self.log.append((sql, params))
+
+        tables_exist = self.tables_exist
+
+        class Result:
+            rowcount = len(params) if isinstance(params, list) else 0
+
+            @staticmethod
+            def scalar():  # to_regclass() of the pending tables
+                return params['name'] if tables_exist else None
+        return Result()
+
+    def close(self):
+        pass
+
+
+class TestStagingSyncWorker(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.store = ProfileSessionStore('6d6D2-13', datetime(2024, 3, 5), folder=self.folder.name)
+        self.log = []
+        self.fail_on = None
+        self.tables_exist = True
+        for profile in ('6d00001', '6d00002'):
+            self.store.write(profile, replace={
+                SURVEY: pd.DataFrame({'chainage': [0.0], 'elevation': [1.0], 'reg_id': [profile]}),
+                CPA: pd.DataFrame({'survey_unit': ['6d6D2-13'], 'date': ['2024-03-05'], 'profile': [profile],
+                                   'area': [1.0]}),
+            })
+
+    def tearDown(self):
+        self.store.close()
+        self.folder.cleanup()
+
+    def worker(self):
+        return StagingSyncWorker(self.store, '6d6D2-13', datetime(2024, 3, 5),
+                                 connect=lambda: FakeConnection(self.log, self.fail_on, self.tables_exist))
+
+    def inserted_profiles(self):
+        return [params[0]['reg_id'] for sql, params in self.log
+                if sql.startswith('INSERT INTO staging_data.write_behind_topo_data')]
+
+    def test_flush_requires_every_stored_profile(self):
+        worker = self.worker()
+        worker.enqueue('6d00001')
+        self.assertFalse(worker.flush(timeout=5))
+
+        worker.enqueue('6d00002')
+        worker.enqueue('6d00002')  # Coalesced with the queued sync
+        self.assertTrue(worker.flush(timeout=5))
+        self.assertEqual(sorted(self.inserted_profiles()), ['6d00001', '6d00002'])
+        worker.stop()
+
+    def test_publish_moves_pending_rows_into_staging(self):
+        worker = self.worker()
+        for profile in ('6d00001', '6d00002'):
+            worker.enqueue(profile)
+        self.assertTrue(worker.publish('TD', timeout=5))
+
+        statements = [sql for sql, _ in self.log]
+        self.assertTrue(any(sql.startswith('INSERT INTO staging_data.topo_data_history') for sql in statements))
+        self.assertTrue(any(sql.startswith('INSERT INTO staging_data.topo_data (') and
+                            'FROM staging_data.write_behind_topo_data' in sql for sql in statements))
+
+    def test_failed_sync_falls_back_to_full_push(self):
+        self.fail_on = 'INSERT INTO staging_data.write_behind_cpa_table'
+        worker = self.worker()
+        for profile in ('6d00001', '6d00002'):
+            worker.enqueue(profile)
+        self.assertFalse(worker.publish('TD', timeout=5))
+        self.assertEqual(set(worker.failed), {'6d00001', '6d00002'})
+        worker.stop()
+
+    def test_missing_pending_tables_are_not_created(self):
+        self.tables_exist = False
+        worker = self.worker()
+        worker.enqueue('6d00001')
+        with self.assertLogs(level='WARNING') as logs:
+            self.assertFalse(worker.flush(timeout=5))
+        worker.stop()
+
+        self.assertIn('001_write_behind_pending_tables.sql', worker.failed['6d00001'])
+        self.assertFalse(any('CREATE' in sql or 'write_behind' in sql for sql, _ in self.log))
+        self.assertTrue(any('falling back to a full push' in line for line in logs.output))
+
+
+if __name__ == '__main__':
+    unittest.main()
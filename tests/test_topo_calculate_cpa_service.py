@@ -0,0 +1,190 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from qc_application.services.topo_calculate_cpa_service import (
+    CalculateCPATool, batch_cpa, positive_trapezoid_area, profile_area, section_areas
+)
+from qc_application.services.topo_cpa_cache_service import CPACache, cpa_fingerprint
+
+
+def dense_section_areas(master_chainage, master_elevation, chainage, elevation, samples=200001):
+    """Brute-force reference: sample max(profile - baseline, 0) densely and integrate."""
+    areas = []
+    for i in range(len(master_chainage) - 1):
+        lower = max(master_chainage[i], min(chainage))
+        upper = min(master_chainage[i + 1], max(chainage))
+        if lower >= upper:
+            areas.append(0.0)
+            continue
+        xs = np.linspace(lower, upper, samples)
+        heights = np.maximum(np.interp(xs, chainage, elevation) - master_elevation[i], 0)
+        areas.append(np.trapezoid(heights, xs))
+    return np.array(areas)
+
+
+class TestPositiveTrapezoidArea(unittest.TestCase):
+
+    def test_only_the_part_above_zero_counts(self):
+        areas = positive_trapezoid_area(np.array([1.0, -1.0, 2.0, -1.0]), np.array([3.0, -2.0, -2.0, 1.0]),
+                                        np.array([2.0, 2.0, 4.0, 2.0]))
+        np.testing.assert_allclose(areas, [4.0, 0.0, 2.0, 0.5])
+
+
+class TestSectionAreas(unittest.TestCase):
+
+    def test_rectangle(self):
+        """A flat profile 2 m above a flat master over 10 m gives 20 m2."""
+        self.assertAlmostEqual(profile_area([0, 10], [0, 0], [0, 10], [2, 2]), 20.0)
+
+    def test_crossing_baseline_clips_to_triangle(self):
+        """A line falling from +1 to -1 across the section only counts the positive triangle."""
+        self.assertAlmostEqual(profile_area([0, 10], [0, 0], [0, 10], [1, -1]), 2.5)
+
+    def test_survey_shorter_than_section(self):
+        self.assertAlmostEqual(profile_area([0, 100], [0, 0], [10, 20], [1, 1]), 10.0)
+
+    def test_landward_running_section_is_zero(self):
+        areas = section_areas([10, 0], [0, 0], [0, 10], [1, 1])
+        self.assertEqual(areas.tolist(), [0.0])
+
+    def test_matches_dense_integration(self):
+        rng = np.random.default_rng(7)
+        for _ in range(20):
+            master_chainage = np.sort(rng.random(6) * 200)
+            master_elevation = np.sort(rng.random(6) * 6)[::-1] - 2
+            chainage = np.sort(rng.random(rng.integers(20, 200)) * 220)
+            elevation = (np.interp(chainage, master_chainage, master_elevation)
+                         + np.sin(chainage / 7) + rng.normal(size=len(chainage)) * 0.1)
+
+            exact = section_areas(master_chainage, master_elevation, chainage, elevation)
+            reference = dense_section_areas(master_chainage, master_elevation, chainage, elevation)
+            np.testing.assert_allclose(exact, reference, rtol=1e-4, atol=1e-6)
+
+
+class TestCalculateCPATool(unittest.TestCase):
+
+    def test_calculate_cpa_returns_single_row(self):
+        master = pd.DataFrame({'chainage': [0.0, 10.0], 'elevation': [0.0, 0.0]})
+        survey = pd.DataFrame({'chainage': ['0', '10'], 'elevation_od': ['2', '2']})
+        result = CalculateCPATool('SU1', 'P1', master, survey, '2024-01-01', cache=CPACache()).calculate_cpa()
+
+        self.assertEqual(list(result.columns), ['Survey_Unit', 'Date', 'Profile', 'Area'])
+        self.assertAlmostEqual(result['Area'].iloc[0], 20.0)
+
+
+class TestBatchCpa(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        self.master = pd.DataFrame({
+            'profile_id': ['P1'] * 4 + ['P2'] * 4,
+            'chainage': [0.0, 40.0, 90.0, 150.0] * 2,
+            'elevation': [6.0, 3.0, 0.0, -2.0, 5.0, 2.5, 0.5, -1.5],
+            'sequence': [0, 1, 2, 3] * 2,
+        })
+        frames = []
+        for profile in ['P1', 'P2']:
+            for date in pd.date_range('2020-01-01', periods=3, freq='90D'):
+                chainage = np.sort(rng.random(60) * 160)
+                frames.append(pd.DataFrame({
+                    'survey_unit': 'SU1', 'profile': profile, 'date': date, 'chainage': chainage,
+                    'elevation_od': np.interp(chainage, [0, 160], [6.5, -2.5]) + rng.normal(size=60) * 0.2,
+                }))
+        self.topo = pd.concat(frames, ignore_index=True)
+
+    def test_matches_calculate_cpa_tool(self):
+        result = batch_cpa(self.topo, self.master, cache=CPACache())
+        self.assertEqual(len(result), 6)
+
+        for row in result.itertuples():
+            group = self.topo[(self.topo['profile'] == row.profile) & (self.topo['date'] == row.date)]
+            expected = CalculateCPATool('SU1', row.profile, self.master[self.master['profile_id'] == row.profile],
+                                        group, row.date, cache=CPACache()).calculate_cpa()['Area'].iloc[0]
+            self.assertAlmostEqual(row.area, expected, places=9)
+
+    def test_process_pool_matches_in_process(self):
+        in_process = batch_cpa(self.topo, self.master, cache=CPACache()).sort_values(['profile', 'date'])
+        pooled = batch_cpa(self.topo, self.master, max_workers=2, parallel_threshold=0,
+                           cache=CPACache()).sort_values(['profile', 'date'])
+        np.testing.assert_allclose(pooled['area'].to_numpy(), in_process['area'].to_numpy())
+
+    def test_second_run_is_served_from_cache(self):
+        cache = CPACache()
+        first = batch_cpa(self.topo, self.master, cache=cache)
+        second = batch_cpa(self.topo, self.master, cache=cache)
+
+        pd.testing.assert_frame_equal(first, second)
+        self.assertEqual(cache.stats()['misses'], 6)
+        self.assertEqual(cache.stats()['hits'], 6)
+
+
+class TestCPACache(unittest.TestCase):
+
+    def test_fingerprint_ignores_survey_row_order(self):
+        key = cpa_fingerprint([0, 10], [0, 0], [0, 5, 10], [1, 2, 1])
+        self.assertEqual(key, cpa_fingerprint([0, 10], [0, 0], [10, 0, 5], [1, 1, 2]))
+        self.assertNotEqual(key, cpa_fingerprint([0, 10], [0, 0], [0, 5, 10], [1, 2.5, 1]))
+
+    def test_lru_eviction(self):
+        cache = CPACache(max_entries=2)
+        cache.put('a', 1.0)
+        cache.put('b', 2.0)
+        cache.get('a')
+        cache.put('c', 3.0)
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1.0)
+        self.assertEqual(cache.get('c'), 3.0)
+
+    def test_persists_between_instances(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'cpa_cache.sqlite')
+            cache = CPACache(db_path=path)
+            cache.put_many({'a': 1.5, 'b': 2.5})
+            cache.close()
+
+            reopened = CPACache(db_path=path)
+            self.assertEqual(reopened.get('b'), 2.5)
+            self.assertTrue(reopened.stats()['persistent'])
+            reopened.close()
+
+    def test_database_keeps_the_most_recently_used_entries(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'cpa_cache.sqlite')
+            cache = CPACache(max_entries=2, db_path=path)
+            cache.put_many({'a': 1.0, 'b': 2.0})
+            cache.get('a')
+            cache.put('c', 3.0)
+            cache.close()
+
+            with sqlite3.connect(path) as db:
+                keys = {row[0] for row in db.execute("SELECT key FROM cpa_cache")}
+            db.close()
+            self.assertEqual(keys, {'a', 'c'})
+
+    def test_database_from_before_the_bound_is_upgraded_and_pruned(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'cpa_cache.sqlite')
+            with sqlite3.connect(path) as db:
+                db.execute("CREATE TABLE cpa_cache (key TEXT PRIMARY KEY, area REAL NOT NULL)")
+                db.executemany("INSERT INTO cpa_cache VALUES (?, ?)", [(str(i), float(i)) for i in range(5)])
+            db.close()
+
+            cache = CPACache(max_entries=3, db_path=path)
+            self.assertEqual(cache.get('4'), 4.0)
+            cache.close()
+
+            with sqlite3.connect(path) as db:
+                keys = {row[0] for row in db.execute("SELECT key FROM cpa_cache")}
+            db.close()
+            self.assertEqual(len(keys), 3)
+            self.assertIn('4', keys)
+
+
+if __name__ == '__main__':
+    unittest.main()